@@ -0,0 +1,203 @@
+# Benchmarks for the IPPcode23 interpreter
+# Every XML program in this directory is run by interpret.py on the selected optimization levels and the best
+# wall-clock time of several runs is printed.
+#   usage: python benchmarks/bench.py [--runs N] [-O LEVEL ...] [--gc MODE ...] [program.xml ...]
+#          python benchmarks/bench.py --startup [--runs N]
+#          python benchmarks/bench.py --load [--runs N] [--size N]
+#          python benchmarks/bench.py --profile [-O LEVEL] [--gc MODE] [program.xml ...]
+
+import argparse
+import glob
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+INTERPRET = os.path.join(BENCH_DIR, os.pardir, 'interpret.py')
+
+
+# modules interpret.py imports only when they are needed, they mustn't be imported by a plain run
+LAZY_MODULES = ('argparse', 'textwrap', 'fileinput')
+HELLO = (b'<?xml version="1.0" encoding="UTF-8"?>\n'
+         b'<program language="IPPcode23">'
+         b'<instruction order="1" opcode="WRITE"><arg1 type="string">hello</arg1></instruction>'
+         b'</program>\n')
+
+
+def startup(runs: int) -> int:
+    """
+    Measures the startup of interpret.py on a program with a single instruction. The program is run with
+    `-X importtime`, the total time of the imports and the best wall-clock time are printed.
+    Returns 1 if any of the lazily imported modules was imported, 0 otherwise.
+    :param runs: number of runs
+    """
+    best = None
+    imports = None
+    lazy = set()
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-X', 'importtime', INTERPRET, '--input', os.devnull],
+                                input=HELLO, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        total = 0
+        for line in result.stderr.decode().splitlines():
+            # import time: self [us] | cumulative | imported package
+            if not line.startswith('import time:') or line.endswith('imported package'):
+                continue
+            fields = line[len('import time:'):].split('|')
+            total += int(fields[0])
+            name = fields[2].strip()
+            if name in LAZY_MODULES:
+                lazy.add(name)
+        imports = total if imports is None else min(imports, total)
+
+    print('%-24s%11.3fs' % ('startup', best))
+    print('%-24s%11.3fs' % ('imports', imports / 1e6))
+    if lazy:
+        print('lazily imported modules on the startup path: ' + ', '.join(sorted(lazy)))
+        return 1
+    return 0
+
+
+def load_sources(size: int) -> tuple:
+    """
+    Returns the same program of `size` instructions in XML and in the text format. The program starts by EXIT,
+    so its run measures only the load.
+    """
+    body = ['EXIT int@0']
+    for num in range(size // 4):
+        body += ['DEFVAR GF@v%d' % num, 'MOVE GF@v%d string@line\\032%d' % (num, num),
+                 'ADD GF@v%d int@%d int@1' % (num, num), 'JUMPIFEQ l%d GF@v%d bool@true' % (num, num)]
+    text = '.IPPcode23\n' + '\n'.join(body) + '\n'
+
+    xml = ['<?xml version="1.0" encoding="UTF-8"?>\n<program language="IPPcode23">\n']
+    for order, line in enumerate(body, 1):
+        opcode, *operands = line.split()
+        xml.append('  <instruction order="%d" opcode="%s">\n' % (order, opcode))
+        for num, operand in enumerate(operands, 1):
+            if opcode == 'JUMPIFEQ' and num == 1:
+                kind, value = 'label', operand
+            elif operand[:3] in ('GF@', 'LF@', 'TF@'):
+                kind, value = 'var', operand
+            else:
+                kind, _, value = operand.partition('@')
+            xml.append('    <arg%d type="%s">%s</arg%d>\n' % (num, kind, value, num))
+        xml.append('  </instruction>\n')
+    xml.append('</program>\n')
+    return ''.join(xml), text
+
+
+def load(runs: int, size: int) -> int:
+    """
+    Compares the load of the same program from XML and from the text format. The best load time and peak RSS
+    reported by `--load-report` are printed together with the size of the source.
+    :param runs: number of runs
+    :param size: number of instructions of the program
+    """
+    sources = load_sources(size)
+    print('%-24s%12s%12s%12s' % ('format', 'size', 'load', 'peak RSS'))
+    with tempfile.TemporaryDirectory() as directory:
+        for name, source in zip(('xml', 'IPPcode23'), sources):
+            path = os.path.join(directory, 'load.' + name)
+            with open(path, 'w') as file:
+                file.write(source)
+            best = None
+            for _ in range(runs):
+                result = subprocess.run([sys.executable, INTERPRET, '--source', path, '--input', os.devnull,
+                                         '--load-report', '-O0'], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+                report = re.search(rb'load: ([0-9.]+) s, peak RSS ([0-9.]+) MiB', result.stderr)
+                if result.returncode != 0 or report is None:
+                    print('%-24s%12s' % (name, 'exit ' + str(result.returncode)))
+                    return 1
+                measured = float(report.group(1)), float(report.group(2))
+                best = measured if best is None else min(best, measured)
+            print('%-24s%9.1fMiB%11.3fs%9.1fMiB' % (name, len(source) / 2 ** 20, best[0], best[1]))
+    return 0
+
+
+def profile(programs: list, options: list) -> int:
+    """
+    Runs every program once with `--profile` and prints the frames allocated and reused from the frame pool and
+    the collections of the cyclic garbage collector with their pauses.
+    :param programs: paths to the XML programs
+    :param options: additional arguments of interpret.py
+    """
+    print('%-24s%12s%12s%12s%12s' % ('program', 'frames', 'reused', 'gc', 'gc pauses'))
+    for program in programs:
+        result = subprocess.run([sys.executable, INTERPRET, '--source', program, '--input', os.devnull, '--profile']
+                                + options, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        frames = re.search(rb'profile frames: ([0-9]+) created, ([0-9]+) reused', result.stderr)
+        collections = re.search(rb'profile gc: ([0-9]+) collections .*, ([0-9.]+) ms', result.stderr)
+        if result.returncode != 0 or frames is None or collections is None:
+            print('%-24s%12s' % (os.path.basename(program), 'exit ' + str(result.returncode)))
+            continue
+        print('%-24s%12s%12s%12s%10sms' % (os.path.basename(program), frames.group(1).decode(),
+                                           frames.group(2).decode(), collections.group(1).decode(),
+                                           collections.group(2).decode()))
+    return 0
+
+
+def run_program(program: str, options: list, runs: int) -> tuple:
+    """
+    Runs the program `runs` times and returns the best time in seconds together with the exit code.
+    :param program: path to the XML program
+    :param options: additional arguments of interpret.py
+    :param runs: number of runs
+    """
+    best = None
+    code = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        with open(os.devnull, 'w') as null:
+            code = subprocess.run([sys.executable, INTERPRET, '--source', program, '--input', os.devnull] + options,
+                                  stdout=null).returncode
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, code
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks of the IPPcode23 interpreter')
+    parser.add_argument('programs', nargs='*', metavar='program', help='XML programs (default: all in benchmarks/)')
+    parser.add_argument('--runs', type=int, default=3, help='number of runs of each program (default: 3)')
+    parser.add_argument('-O', dest='levels', type=int, action='append', choices=(0, 1, 2),
+                        help='optimization level to measure, can be repeated (default: 0 and 1)')
+    parser.add_argument('--gc', dest='gc_modes', action='append', choices=('default', 'freeze', 'off'),
+                        help='--gc mode of interpret.py to measure, can be repeated (default: default)')
+    parser.add_argument('--startup', action='store_true',
+                        help='measure the startup time and imports of a trivial program instead')
+    parser.add_argument('--load', action='store_true',
+                        help='compare the load of a generated program from XML and from the text format instead')
+    parser.add_argument('--profile', action='store_true',
+                        help='print the use of the frame pool and the gc collections of every program instead')
+    parser.add_argument('--size', type=int, default=200000,
+                        help='number of instructions of the program generated by --load (default: 200000)')
+    args = parser.parse_args()
+
+    if args.startup:
+        sys.exit(startup(args.runs))
+    if args.load:
+        sys.exit(load(args.runs, args.size))
+
+    programs = args.programs or sorted(glob.glob(os.path.join(BENCH_DIR, '*.xml')))
+    levels = args.levels or [0, 1]
+    gc_modes = args.gc_modes or ['default']
+    columns = []
+    for level in levels:
+        for mode in gc_modes:
+            name = '-O' + str(level) + ('' if len(gc_modes) == 1 else ' ' + mode)
+            columns.append((name, ['-O' + str(level)] + ([] if mode == 'default' else ['--gc', mode])))
+    if args.profile:
+        sys.exit(profile(programs, columns[0][1]))
+
+    print('%-24s' % 'program' + ''.join('%12s' % name for name, _ in columns))
+    for program in programs:
+        line = '%-24s' % os.path.basename(program)
+        for _, options in columns:
+            elapsed, code = run_program(program, options, args.runs)
+            line += '%11.3fs' % elapsed if code == 0 else '%12s' % ('exit ' + str(code))
+        print(line)
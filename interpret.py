@@ -2,12 +2,23 @@
 # Name and surname: David Novak
 # Login: xnovak2r
 
-import argparse
-import fileinput
-import re
+import array
+import operator
 import sys
-import textwrap
-import xml.etree.ElementTree as Tree
+
+
+def decode_escapes(string: str) -> str:
+    """
+    Function replaces escape sequences `\\ddd` in a string by the characters they represent. The module `re` is
+    imported only when the string contains a backslash, so it isn't on the startup path.
+    :param string: string from the source code or from the input
+    """
+    if '\\' not in string:
+        return string
+    import re
+    for ch in set(re.findall(r'\\\d{3}', string)):
+        string = string.replace(ch, chr(int(ch[1:])))
+    return string
 
 
 class Counter:
@@ -47,6 +58,70 @@ class Counter:
         self._Count = num
 
 
+class Symbols:
+    """
+    Symbols is the table of interned names of variables of a program. Every name gets a small integer id when
+    the program is loaded, frames are indexed by these ids, so a variable is found without comparing names.
+    Names used in GF get also a slot, an index to the list of global variables (see `Frame`). Every compiled program
+    has its own table (global `symbols` while it is loaded), so servers running many programs don't keep names
+    and shapes of all of them.
+    :var _Ids: {name: id}
+    :var _Names: names indexed by their ids
+    :var _GlobalSlots: {id: slot in GF}
+    :var _Empty: the empty `Shape`, root of the shapes of local and temporary frames of the program
+    """
+
+    def __init__(self) -> None:
+        self._Ids = {}
+        self._Names = []
+        self._GlobalSlots = {}
+        self._Empty = Shape({})
+
+    def intern(self, name: str) -> int:
+        """
+        Method returns the id of a name, a new id is assigned to a name seen for the first time.
+        :param name: name of a variable without the frame
+        """
+        try:
+            return self._Ids[name]
+        except KeyError:
+            self._Ids[name] = len(self._Names)
+            self._Names.append(name)
+            return self._Ids[name]
+
+    def name(self, var_id: int) -> str:
+        return self._Names[var_id]
+
+    def names(self) -> list:
+        """
+        Method returns the names indexed by their ids.
+        """
+        return self._Names
+
+    def global_slot(self, var_id: int) -> int:
+        """
+        Method returns the slot of a name in GF, a new slot is assigned to a name seen in GF for the first time.
+        :param var_id: id of the name
+        """
+        try:
+            return self._GlobalSlots[var_id]
+        except KeyError:
+            self._GlobalSlots[var_id] = len(self._GlobalSlots)
+            return self._GlobalSlots[var_id]
+
+    def global_count(self) -> int:
+        """
+        Method returns the number of slots in GF.
+        """
+        return len(self._GlobalSlots)
+
+    def empty_shape(self) -> 'Shape':
+        """
+        Method returns the shape of a frame without variables.
+        """
+        return self._Empty
+
+
 class Argument:
     """
     Object Argument is used by instructions, it is derivative from an XML arg element.
@@ -57,6 +132,14 @@ class Argument:
     :var _VarType: var
     :var _Frame: var [GF/LF/TF]
     :var _Name: var
+    :var _Id: var, id of the name from the table of the program (`Symbols`)
+    :var _Slot: var in GF, slot of the variable in GF
+    :var _CacheShape: var operand in LF or TF, inline cache: `Shape` of the frame of the last lookup
+    :var _CacheSlot: var operand in LF or TF, inline cache: slot of the variable in frames of `_CacheShape`
+    :var _CacheHits: var operand in LF or TF, number of lookups answered by the inline cache
+    :var _CacheMisses: var operand in LF or TF, number of lookups which searched the shape
+    Variables themselves are cells created by `new_cell`, they don't have the inline cache.
+    The id of a variable is from `table`, by default from the table of the program being loaded (global `symbols`).
     """
     _Types = {
         'int': int,
@@ -68,7 +151,7 @@ class Argument:
         'var': 'var'
     }
 
-    def __init__(self, arg_type: str, arg_value: str) -> None:
+    def __init__(self, arg_type: str, arg_value: str, table: Symbols | None = None) -> None:
         self._VarType = None
         try:
             self._Type = self._Types[arg_type]
@@ -77,11 +160,21 @@ class Argument:
             exit(53)
         self._Frame = None
         self._Name = None
+        self._Id = None
+        self._Slot = None
         self._Value = None
+        self._CacheShape = None
+        self._CacheSlot = None
+        self._CacheHits = 0
+        self._CacheMisses = 0
 
         if self._Type == "var":
-            self._Frame = arg_value.split('@')[0]
-            self._Name = arg_value.split('@')[1]
+            self._Frame, _, self._Name = arg_value.partition('@')
+            if table is None:
+                table = symbols
+            self._Id = table.intern(self._Name)
+            if self._Frame == 'GF':
+                self._Slot = table.global_slot(self._Id)
         elif self._Type == int:
             try:
                 self._Value = int(arg_value)
@@ -92,9 +185,7 @@ class Argument:
             if arg_value is None:
                 self._Value = ''
             else:
-                for ch in set(re.findall(r'\\\d{3}', arg_value)):
-                    arg_value = arg_value.replace(ch, chr(int(ch[1:])))
-                self._Value = arg_value
+                self._Value = decode_escapes(arg_value)
         elif self._Type == "nil" and arg_value == 'nil':
             self._Value = 'nil'
         elif self._Type == bool:
@@ -117,9 +208,61 @@ class Argument:
             sys.stderr.write('ERROR: Argument init: incorrect type + value combination')
             exit(32)
 
+    @classmethod
+    def constant(cls, value) -> 'Argument':
+        """
+        Creates a constant Argument from an already decoded value. The type is derived the same way `set_value` derives
+        the type of a variable. Used by the load-time optimizer.
+        :param value: int | str | bool | 'nil'
+        """
+        arg = cls('nil', 'nil')
+        if type(value) is bool:
+            arg._Type = bool
+        elif type(value) is int:
+            arg._Type = int
+        elif value != 'nil':
+            arg._Type = str
+        arg._Value = value
+        return arg
+
+    def get_state(self) -> tuple:
+        """
+        Method returns the Argument as a tuple of plain values, which is cheap to pickle. Used by the parallel load.
+        """
+        return self._Type, self._Value, self._Frame, self._Name
+
+    @classmethod
+    def from_state(cls, state: tuple) -> 'Argument':
+        """
+        Creates an Argument from the result of `get_state` without checking it again.
+        :param state: the result of `get_state`
+        """
+        arg = cls.__new__(cls)
+        arg._VarType = None
+        arg._Type, arg._Value, arg._Frame, arg._Name = state
+        # ids of the process which created the state aren't valid here
+        arg._Id = None if arg._Name is None else symbols.intern(arg._Name)
+        arg._Slot = symbols.global_slot(arg._Id) if arg._Frame == 'GF' else None
+        arg._CacheShape = None
+        arg._CacheSlot = None
+        arg._CacheHits = 0
+        arg._CacheMisses = 0
+        return arg
+
     def get_type(self) -> type:
         return self._Type
 
+    @classmethod
+    def type_name(cls, arg_type) -> str | None:
+        """
+        Method returns the name of a type from _Types used in the source XML (e.g. `string` for str).
+        :param arg_type: type from _Types or None
+        """
+        for name, value in cls._Types.items():
+            if value == arg_type:
+                return name
+        return None
+
     def get_value(self) -> _Types:
         """
         Method returns value of Argument.
@@ -155,6 +298,22 @@ class Argument:
             sys.stderr.write("ERROR: Argument set_value(): setting value to non-variable argument\n")
             exit(53)
 
+    def set_int(self, value: int) -> None:
+        """
+        Typed store used by the integer kernel. Sets _Value and _VarType of a variable to an int without deriving
+        the type from the value, so it must only be called with an int.
+        :param value: int to be set
+        """
+        self._VarType = int
+        self._Value = value
+
+    def get_int(self) -> int | None:
+        """
+        Method returns the value of a variable if it is an int, or None if it isn't (or if it is uninitialized).
+        Used by the integer kernel to check and read the value with a single call.
+        """
+        return self._Value if self._VarType is int else None
+
     def get_frame(self) -> str:
         """
         Method returns frame of variable or None if Argument is not a variable.
@@ -168,18 +327,59 @@ class Argument:
         """
         return self._Name
 
-    def set_frame(self, frame: str) -> None:
+    def get_id(self) -> int | None:
         """
-        Changes scope of variable from LF to TF or from TF to LF. Used when pushing or popping a frame.
-        :param frame: TF | LF
+        Method returns the id of the name of a variable (see `Symbols`) or None if an Argument is not a variable.
         """
-        if self.get_frame() == "LF" and frame == "TF":
-            self._Frame = frame
-        elif self.get_frame() == "TF" and frame == "LF":
-            self._Frame = frame
-        else:
-            sys.stderr.write("ERROR: Argument set_frame(): can't set frame\n")
-            exit(57)
+        return self._Id
+
+    def get_slot(self) -> int | None:
+        """
+        Method returns the slot of a variable in GF or None if an Argument is not a variable in GF.
+        """
+        return self._Slot
+
+    def find_in(self, frame: 'LocalFrame') -> 'Argument | None':
+        """
+        Method returns the variable named by this operand in a local or temporary frame or None if it isn't there.
+        The slot found in the shape of the frame is cached, so the next lookup in a frame of the same shape is just
+        a list index.
+        :param frame: the frame
+        """
+        shape = frame.get_shape()
+        if shape is self._CacheShape:
+            self._CacheHits += 1
+            return frame[self._CacheSlot]
+        slot = shape.get_slot(self._Id)
+        if slot is None:
+            return None
+        self._CacheMisses += 1
+        self._CacheShape = shape
+        self._CacheSlot = slot
+        return frame[slot]
+
+    def get_cache_stats(self) -> tuple:
+        """
+        Method returns (hits, misses) of the inline cache of a variable operand.
+        """
+        return self._CacheHits, self._CacheMisses
+
+    def new_cell(self, cell: 'Argument | None' = None) -> 'Argument':
+        """
+        Creates a new uninitialized variable named by this operand, DEFVAR puts it into a frame. Every DEFVAR creates
+        a new variable, so frames of recursive calls don't share variables.
+        :param cell: a variable which isn't used anymore and is reused instead of creating a new one (see `FramePool`)
+        """
+        if cell is None:
+            cell = Argument.__new__(Argument)
+        cell._Type = 'var'
+        cell._VarType = None
+        cell._Value = None
+        cell._Frame = self._Frame
+        cell._Name = self._Name
+        cell._Id = self._Id
+        cell._Slot = self._Slot
+        return cell
 
     def is_variable(self) -> bool:
         return True if self._Type == 'var' else False
@@ -201,8 +401,11 @@ class Instruction:
     :param arg1: positional argument 1
     :param arg2: positional argument 2
     :param arg3: positional argument 3
+    :var _Stateful: True if `execute` uses data of the instance, `CompactProgram` then keeps the instance instead of
+    its class
     """
     _InstructionList = []
+    _Stateful = False
 
     def __init__(self, opcode: str, arg1: Argument | None = None,
                  arg2: Argument | None = None, arg3: Argument | None = None) -> None:
@@ -212,6 +415,38 @@ class Instruction:
         self._arg3 = arg3
         self._InstructionList.append(self)
 
+    @classmethod
+    def build(cls, arg1: Argument | None = None, arg2: Argument | None = None,
+              arg3: Argument | None = None) -> 'Instruction':
+        """
+        Creates an instruction of this class from already checked arguments, bypassing the checks done by `__init__`.
+        Used by the load-time optimizer.
+        """
+        instr = cls.__new__(cls)
+        Instruction.__init__(instr, cls.__name__, arg1, arg2, arg3)
+        return instr
+
+    def get_state(self) -> tuple:
+        """
+        Method returns the instruction as a tuple of plain values (class, opcode and states of the arguments), which is
+        cheap to pickle. Used by the parallel load, instructions created by the optimizer aren't supported.
+        """
+        return (type(self), self._Opcode) + tuple(None if arg is None else arg.get_state()
+                                       for arg in (self._arg1, self._arg2, self._arg3))
+
+    @staticmethod
+    def from_state(state: tuple) -> 'Instruction':
+        """
+        Creates an instruction from the result of `get_state` without checking it again.
+        :param state: the result of `get_state`
+        """
+        cls, opcode, arg1, arg2, arg3 = state
+        instr = cls.__new__(cls)
+        Instruction.__init__(instr, opcode, None if arg1 is None else Argument.from_state(arg1),
+                             None if arg2 is None else Argument.from_state(arg2),
+                             None if arg3 is None else Argument.from_state(arg3))
+        return instr
+
     def get_opcode(self) -> str:
         """
         Method, which returns the IPPcode23 instruction code
@@ -219,12 +454,13 @@ class Instruction:
         """
         return self._Opcode
 
-    def get_list(self) -> list:
+    @classmethod
+    def get_list(cls) -> list:
         """
         Method which returns list of all instructions in the current program.
         :return: InstructionList
         """
-        return self._InstructionList
+        return cls._InstructionList
 
     def get_arg(self, arg_num: int) -> Argument:
         """
@@ -240,30 +476,32 @@ class Instruction:
 
 class Stack:
     """
-    Stack is a class containing 3 different stacks. Stacks are implemented as lists and are needed for the correct
-    function of different IPPcode23 instructions.
+    Stack is a class containing 2 different stacks. Stacks are implemented as lists and are needed for the correct
+    function of different IPPcode23 instructions. The data stack has its own class `DataStack`.
     :var _Labels: LABEL, JUMP(s) - NOT really a stack
-    :var _DataStack: PUSHS, POPS
     :var _CallStack: CALL, RETURN
+    :var _Totals: totals of the call stack for `MemoryAccount`, see `DataStack`
+    :var _Unchanged: number of positions at the bottom of the call stack not popped since `_Totals` were updated
     """
-    _Labels = []  # _Labels = [[LABEL,NUMBER],[LABEL2,NUMBER2],...]
-    _DataStack = []
-    _CallStack = []
+
+    def __init__(self) -> None:
+        self._Labels = []  # _Labels = [[LABEL,NUMBER],[LABEL2,NUMBER2],...]
+        self._CallStack = []
+        self._Totals = []
+        self._Unchanged = 0
 
     def push(self, val, stack: str) -> None:
         """
         Method adds a value to a stack specified by the `stack` param.
         :param val: value to be added
-        :param stack: L | D | C
+        :param stack: L | C
         """
         if stack == "L":  # stack().push([arg1.getvalue(), c.get_count()]
             for num in range(len(self._Labels)):
-                if val[0] in self._Labels[num][0]:
+                if val[0] == self._Labels[num][0]:
                     sys.stderr.write("ERROR: Stack push(): label already exists\n")
                     exit(52)
             self._Labels.append(val)
-        elif stack == "D":
-            self._DataStack.append(val)
         elif stack == "C":
             self._CallStack.append(val)
         else:
@@ -274,19 +512,17 @@ class Stack:
         """
         Method pop returns and removes the last value from a stack specified by the `stack` param. Labels from
         label stack can't be popped. May result in error if it is called on an empty call stack.
-        :param stack: D | C
+        :param stack: C
         :return: last value on stack
         """
         if stack == "C":
             if len(self._CallStack):
-                return self._CallStack.pop()
+                position = self._CallStack.pop()
+                if len(self._CallStack) < self._Unchanged:
+                    self._Unchanged = len(self._CallStack)
+                return position
             sys.stderr.write("ERROR: Stack pop(): empty call stack\n")
             exit(56)
-        elif stack == "D":
-            if len(self._DataStack):
-                return self._DataStack.pop()
-            sys.stderr.write("ERROR: Stack pop(): empty data stack\n")
-            exit(56)
         else:
             sys.stderr.write("ERROR: Stack pop(): unknown 'stack'\n")
             exit(99)
@@ -294,7 +530,7 @@ class Stack:
     def ret_all(self, stack: str) -> str:
         """
         Ret_all method returns all everything on a stack specified by the stack param.
-        :param stack: L | D | C
+        :param stack: L | C
         :return: stack elements
         """
         ret = ''
@@ -308,14 +544,6 @@ class Stack:
                     ret += '; '
             else:
                 ret = 'EMPTY; '
-        elif stack == "D":
-            if len(self._DataStack):
-                ret += 'B->T:: '
-                for data in self._DataStack:
-                    ret += str(data)
-                    ret += '; '
-            else:
-                ret = 'EMPTY;'
         else:
             if len(self._CallStack):
                 ret += 'B->T:: '
@@ -326,6 +554,59 @@ class Stack:
                 ret = 'EMPTY;'
         return ret
 
+    def get_call_depth(self) -> int:
+        """
+        Method returns the number of return addresses on the call stack.
+        """
+        return len(self._CallStack)
+
+    def account(self, account: 'MemoryAccount', cached: bool = False) -> None:
+        """
+        Method adds the call stack to the memory account.
+        :param account: the memory account
+        :param cached: positions not popped since the last cached account aren't walked again (see `DataStack`)
+        """
+        account.add_container('call stack', self._CallStack)
+        totals = self._Totals if cached else []
+        del totals[self._Unchanged:]
+        for position in self._CallStack[len(totals):]:
+            totals.append(account.sum_value(totals[-1] if totals else MemoryAccount.ZERO, position))
+        if cached:
+            self._Unchanged = len(self._CallStack)
+        account.add_total('call stack', totals[-1] if totals else MemoryAccount.ZERO)
+
+    def dump(self) -> list:
+        """
+        Method returns the call stack for a checkpoint. Labels aren't a part of it, they are defined by the program.
+        """
+        return list(self._CallStack)
+
+    def restore(self, state: list) -> None:
+        """
+        Method restores the call stack from a checkpoint.
+        :param state: the result of `dump`
+        """
+        self._CallStack[:] = state
+        self._Unchanged = 0
+
+    def get_labels(self) -> list:
+        """
+        Method returns all defined labels as [name, number of the instruction].
+        """
+        return self._Labels
+
+    def label_before(self, num: int) -> str | None:
+        """
+        Method returns the name of the nearest label at or before the instruction number `num`, or None if there is
+        no such label. Used in reports.
+        :param num: number of the instruction
+        """
+        nearest = None
+        for name, position in self._Labels:
+            if position <= num and (nearest is None or position > nearest[1]):
+                nearest = (name, position)
+        return None if nearest is None else nearest[0]
+
     def jump(self, name: str) -> int:
         """
         Method jump returns a number that will be used by the program counter to execute the correct
@@ -334,25 +615,351 @@ class Stack:
         :return: number for counter
         """
         for num in range(len(self._Labels)):
-            if name in self._Labels[num][0]:
+            if name == self._Labels[num][0]:
                 return self._Labels[num][1]
         sys.stderr.write("ERROR: Stack jump(): label doesn't exists\n")
         exit(52)
 
 
+class DataStack:
+    """
+    DataStack is the stack of values used by PUSHS and POPS. It is separate from `Stack`, so the most used stack
+    doesn't select the stack by a string argument on every call. It also holds registers, which are used instead of
+    the stack by PUSHS and POPS pairs lowered by `StackLowering`.
+    :var _Values: values on the stack, the last one is the top
+    :var _Registers: values saved by lowered PUSHS until the matching POPS
+    :var _Totals: totals of `MemoryAccount.sum_value` of the values up to every position on the stack, kept for
+    the memory account of the monitors, so they don't walk the whole stack on every check
+    :var _Unchanged: number of values at the bottom of the stack not popped since `_Totals` were updated
+    """
+
+    def __init__(self) -> None:
+        self._Values = []
+        self._Registers = []
+        self._Totals = []
+        self._Unchanged = 0
+
+    def push(self, val) -> None:
+        """
+        Method adds a value to the top of the stack.
+        :param val: value to be added
+        """
+        self._Values.append(val)
+
+    def pop(self):
+        """
+        Method returns and removes the value from the top of the stack. Results in error if the stack is empty.
+        :return: last value on stack
+        """
+        if self._Values:
+            value = self._Values.pop()
+            if len(self._Values) < self._Unchanged:
+                self._Unchanged = len(self._Values)
+            return value
+        sys.stderr.write("ERROR: Stack pop(): empty data stack\n")
+        exit(56)
+
+    def pop_many(self, count: int) -> list:
+        """
+        Method returns and removes `count` values from the top of the stack. Used by the stack instructions.
+        :param count: number of values
+        :return: values in the order they were pushed
+        """
+        if len(self._Values) < count:
+            sys.stderr.write("ERROR: Stack pop(): not enough values on data stack\n")
+            exit(56)
+        values = self._Values[-count:]
+        del self._Values[-count:]
+        if len(self._Values) < self._Unchanged:
+            self._Unchanged = len(self._Values)
+        return values
+
+    def clear(self) -> None:
+        """
+        Method removes all values from the stack.
+        """
+        self._Values.clear()
+        self._Unchanged = 0
+
+    @staticmethod
+    def type_of(value) -> type | str:
+        """
+        Method returns the IPPcode23 type of a value on the stack, the same way `Argument.set_value` derives it.
+        :return: int | str | bool | 'nil'
+        """
+        if type(value) is bool:
+            return bool
+        if type(value) is int:
+            return int
+        return 'nil' if value == 'nil' else str
+
+    def __len__(self) -> int:
+        return len(self._Values)
+
+    def account(self, account: 'MemoryAccount', cached: bool = False) -> None:
+        """
+        Method adds the values on the stack and in the registers to the memory account.
+        :param account: the memory account
+        :param cached: values at the bottom of the stack, which weren't popped since the last cached account,
+        are added by their totals saved then instead of being walked again
+        """
+        account.add_container('data stack', self._Values)
+        totals = self._Totals if cached else []
+        del totals[self._Unchanged:]
+        for value in self._Values[len(totals):]:
+            totals.append(account.sum_value(totals[-1] if totals else MemoryAccount.ZERO, value))
+        if cached:
+            self._Unchanged = len(self._Values)
+        account.add_total('data stack', totals[-1] if totals else MemoryAccount.ZERO)
+        for value in self._Registers:
+            if value is not None:
+                account.add_value('data stack', value)
+
+    def dump(self) -> dict:
+        """
+        Method returns the values on the stack and in the registers for a checkpoint.
+        """
+        return {'values': list(self._Values), 'registers': list(self._Registers)}
+
+    def restore(self, state: dict) -> None:
+        """
+        Method restores the stack and the registers from a checkpoint.
+        :param state: the result of `dump`
+        """
+        self._Values[:] = state['values']
+        self._Registers[:] = state['registers']
+        self._Unchanged = 0
+
+    def set_register(self, num: int, val) -> None:
+        """
+        Method saves a value to the register specified by `num`.
+        :param num: register number
+        :param val: value to be saved
+        """
+        try:
+            self._Registers[num] = val
+        except IndexError:
+            self._Registers.extend([None] * (num + 1 - len(self._Registers)))
+            self._Registers[num] = val
+
+    def get_register(self, num: int):
+        """
+        Method returns the value saved in the register specified by `num`.
+        :param num: register number
+        """
+        return self._Registers[num]
+
+    def ret_all(self) -> str:
+        """
+        Ret_all method returns everything on the stack.
+        :return: stack elements
+        """
+        if not self._Values:
+            return 'EMPTY;'
+        ret = 'B->T:: '
+        for data in self._Values:
+            ret += str(data)
+            ret += '; '
+        return ret
+
+
+class Shape:
+    """
+    Shape describes the layout of a local or temporary frame: the slots of its variables, in the order DEFVAR defined
+    them. Shapes are shared, a new frame has the empty shape and DEFVAR moves the frame to the shape with one more
+    variable, which is created only the first time. Frames of the same routine so end with the same shape and
+    operands can cache the slot of their variable for a shape (see `Argument.find_in`). Shapes of a program form
+    a tree, its root is the empty shape in the table of the program (see `Symbols`).
+    :var _Id: number of the shape in its tree
+    :var _Root: the empty shape, root of the tree
+    :var _Count: in the root, number of shapes in the tree
+    :var _Slots: {id of the name: slot}
+    :var _Transitions: {id of the name: shape with the variable added}
+    """
+
+    def __init__(self, slots: dict, root: 'Shape | None' = None) -> None:
+        if root is None:
+            root = self
+            self._Count = 0
+        self._Root = root
+        self._Id = root._Count
+        root._Count += 1
+        self._Slots = slots
+        self._Transitions = {}
+
+    def get_root(self) -> 'Shape':
+        return self._Root
+
+    def count(self) -> int:
+        """
+        Method returns the number of shapes in the tree of this shape created so far.
+        """
+        return self._Root._Count
+
+    def add(self, var_id: int) -> 'Shape':
+        """
+        Method returns the shape with the variable added after the variables of this shape.
+        :param var_id: id of the name of the variable
+        """
+        shape = self._Transitions.get(var_id)
+        if shape is None:
+            slots = dict(self._Slots)
+            slots[var_id] = len(slots)
+            shape = self._Transitions[var_id] = Shape(slots, self._Root)
+        return shape
+
+    def get_slot(self, var_id: int) -> int | None:
+        """
+        Method returns the slot of a variable or None if the shape doesn't have it.
+        :param var_id: id of the name of the variable
+        """
+        return self._Slots.get(var_id)
+
+
+class LocalFrame(list):
+    """
+    LocalFrame is a local or temporary frame, a list of variables in slots given by its `Shape`. The frame keeps only
+    the variables, names and slots are in the shape shared by all frames of a routine, so the same frame is TF and
+    after PUSHFRAME LF without any change.
+    :var _Shape: the shape of the frame
+    :var _Spare: variables kept from the previous use of the frame, reused by DEFVAR (see `FramePool`)
+    """
+    __slots__ = ('_Shape', '_Spare')
+
+    def __init__(self, shape: Shape) -> None:
+        super().__init__()
+        self._Shape = shape
+        self._Spare = []
+
+    def get_shape(self) -> Shape:
+        return self._Shape
+
+    def define(self, var: Argument) -> None:
+        """
+        Method adds a variable to the frame.
+        :param var: Argument of type 'var'
+        """
+        self._Shape = self._Shape.add(var.get_id())
+        self.append(var)
+
+    def has(self, var_id: int) -> bool:
+        return self._Shape.get_slot(var_id) is not None
+
+    def new_cell(self, arg: Argument) -> Argument:
+        """
+        Method returns a new variable named by the operand `arg` for this frame, a spare variable is reused.
+        :param arg: operand of DEFVAR
+        """
+        return arg.new_cell(self._Spare.pop() if self._Spare else None)
+
+    def recycle(self) -> None:
+        """
+        Method empties the frame, so it can be used as a new frame. Its variables are kept as spare variables.
+        """
+        self._Spare.extend(self)
+        self.clear()
+        self._Shape = self._Shape.get_root()
+
+
+class FramePool:
+    """
+    FramePool keeps frames which aren't used anymore (TF replaced by CREATEFRAME or POPFRAME), so CREATEFRAME takes
+    a frame with its variables from the pool instead of allocating new ones. Frames are kept in size classes by their
+    number of variables (1, 2-3, 4-7, ...) and CREATEFRAME takes a frame of the size class of the last returned frame,
+    since a routine called repeatedly creates frames of the same size.
+    :var _Classes: {size class: frames}
+    :var _Limit: maximal number of frames kept in a size class
+    :var _Next: size class of the next taken frame
+    :var _Created: number of newly allocated frames
+    :var _Reused: number of frames taken from the pool
+    """
+
+    def __init__(self, limit: int = 64) -> None:
+        self._Classes = {}
+        self._Limit = limit
+        self._Next = 0
+        self._Created = 0
+        self._Reused = 0
+
+    def set_limit(self, limit: int) -> None:
+        self._Limit = limit
+
+    def take(self, shape: Shape) -> LocalFrame:
+        """
+        Method returns an empty frame.
+        :param shape: the empty shape of the program, used by a newly allocated frame
+        """
+        frames = self._Classes.get(self._Next)
+        if frames:
+            self._Reused += 1
+            return frames.pop()
+        self._Created += 1
+        return LocalFrame(shape)
+
+    def give(self, frame: LocalFrame | None) -> None:
+        """
+        Method returns a frame, which isn't used anymore, to the pool. Frames with more than `FRAME_POOL_MAX_VARS`
+        variables aren't kept.
+        :param frame: the frame or None for an undefined frame
+        """
+        if frame is None or len(frame) > FRAME_POOL_MAX_VARS:
+            return
+        self._Next = len(frame).bit_length()
+        frames = self._Classes.setdefault(self._Next, [])
+        if len(frames) < self._Limit:
+            frame.recycle()
+            frames.append(frame)
+
+    def report(self) -> str:
+        return ('profile frames: ' + str(self._Created) + ' created, ' + str(self._Reused) + ' reused, ' +
+                str(sum(len(frames) for frames in self._Classes.values())) + ' in the pool\n')
+
+
 class Frame:
     """
     Object Frame keeps track of declared and/or defined variables and their scopes. Both temporary (TF) and local (LF)
     frames start as undefined. TF is defined when instruction `CreateFrame` is called. To create a LF instruction
     `PushFrame` needs to be called. This will create LT from TF and make TF undefined again. If LF was already defined,
     another use of `PushFrame` will hide the current LF and to use them again instruction `PopFrame` needs to be called.
+    LF and TF are `LocalFrame` lists of variables, the slot of a variable is given by the `Shape` of the frame and
+    cached by the operands which look it up.
+    GF is a list indexed by slots, which are assigned to the names used in GF when the program is loaded, so a global
+    variable is found by a list index. An undefined variable has None in its slot.
+    :var _Symbols: table of names of the running program (see `Symbols`)
     :var _GlobalFrame: contains global variables
     :var _TemporaryFrame: contains variables in TF
     :var _FrameStack: top of the stack is regarded as LF
+    :var _Pool: frames which aren't used anymore, reused by CREATEFRAME
+    :var _Totals: totals of the frames below LF for `MemoryAccount`, see `DataStack`
+    :var _Unchanged: number of frames at the bottom of the frame stack, which weren't LF since `_Totals` were updated
     """
-    _GlobalFrame = []
-    _FrameStack = []
-    _TemporaryFrame = None
+
+    def __init__(self) -> None:
+        self._Symbols = Symbols()
+        self._GlobalFrame = []
+        self._FrameStack = []
+        self._TemporaryFrame = None
+        self._Pool = FramePool()
+        self._Totals = []
+        self._Unchanged = 0
+
+    def get_pool(self) -> FramePool:
+        return self._Pool
+
+    def set_symbols(self, table: Symbols) -> None:
+        """
+        Method makes the frames use the table of names of the program which is run, GF gets a slot for every name
+        used in GF by the program.
+        :param table: table of the program
+        """
+        self._Symbols = table
+        self._GlobalFrame = [None] * table.global_count()
+
+    def reserve_globals(self) -> None:
+        """
+        Method makes a slot in GF for every name used in GF by the running program.
+        """
+        self._GlobalFrame.extend([None] * (self._Symbols.global_count() - len(self._GlobalFrame)))
 
     def return_frame(self, frame: str) -> list:
         """
@@ -375,15 +982,13 @@ class Frame:
     # appends temporary frame to stack of frame and changes frames of appended variables
     def push_frame(self) -> None:
         """
-        Method takes all variables inside defined temporary frame and puts them on top of `_FrameStack`, changes their
-        frame from TF to LF and makes temporary frame undefined again.
+        Method takes all variables inside defined temporary frame and puts them on top of `_FrameStack` and makes
+        temporary frame undefined again.
         """
         if self._TemporaryFrame is None:
             sys.stderr.write("ERROR: push(): frame undefined\n")
             exit(55)
 
-        for variable in self._TemporaryFrame:
-            variable.set_frame("LF")
         self._FrameStack.append(self._TemporaryFrame)
         self._TemporaryFrame = None
 
@@ -395,12 +1000,14 @@ class Frame:
         :param frame: LF | GF | TF
         """
         if frame == "GF":
-            self._GlobalFrame.append(var)
+            if var.get_slot() >= len(self._GlobalFrame):
+                self.reserve_globals()
+            self._GlobalFrame[var.get_slot()] = var
         elif frame == "TF":
-            self._TemporaryFrame.append(var)
+            self._TemporaryFrame.define(var)
         elif frame == "LF":
             try:
-                self._FrameStack[-1].append(var)
+                self._FrameStack[-1].define(var)
             except IndexError:
                 sys.stderr.write("ERROR: add_var_to_frame(): frame doesn't exist\n")
                 exit(55)
@@ -409,28 +1016,30 @@ class Frame:
             exit(55)
 
     #
-    def get_var(self, name: str, frame: str) -> Argument:
+    def get_var(self, arg: Argument) -> Argument:
         """
-        Method returns variable if variable with name specified by param `name` is declared inside frame specified
-        by param `frame` exists.
-        :param name: name of variable
-        :param frame: LT | GF | TF
+        Method returns variable if variable specified by the operand `arg` is declared inside its frame.
+        :param arg: Argument of type 'var'
         """
+        frame = arg.get_frame()
         if frame == "GF":
-            for variable in self._GlobalFrame:
-                if variable.get_name() == name:
-                    return variable
+            try:
+                variable = self._GlobalFrame[arg.get_slot()]
+            except IndexError:
+                variable = None
+            if variable is not None:
+                return variable
         elif frame == "LF":
             if len(self._FrameStack):
-                for variable in self._FrameStack[-1]:
-                    if variable.get_name() == name:
-                        return variable
+                variable = arg.find_in(self._FrameStack[-1])
+                if variable is not None:
+                    return variable
         elif frame == "TF":
             try:
-                for variable in self._TemporaryFrame:
-                    if variable.get_name() == name:
-                        return variable
-            except TypeError:
+                variable = arg.find_in(self._TemporaryFrame)
+                if variable is not None:
+                    return variable
+            except AttributeError:
                 sys.stderr.write("ERROR: get_var(): frame doesn't exist\n")
                 exit(55)
         else:
@@ -442,84 +1051,329 @@ class Frame:
     #
     def pop_frame(self) -> None:
         """
-        Method pops local frame to temporary frame and changes frames of popped variables from LF to TF. Any variables
-        inside temporary frame that might have existed before are no longer defined or declared inside the new frame.
+        Method pops local frame to temporary frame. Any variables inside temporary frame that might have existed before
+        are no longer defined or declared inside the new frame.
         """
         if len(self._FrameStack):
+            self._Pool.give(self._TemporaryFrame)
             self._TemporaryFrame = self._FrameStack.pop()
-            for argument in self._TemporaryFrame:
-                argument.set_frame("TF")
+            if len(self._FrameStack) <= self._Unchanged:
+                self._Unchanged = max(len(self._FrameStack) - 1, 0)
         else:
             sys.stderr.write("ERROR: pop_frame(): stack is empty\n")
             exit(55)
 
     #
-    def is_in_frame(self, name: str, frame: str) -> bool:
+    def is_in_frame(self, arg: Argument) -> bool:
         """
-        Method returns True if variable with given name and frame is already in frame and False if it isn't.
-        :param name: name of variable
-        :param frame: LF | GF | TF
+        Method returns True if variable specified by the operand `arg` is already in its frame and False if it isn't.
+        :param arg: Argument of type 'var'
         """
+        if arg.get_frame() == "GF":
+            return arg.get_slot() < len(self._GlobalFrame) and self._GlobalFrame[arg.get_slot()] is not None
         try:
-            for variable in self.return_frame(frame):
-                if name == variable.get_name():
-                    return True
-            return False
-        except TypeError:
+            return self.return_frame(arg.get_frame()).has(arg.get_id())
+        except AttributeError:
             sys.stderr.write("ERROR: is_in_frame(): frame doesn't exist")
             exit(55)
 
     def new_temp_frame(self) -> None:
         """
-        Method makes temporary frame defined and clears any variables that were inside previously.
+        Method makes temporary frame defined and clears any variables that were inside previously. The previous
+        frame goes to the pool and the new one is taken from it.
         """
-        self._TemporaryFrame = []
-
-
-class MOVE(Instruction):
-    """
-    Instruction MOVE from IPPcode23 requires 2 arguments of type variable and symbol.
-    """
-
-    def __init__(self, arg_num: int, arguments: list, types: list) -> None:
-        if arg_num != 2:
-            sys.stderr.write("ERROR: Instruction MOVE got " + str(arg_num) + " arguments, 2 arguments expected")
-            exit(32)
+        self._Pool.give(self._TemporaryFrame)
+        self._TemporaryFrame = self._Pool.take(self._Symbols.empty_shape())
 
-        arg1 = Argument(types[0], arguments[0])
-        arg2 = Argument(types[1], arguments[1])
+    def define_var(self, arg: Argument) -> None:
+        """
+        Method adds a new variable named by the operand `arg` of DEFVAR to its frame. The frame has to exist.
+        :param arg: Argument of type 'var'
+        """
+        if arg.get_frame() == "GF":
+            self.add_var_to_frame(arg.new_cell(), "GF")
+        else:
+            frame = self.return_frame(arg.get_frame())
+            frame.define(frame.new_cell(arg))
 
-        if not arg1.is_variable():
-            sys.stderr.write("ERROR: Instruction MOVE: argument 1 is not a variable")
-            exit(53)
+    @staticmethod
+    def _dump_frame(frame: list | None) -> list | None:
+        """
+        Method returns the variables of a frame as [name, type, value], type is the name of the type of the value
+        or None if the variable is uninitialized.
+        :param frame: variables or None for an undefined frame
+        """
+        if frame is None:
+            return None
+        return [[var.get_name(), Argument.type_name(var.get_var_type()),
+                 None if var.get_var_type() is None else var.get_value()] for var in frame]
 
-        if not arg2.is_symbol():
-            sys.stderr.write("ERROR: Instruction MOVE: argument 2 is not a symbol")
-            exit(53)
+    def _restore_frame(self, state: list | None, scope: str) -> LocalFrame | None:
+        """
+        Method creates the variables of a frame from the result of `_dump_frame`. Variables are new Arguments,
+        like the variables created by DEFVAR.
+        :param state: the result of `_dump_frame`
+        :param scope: GF | LF | TF
+        """
+        if state is None:
+            return None
+        frame = LocalFrame(self._Symbols.empty_shape())
+        for name, var_type, value in state:
+            var = Argument('var', scope + '@' + name, self._Symbols)
+            if var_type is not None:
+                var.set_value(value)
+            frame.define(var)
+        return frame
+
+    def dump(self) -> dict:
+        """
+        Method returns all frames for a checkpoint.
+        """
+        return {
+            'GF': self._dump_frame([var for var in self._GlobalFrame if var is not None]),
+            'LF': [self._dump_frame(frame) for frame in self._FrameStack],
+            'TF': self._dump_frame(self._TemporaryFrame),
+        }
 
-        super().__init__("MOVE", arg1, arg2)
+    def restore(self, state: dict) -> None:
+        """
+        Method restores all frames from a checkpoint.
+        :param state: the result of `dump`
+        """
+        self._GlobalFrame = [None] * self._Symbols.global_count()
+        for var in self._restore_frame(state['GF'], 'GF'):
+            self.add_var_to_frame(var, 'GF')
+        self._FrameStack[:] = [self._restore_frame(frame, 'LF') for frame in state['LF']]
+        self._TemporaryFrame = self._restore_frame(state['TF'], 'TF')
+        self._Unchanged = 0
+
+    def dump_temp(self) -> list | None:
+        """
+        Method returns the variables of the temporary frame, used by memoized calls.
+        """
+        return self._dump_frame(self._TemporaryFrame)
 
-    @classmethod
-    def execute(cls, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
+    def restore_temp(self, state: list | None) -> None:
         """
-        Sets value of arg1 to value of arg2.
-        :param arg1: var
-        :param arg2: symb
-        :param arg3: None
+        Method replaces the temporary frame by new variables from the result of `dump_temp`.
+        :param state: the result of `dump_temp`
         """
-        arg1 = f.get_var(arg1.get_name(), arg1.get_frame())
-        if arg2.is_variable():
-            arg2 = f.get_var(arg2.get_name(), arg2.get_frame())
+        self._Pool.give(self._TemporaryFrame)
+        self._TemporaryFrame = self._restore_frame(state, 'TF')
 
-        arg1.set_value(arg2.get_value())
+    def find_var(self, arg: Argument) -> Argument | None:
+        """
+        Method returns the variable like `get_var`, but returns None instead of an error if the frame or the variable
+        doesn't exist. Used by the trace.
+        :param arg: Argument of type 'var'
+        """
+        if arg.get_frame() == "GF":
+            return self._GlobalFrame[arg.get_slot()] if arg.get_slot() < len(self._GlobalFrame) else None
+        elif arg.get_frame() == "LF":
+            variables = self._FrameStack[-1] if self._FrameStack else None
+        else:
+            variables = self._TemporaryFrame
+        return None if variables is None else arg.find_in(variables)
 
+    def get_depth(self) -> int:
+        """
+        Method returns the number of frames on the frame stack.
+        """
+        return len(self._FrameStack)
 
-class CREATEFRAME(Instruction):
+    def account(self, account: 'MemoryAccount', cached: bool = False) -> None:
+        """
+        Method adds all frames and their variables to the memory account.
+        :param account: the memory account
+        :param cached: frames below LF, which weren't LF since the last cached account, are added by their totals
+        saved then instead of being walked again, their variables can't be changed while they aren't LF
+        """
+        account.add_container('frames', self._FrameStack)
+        account.add_container('frames', self._GlobalFrame)
+        for variable in self._GlobalFrame:
+            if variable is not None:
+                account.add_variable('frames', variable)
+        below = max(len(self._FrameStack) - 1, 0)
+        totals = self._Totals if cached else []
+        del totals[self._Unchanged:]
+        for frame in self._FrameStack[len(totals):below]:
+            totals.append(account.sum_frame(totals[-1] if totals else MemoryAccount.ZERO, frame))
+        if cached:
+            self._Unchanged = below
+        account.add_total('frames', totals[-1] if totals else MemoryAccount.ZERO)
+        for frame in self._FrameStack[below:] + [self._TemporaryFrame]:
+            if frame is not None:
+                account.add_total('frames', account.sum_frame(MemoryAccount.ZERO, frame))
+
+
+class MemoryAccount:
     """
-    Instruction CREATEFRAME from IPPcode23 requires 0 arguments.
+    MemoryAccount is a snapshot of approximate live bytes and counts of values in the structures of the running
+    program: the data stack (with registers), the call stack, frames (variables in GF, TF and on the frame stack)
+    and strings. Sizes are estimated by sys.getsizeof. String values are accounted only under `strings`, wherever
+    they are saved, so the total doesn't count them twice.
+    BREAK walks all structures. Monitors (`--max-live`, `--metrics`) check the account often, so they take a cached
+    account (`MemoryAccount(True)`): the stacks keep totals of their bottom parts, which can't change until they are
+    popped, and only the rest is walked, so a check doesn't cost more with a deeper recursion.
+    Totals of a part of a structure are tuples (count, bytes, count of strings, bytes of strings).
+    :var _Structures: {name: [count, bytes]}
     """
+    ZERO = (0, 0, 0, 0)
+
+    def __init__(self, cached: bool = False) -> None:
+        self._Structures = {
+            'data stack': [0, 0],
+            'call stack': [0, 0],
+            'frames': [0, 0],
+            'strings': [0, 0],
+        }
+        d.account(self, cached)
+        s.account(self, cached)
+        f.account(self, cached)
 
-    def __init__(self, arg_num: int, arguments: list, types: list) -> None:
+    def add_container(self, structure: str, container: list | dict) -> None:
+        """
+        Method adds the size of a list or a dictionary (without its items) to a structure.
+        :param structure: name of the structure
+        :param container: the list or the dictionary
+        """
+        self._Structures[structure][1] += sys.getsizeof(container)
+
+    def add_value(self, structure: str, value) -> None:
+        """
+        Method counts a value to a structure, or to `strings` if it is a string.
+        :param structure: name of the structure
+        :param value: the value
+        """
+        self.add_total(structure, self.sum_value(self.ZERO, value))
+
+    def add_variable(self, structure: str, variable: Argument) -> None:
+        """
+        Method counts a variable and its value to a structure, the value to `strings` if it is a string.
+        :param structure: name of the structure
+        :param variable: Argument of type 'var'
+        """
+        self.add_total(structure, self.sum_variable(self.ZERO, variable))
+
+    def add_total(self, structure: str, total: tuple) -> None:
+        """
+        Method adds totals of a part of a structure, strings to `strings`.
+        :param structure: name of the structure
+        :param total: (count, bytes, count of strings, bytes of strings)
+        """
+        self._Structures[structure][0] += total[0]
+        self._Structures[structure][1] += total[1]
+        self._Structures['strings'][0] += total[2]
+        self._Structures['strings'][1] += total[3]
+
+    @staticmethod
+    def sum_value(total: tuple, value) -> tuple:
+        """
+        Method returns the totals with a value added.
+        :param total: (count, bytes, count of strings, bytes of strings)
+        :param value: the value
+        """
+        count, size, strings, string_size = total
+        if type(value) is str:
+            return count, size, strings + 1, string_size + sys.getsizeof(value)
+        return count + 1, size + sys.getsizeof(value), strings, string_size
+
+    @staticmethod
+    def sum_variable(total: tuple, variable: Argument) -> tuple:
+        """
+        Method returns the totals with a variable and its value added.
+        :param total: (count, bytes, count of strings, bytes of strings)
+        :param variable: Argument of type 'var'
+        """
+        count, size, strings, string_size = total
+        count += 1
+        size += sys.getsizeof(variable) + sys.getsizeof(variable.__dict__)
+        if variable.get_var_type() is not None:
+            value = variable.get_value()
+            if type(value) is str:
+                strings += 1
+                string_size += sys.getsizeof(value)
+        return count, size, strings, string_size
+
+    @classmethod
+    def sum_frame(cls, total: tuple, frame: list) -> tuple:
+        """
+        Method returns the totals with a local or temporary frame and its variables added.
+        :param total: (count, bytes, count of strings, bytes of strings)
+        :param frame: the frame
+        """
+        count, size, strings, string_size = total
+        total = count, size + sys.getsizeof(frame), strings, string_size
+        for variable in frame:
+            total = cls.sum_variable(total, variable)
+        return total
+
+    def get_total(self) -> int:
+        """
+        Method returns the approximate number of live bytes of all structures.
+        """
+        return sum(size for _, size in self._Structures.values())
+
+    def as_dict(self) -> dict:
+        """
+        Method returns the account as a dictionary {name: {'count': count, 'bytes': bytes}}.
+        """
+        return {name: {'count': count, 'bytes': size} for name, (count, size) in self._Structures.items()}
+
+    def ret_all(self) -> str:
+        """
+        Ret_all method returns the account as a string.
+        """
+        ret = ''
+        for name, (count, size) in self._Structures.items():
+            ret += name + ': ' + str(count) + ' (' + str(size) + ' B); '
+        return ret + 'total: ' + str(self.get_total()) + ' B'
+
+
+class MOVE(Instruction):
+    """
+    Instruction MOVE from IPPcode23 requires 2 arguments of type variable and symbol.
+    """
+
+    def __init__(self, arg_num: int, arguments: list, types: list) -> None:
+        if arg_num != 2:
+            sys.stderr.write("ERROR: Instruction MOVE got " + str(arg_num) + " arguments, 2 arguments expected")
+            exit(32)
+
+        arg1 = Argument(types[0], arguments[0])
+        arg2 = Argument(types[1], arguments[1])
+
+        if not arg1.is_variable():
+            sys.stderr.write("ERROR: Instruction MOVE: argument 1 is not a variable")
+            exit(53)
+
+        if not arg2.is_symbol():
+            sys.stderr.write("ERROR: Instruction MOVE: argument 2 is not a symbol")
+            exit(53)
+
+        super().__init__("MOVE", arg1, arg2)
+
+    @classmethod
+    def execute(cls, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
+        """
+        Sets value of arg1 to value of arg2.
+        :param arg1: var
+        :param arg2: symb
+        :param arg3: None
+        """
+        arg1 = f.get_var(arg1)
+        if arg2.is_variable():
+            arg2 = f.get_var(arg2)
+
+        arg1.set_value(arg2.get_value())
+
+
+class CREATEFRAME(Instruction):
+    """
+    Instruction CREATEFRAME from IPPcode23 requires 0 arguments.
+    """
+
+    def __init__(self, arg_num: int, arguments: list, types: list) -> None:
         if arg_num != 0:
             sys.stderr.write("ERROR: Instruction CREATEFRAME got " + str(arg_num) + " arguments, 0 arguments expected")
             exit(32)
@@ -606,15 +1460,15 @@ class DEFVAR(Instruction):
     @classmethod
     def execute(cls, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
         """
-        Declares a variable specified by arg1. Local and temporary frames have to be created first.
+        Declares a new variable specified by arg1. Local and temporary frames have to be created first.
         :param arg1: var
         :param arg2: None
         :param arg3: None
         """
-        if f.is_in_frame(arg1.get_name(), arg1.get_frame()):
+        if f.is_in_frame(arg1):
             sys.stderr.write("ERROR: execute DEFVAR: variable already in frame\n")
             exit(52)
-        f.add_var_to_frame(arg1, arg1.get_frame())
+        f.define_var(arg1)
 
 
 class CALL(Instruction):
@@ -697,9 +1551,9 @@ class PUSHS(Instruction):
         :param arg3: None
         """
         if arg1.is_variable():
-            arg1 = f.get_var(arg1.get_name(), arg1.get_frame())
+            arg1 = f.get_var(arg1)
 
-        s.push(arg1.get_value(), 'D')
+        d.push(arg1.get_value())
 
 
 class POPS(Instruction):
@@ -728,8 +1582,8 @@ class POPS(Instruction):
         :param arg2: None
         :param arg3: None
         """
-        arg1 = f.get_var(arg1.get_name(), arg1.get_frame())
-        arg1.set_value(s.pop('D'))
+        arg1 = f.get_var(arg1)
+        arg1.set_value(d.pop())
 
 
 class ADD(Instruction):
@@ -763,16 +1617,16 @@ class ADD(Instruction):
         :param arg2: int
         :param arg3: int
         """
-        arg1 = f.get_var(arg1.get_name(), arg1.get_frame())
+        arg1 = f.get_var(arg1)
 
         if arg2.is_variable():
-            arg2 = f.get_var(arg2.get_name(), arg2.get_frame())
+            arg2 = f.get_var(arg2)
             if arg2.get_var_type() != int:
                 sys.stderr.write("ERROR: Instruction ADD: argument 2 is not an int")
                 exit(53)
 
         if arg3.is_variable():
-            arg3 = f.get_var(arg3.get_name(), arg3.get_frame())
+            arg3 = f.get_var(arg3)
             if arg3.get_var_type() != int:
                 sys.stderr.write("ERROR: Instruction ADD: argument 3 is not an int")
                 exit(53)
@@ -811,16 +1665,16 @@ class SUB(Instruction):
         :param arg2: int
         :param arg3: int
         """
-        arg1 = f.get_var(arg1.get_name(), arg1.get_frame())
+        arg1 = f.get_var(arg1)
 
         if arg2.is_variable():
-            arg2 = f.get_var(arg2.get_name(), arg2.get_frame())
+            arg2 = f.get_var(arg2)
             if arg2.get_var_type() != int:
                 sys.stderr.write("ERROR: Instruction SUB: argument 2 is not an int")
                 exit(53)
 
         if arg3.is_variable():
-            arg3 = f.get_var(arg3.get_name(), arg3.get_frame())
+            arg3 = f.get_var(arg3)
             if arg3.get_var_type() != int:
                 sys.stderr.write("ERROR: Instruction SUB: argument 3 is not an int")
                 exit(53)
@@ -859,16 +1713,16 @@ class MUL(Instruction):
         :param arg2: int
         :param arg3: int
         """
-        arg1 = f.get_var(arg1.get_name(), arg1.get_frame())
+        arg1 = f.get_var(arg1)
 
         if arg2.is_variable():
-            arg2 = f.get_var(arg2.get_name(), arg2.get_frame())
+            arg2 = f.get_var(arg2)
             if arg2.get_var_type() != int:
                 sys.stderr.write("ERROR: Instruction MUL: argument 2 is not an int")
                 exit(53)
 
         if arg3.is_variable():
-            arg3 = f.get_var(arg3.get_name(), arg3.get_frame())
+            arg3 = f.get_var(arg3)
             if arg3.get_var_type() != int:
                 sys.stderr.write("ERROR: Instruction MUL: argument 3 is not an int")
                 exit(53)
@@ -907,16 +1761,16 @@ class IDIV(Instruction):
         :param arg2: int
         :param arg3: int
         """
-        arg1 = f.get_var(arg1.get_name(), arg1.get_frame())
+        arg1 = f.get_var(arg1)
 
         if arg2.is_variable():
-            arg2 = f.get_var(arg2.get_name(), arg2.get_frame())
+            arg2 = f.get_var(arg2)
             if arg2.get_var_type() != int:
                 sys.stderr.write("ERROR: Instruction IDIV: argument 2 is not an int")
                 exit(53)
 
         if arg3.is_variable():
-            arg3 = f.get_var(arg3.get_name(), arg3.get_frame())
+            arg3 = f.get_var(arg3)
             if arg3.get_var_type() != int:
                 sys.stderr.write("ERROR: Instruction IDIV: argument 3 is not an int")
                 exit(53)
@@ -961,19 +1815,28 @@ class LT(Instruction):
         :param arg2: symb
         :param arg3: symb
         """
-        arg1 = f.get_var(arg1.get_name(), arg1.get_frame())
+        arg1 = f.get_var(arg1)
+        arg1.set_value(cls.compare(arg2, arg3))
+
+    @classmethod
+    def compare(cls, arg2: Argument, arg3: Argument) -> bool:
+        """
+        Returns the result of arg2 < arg3. Shared by `execute` and the compare-and-branch superinstruction.
+        :param arg2: symb
+        :param arg3: symb
+        """
         type1 = arg2.get_type()
         type2 = arg3.get_type()
 
         if arg2.is_variable():
-            arg2 = f.get_var(arg2.get_name(), arg2.get_frame())
+            arg2 = f.get_var(arg2)
             type1 = arg2.get_var_type()
             if type1 not in (int, str, bool):
                 sys.stderr.write("ERROR: Instruction LT: wrong type of argument 2")
                 exit(53)
 
         if arg3.is_variable():
-            arg3 = f.get_var(arg3.get_name(), arg3.get_frame())
+            arg3 = f.get_var(arg3)
             type2 = arg3.get_var_type()
             if type2 not in (int, str, bool):
                 sys.stderr.write("ERROR: Instruction LT: wrong type of argument 3")
@@ -987,7 +1850,7 @@ class LT(Instruction):
             sys.stderr.write("ERROR: Instruction LT: can't compare arguments of different types")
             exit(53)
 
-        arg1.set_value(arg2.get_value() < arg3.get_value())
+        return arg2.get_value() < arg3.get_value()
 
 
 class GT(Instruction):
@@ -1022,19 +1885,28 @@ class GT(Instruction):
         :param arg2: symb
         :param arg3: symb
         """
-        arg1 = f.get_var(arg1.get_name(), arg1.get_frame())
+        arg1 = f.get_var(arg1)
+        arg1.set_value(cls.compare(arg2, arg3))
+
+    @classmethod
+    def compare(cls, arg2: Argument, arg3: Argument) -> bool:
+        """
+        Returns the result of arg2 > arg3. Shared by `execute` and the compare-and-branch superinstruction.
+        :param arg2: symb
+        :param arg3: symb
+        """
         type1 = arg2.get_type()
         type2 = arg3.get_type()
 
         if arg2.is_variable():
-            arg2 = f.get_var(arg2.get_name(), arg2.get_frame())
+            arg2 = f.get_var(arg2)
             type1 = arg2.get_var_type()
             if type1 not in (int, str, bool):
                 sys.stderr.write("ERROR: Instruction GT: wrong type of argument 2")
                 exit(53)
 
         if arg3.is_variable():
-            arg3 = f.get_var(arg3.get_name(), arg3.get_frame())
+            arg3 = f.get_var(arg3)
             type2 = arg3.get_var_type()
             if type2 not in (int, str, bool):
                 sys.stderr.write("ERROR: Instruction GT: wrong type of argument 2")
@@ -1048,7 +1920,7 @@ class GT(Instruction):
             sys.stderr.write("ERROR: Instruction GT: can't compare arguments of different types")
             exit(53)
 
-        arg1.set_value(arg2.get_value() > arg3.get_value())
+        return arg2.get_value() > arg3.get_value()
 
 
 class EQ(Instruction):
@@ -1084,19 +1956,28 @@ class EQ(Instruction):
         :param arg2: symb
         :param arg3: symb
         """
-        arg1 = f.get_var(arg1.get_name(), arg1.get_frame())
+        arg1 = f.get_var(arg1)
+        arg1.set_value(cls.compare(arg2, arg3))
+
+    @classmethod
+    def compare(cls, arg2: Argument, arg3: Argument) -> bool:
+        """
+        Returns the result of arg2 == arg3. Shared by `execute` and the compare-and-branch superinstruction.
+        :param arg2: symb
+        :param arg3: symb
+        """
         type1 = arg2.get_type()
         type2 = arg3.get_type()
 
         if arg2.is_variable():
-            arg2 = f.get_var(arg2.get_name(), arg2.get_frame())
+            arg2 = f.get_var(arg2)
             type1 = arg2.get_var_type()
             if type1 not in (int, str, bool, 'nil'):
                 sys.stderr.write("ERROR: Instruction EQ: wrong type of argument 2")
                 exit(53)
 
         if arg3.is_variable():
-            arg3 = f.get_var(arg3.get_name(), arg3.get_frame())
+            arg3 = f.get_var(arg3)
             type2 = arg3.get_var_type()
             if type2 not in (int, str, bool, 'nil'):
                 sys.stderr.write("ERROR: Instruction EQ: wrong type of argument 3")
@@ -1108,9 +1989,8 @@ class EQ(Instruction):
             exit(53)
 
         if type1 != type2:
-            arg1.set_value(False)
-        else:
-            arg1.set_value(arg2.get_value() == arg3.get_value())
+            return False
+        return arg2.get_value() == arg3.get_value()
 
 
 class AND(Instruction):
@@ -1144,16 +2024,16 @@ class AND(Instruction):
         :param arg2: bool
         :param arg3: bool
         """
-        arg1 = f.get_var(arg1.get_name(), arg1.get_frame())
+        arg1 = f.get_var(arg1)
 
         if arg2.is_variable():
-            arg2 = f.get_var(arg2.get_name(), arg2.get_frame())
+            arg2 = f.get_var(arg2)
             if arg2.get_var_type() != bool:
                 sys.stderr.write("ERROR: Instruction AND: argument 2 is not a bool")
                 exit(53)
 
         if arg3.is_variable():
-            arg3 = f.get_var(arg3.get_name(), arg3.get_frame())
+            arg3 = f.get_var(arg3)
             if arg3.get_var_type() != bool:
                 sys.stderr.write("ERROR: Instruction AND: argument 3 is not an bool")
                 exit(53)
@@ -1192,16 +2072,16 @@ class OR(Instruction):
         :param arg2: bool
         :param arg3: bool
         """
-        arg1 = f.get_var(arg1.get_name(), arg1.get_frame())
+        arg1 = f.get_var(arg1)
 
         if arg2.is_variable():
-            arg2 = f.get_var(arg2.get_name(), arg2.get_frame())
+            arg2 = f.get_var(arg2)
             if arg2.get_var_type() != bool:
                 sys.stderr.write("ERROR: Instruction OR: argument 2 is not a bool")
                 exit(53)
 
         if arg3.is_variable():
-            arg3 = f.get_var(arg3.get_name(), arg3.get_frame())
+            arg3 = f.get_var(arg3)
             if arg3.get_var_type() != bool:
                 sys.stderr.write("ERROR: Instruction OR: argument 3 is not an bool")
                 exit(53)
@@ -1239,10 +2119,10 @@ class NOT(Instruction):
         :param arg2: bool
         :param arg3: None
         """
-        arg1 = f.get_var(arg1.get_name(), arg1.get_frame())
+        arg1 = f.get_var(arg1)
 
         if arg2.is_variable():
-            arg2 = f.get_var(arg2.get_name(), arg2.get_frame())
+            arg2 = f.get_var(arg2)
             if arg2.get_var_type() != bool:
                 sys.stderr.write("ERROR: Instruction NOT: argument 2 is not a bool")
                 exit(53)
@@ -1280,17 +2160,17 @@ class INT2CHAR(Instruction):
         :param arg2: int
         :param arg3: None
         """
-        arg1 = f.get_var(arg1.get_name(), arg1.get_frame())
+        arg1 = f.get_var(arg1)
 
         if arg2.is_variable():
-            arg2 = f.get_var(arg2.get_name(), arg2.get_frame())
+            arg2 = f.get_var(arg2)
             if arg2.get_var_type() != int:
                 sys.stderr.write("ERROR: Instruction INT2CHAR: argument 2 is not an int")
                 exit(53)
 
         try:
             arg1.set_value(chr(arg2.get_value()))
-        except ValueError:
+        except (ValueError, OverflowError):
             sys.stderr.write("ERROR: Instruction INT2CHAR: invalid value or arg2")
             exit(58)
 
@@ -1329,16 +2209,16 @@ class STRI2INT(Instruction):
         :param arg2: string
         :param arg3: int
         """
-        arg1 = f.get_var(arg1.get_name(), arg1.get_frame())
+        arg1 = f.get_var(arg1)
 
         if arg2.is_variable():
-            arg2 = f.get_var(arg2.get_name(), arg2.get_frame())
+            arg2 = f.get_var(arg2)
             if arg2.get_var_type() != str:
                 sys.stderr.write("ERROR: Instruction STRI2INT: argument 2 is not a string")
                 exit(53)
 
         if arg3.is_variable():
-            arg3 = f.get_var(arg3.get_name(), arg3.get_frame())
+            arg3 = f.get_var(arg3)
             if arg3.get_var_type() != int:
                 sys.stderr.write("ERROR: Instruction STRI2INT: argument 3 is not an int")
                 exit(53)
@@ -1360,6 +2240,7 @@ class STRI2INT(Instruction):
 class READ(Instruction):
     """
     Instruction READ from IPPcode23 requires 2 arguments of type variable and type.
+    The number of lines read from the input, saved by checkpoints, is in the global `LinesRead`.
     """
 
     def __init__(self, arg_num: int, arguments: list, types: list):
@@ -1388,20 +2269,22 @@ class READ(Instruction):
         :param arg2: type
         :param arg3: None
         """
-        arg1 = f.get_var(arg1.get_name(), arg1.get_frame())
+        global LinesRead
+        arg1 = f.get_var(arg1)
 
         if arg2.is_variable():
-            arg2 = f.get_var(arg2.get_name(), arg2.get_frame())
+            arg2 = f.get_var(arg2)
             if arg2.get_var_type() != type:
                 sys.stderr.write("ERROR: Instruction READ: argument 2 is not a valid type")
                 exit(53)
 
         try:
             #  get value from input  #
-            if args.input is None:
+            if Input is None:
                 value = input()
             else:
                 value = Input.pop()
+            LinesRead += 1
             # ---------------------- #
             in_type = arg2.get_value()
             # true of any case => True; anything else => False
@@ -1413,8 +2296,7 @@ class READ(Instruction):
             elif in_type == int:
                 value = int(value)
             elif in_type == str:
-                for ch in set(re.findall(r'\\\d{3}', value)):
-                    value = value.replace(ch, chr(int(ch[1:])))
+                value = decode_escapes(value)
             else:
                 sys.stderr.write("ERROR: Instruction READ: type must be int, string or bool")
                 exit(53)
@@ -1423,6 +2305,20 @@ class READ(Instruction):
 
         arg1.set_value(value)
 
+    @staticmethod
+    def skip_lines(count: int) -> None:
+        """
+        Skips lines of the input already read before a checkpoint.
+        :param count: number of lines
+        """
+        global LinesRead
+        if Input is None:
+            for _ in range(count):
+                sys.stdin.readline()
+        else:
+            del Input[max(len(Input) - count, 0):]
+        LinesRead = count
+
 
 class WRITE(Instruction):
     """
@@ -1451,7 +2347,7 @@ class WRITE(Instruction):
         :param arg3: None
         """
         if arg1.is_variable():
-            arg1 = f.get_var(arg1.get_name(), arg1.get_frame())
+            arg1 = f.get_var(arg1)
 
         val = arg1.get_value()
         if arg1.get_type() == 'nil' or arg1.get_var_type() == 'nil':
@@ -1466,6 +2362,9 @@ class WRITE(Instruction):
 class CONCAT(Instruction):
     """
     Instruction CONCAT from IPPcode23 requires 3 arguments of type variable, string and string.
+    CONCAT is the only instruction which makes strings longer, so it enforces `--max-string` itself. A check every
+    few instructions wouldn't stop a string doubled in a loop before it takes all the memory. The limit is read from
+    the global `args`, so every job of the async server has its own.
     """
 
     def __init__(self, arg_num: int, arguments: list, types: list):
@@ -1494,21 +2393,24 @@ class CONCAT(Instruction):
         :param arg2: string
         :param arg3: string
         """
-        arg1 = f.get_var(arg1.get_name(), arg1.get_frame())
+        arg1 = f.get_var(arg1)
 
         if arg2.is_variable():
-            arg2 = f.get_var(arg2.get_name(), arg2.get_frame())
+            arg2 = f.get_var(arg2)
             if arg2.get_var_type() != str:
                 sys.stderr.write("ERROR: Instruction CONCAT: argument 2 is not a string")
                 exit(53)
 
         if arg3.is_variable():
-            arg3 = f.get_var(arg3.get_name(), arg3.get_frame())
+            arg3 = f.get_var(arg3)
             if arg3.get_var_type() != str:
                 sys.stderr.write("ERROR: Instruction CONCAT: argument 3 is not a string")
                 exit(53)
 
-        arg1.set_value(arg2.get_value() + arg3.get_value())
+        value = arg2.get_value() + arg3.get_value()
+        if args.max_string is not None and len(value) > args.max_string:
+            Limits.stop('--max-string', 'CONCAT')
+        arg1.set_value(value)
 
 
 class STRLEN(Instruction):
@@ -1531,7 +2433,7 @@ class STRLEN(Instruction):
             sys.stderr.write("ERROR: Instruction STRLEN: argument 2 is not a variable or a string")
             exit(53)
 
-        super().__init__("CONCAT", arg1, arg2)
+        super().__init__("STRLEN", arg1, arg2)
 
     @classmethod
     def execute(cls, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
@@ -1541,10 +2443,10 @@ class STRLEN(Instruction):
         :param arg2: string
         :param arg3: None
         """
-        arg1 = f.get_var(arg1.get_name(), arg1.get_frame())
+        arg1 = f.get_var(arg1)
 
         if arg2.is_variable():
-            arg2 = f.get_var(arg2.get_name(), arg2.get_frame())
+            arg2 = f.get_var(arg2)
             if arg2.get_var_type() != str:
                 sys.stderr.write("ERROR: Instruction CONCAT: argument 2 is not a string")
                 exit(53)
@@ -1586,16 +2488,16 @@ class GETCHAR(Instruction):
         :param arg2: string
         :param arg3: int
         """
-        arg1 = f.get_var(arg1.get_name(), arg1.get_frame())
+        arg1 = f.get_var(arg1)
 
         if arg2.is_variable():
-            arg2 = f.get_var(arg2.get_name(), arg2.get_frame())
+            arg2 = f.get_var(arg2)
             if arg2.get_var_type() != str:
                 sys.stderr.write("ERROR: Instruction GETCHAR: argument 2 is not a string")
                 exit(53)
 
         if arg3.is_variable():
-            arg3 = f.get_var(arg3.get_name(), arg3.get_frame())
+            arg3 = f.get_var(arg3)
             if arg3.get_var_type() != int:
                 sys.stderr.write("ERROR: Instruction GETCHAR: argument 3 is not an int")
                 exit(53)
@@ -1640,19 +2542,19 @@ class SETCHAR(Instruction):
         :param arg2: int
         :param arg3: string
         """
-        arg1 = f.get_var(arg1.get_name(), arg1.get_frame())
+        arg1 = f.get_var(arg1)
         if arg1.get_var_type() != str:
             sys.stderr.write("ERROR: Instruction SETCHAR: argument 1 is not a string")
             exit(53)
 
         if arg2.is_variable():
-            arg2 = f.get_var(arg2.get_name(), arg2.get_frame())
+            arg2 = f.get_var(arg2)
             if arg2.get_var_type() != int:
                 sys.stderr.write("ERROR: Instruction SETCHAR: argument 2 is not an int")
                 exit(53)
 
         if arg3.is_variable():
-            arg3 = f.get_var(arg3.get_name(), arg3.get_frame())
+            arg3 = f.get_var(arg3)
             if arg3.get_var_type() != str:
                 sys.stderr.write("ERROR: Instruction SETCHAR: argument 3 is not a string")
                 exit(53)
@@ -1695,11 +2597,11 @@ class TYPE(Instruction):
         :param arg2: symb
         :param arg3: None
         """
-        arg1 = f.get_var(arg1.get_name(), arg1.get_frame())
+        arg1 = f.get_var(arg1)
 
         my_type = arg2.get_type()
         if my_type == 'var':
-            arg2 = f.get_var(arg2.get_name(), arg2.get_frame())
+            arg2 = f.get_var(arg2)
             my_type = arg2.get_var_type()
             if my_type is None:
                 my_type = ''
@@ -1810,14 +2712,14 @@ class JUMPIFEQ(Instruction):
         type2 = arg3.get_type()
 
         if arg2.is_variable():
-            arg2 = f.get_var(arg2.get_name(), arg2.get_frame())
+            arg2 = f.get_var(arg2)
             type1 = arg2.get_var_type()
             if type1 not in (int, str, bool, 'nil'):
                 sys.stderr.write("ERROR: Instruction JUMPIFEQ: wrong type of argument 2")
                 exit(53)
 
         if arg3.is_variable():
-            arg3 = f.get_var(arg3.get_name(), arg3.get_frame())
+            arg3 = f.get_var(arg3)
             type2 = arg3.get_var_type()
             if type2 not in (int, str, bool, 'nil'):
                 sys.stderr.write("ERROR: Instruction JUMPIFEQ: wrong type of argument 3")
@@ -1868,14 +2770,14 @@ class JUMPIFNEQ(Instruction):
         type2 = arg3.get_type()
 
         if arg2.is_variable():
-            arg2 = f.get_var(arg2.get_name(), arg2.get_frame())
+            arg2 = f.get_var(arg2)
             type1 = arg2.get_var_type()
             if type1 not in (int, str, bool, 'nil'):
                 sys.stderr.write("ERROR: Instruction JUMPIFNEQ: wrong type of argument 2")
                 exit(53)
 
         if arg3.is_variable():
-            arg3 = f.get_var(arg3.get_name(), arg3.get_frame())
+            arg3 = f.get_var(arg3)
             type2 = arg3.get_var_type()
             if type2 not in (int, str, bool, 'nil'):
                 sys.stderr.write("ERROR: Instruction JUMPIFNEQ: wrong type of argument 3")
@@ -1911,7 +2813,7 @@ class EXIT(Instruction):
     @classmethod
     def execute(cls, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
         if arg1.is_variable():
-            arg1 = f.get_var(arg1.get_name(), arg1.get_frame())
+            arg1 = f.get_var(arg1)
             if arg1.get_var_type != int:
                 sys.stderr.write("ERROR: Instruction EXIT: argument 1 is not an int")
                 exit(53)
@@ -1951,7 +2853,7 @@ class DPRINT(Instruction):
         :param arg3: None
         """
         if arg1.is_variable():
-            arg1 = f.get_var(arg1.get_name(), arg1.get_frame())
+            arg1 = f.get_var(arg1)
 
         val = arg1.get_value()
         if arg1.get_type() == 'nil' or arg1.get_var_type() == 'nil':
@@ -1984,200 +2886,2594 @@ class BREAK(Instruction):
         :param arg3: None
         """
         sys.stderr.write('\n' + 'Labels => ' + s.ret_all('L') + '\n')
-        sys.stderr.write('Data stack => ' + s.ret_all('D') + '\n')
-        sys.stderr.write('Call stack => ' + s.ret_all('C') + '\n\n')
+        sys.stderr.write('Data stack => ' + d.ret_all() + '\n')
+        sys.stderr.write('Call stack => ' + s.ret_all('C') + '\n')
+        sys.stderr.write('Memory => ' + MemoryAccount().ret_all() + '\n\n')
 
 
-class Factory:
-    @classmethod
-    def resolve(cls, opcode: str, num_of_args: int, value_list: list, type_list: list) -> Instruction:
-        if opcode.upper() == 'MOVE':
-            return MOVE(num_of_args, value_list, type_list)
-        elif opcode.upper() == 'CREATEFRAME':
-            return CREATEFRAME(num_of_args, value_list, type_list)
-        elif opcode.upper() == 'PUSHFRAME':
-            return PUSHFRAME(num_of_args, value_list, type_list)
-        elif opcode.upper() == 'POPFRAME':
-            return POPFRAME(num_of_args, value_list, type_list)
-        elif opcode.upper() == 'DEFVAR':
-            return DEFVAR(num_of_args, value_list, type_list)
-        elif opcode.upper() == 'CALL':
-            return CALL(num_of_args, value_list, type_list)
-        elif opcode.upper() == 'RETURN':
-            return RETURN(num_of_args, value_list, type_list)
+class StackInstruction(Instruction):
+    """
+    Parent class of the stack variants of IPPcode23 instructions (CLEARS, ADDS, ...). The operands are taken from
+    the data stack and the result is pushed back, so only the conditional jumps have an argument of type label.
+    :var _ArgNum: number of arguments required by the instruction
+    """
+    _ArgNum = 0
 
-        elif opcode.upper() == 'PUSHS':
-            return PUSHS(num_of_args, value_list, type_list)
-        elif opcode.upper() == 'POPS':
-            return POPS(num_of_args, value_list, type_list)
+    def __init__(self, arg_num: int, arguments: list, types: list) -> None:
+        name = type(self).__name__
+        if arg_num != self._ArgNum:
+            sys.stderr.write("ERROR: Instruction " + name + " got " + str(arg_num) + " arguments, " +
+                             str(self._ArgNum) + " arguments expected")
+            exit(32)
 
-        elif opcode.upper() == 'ADD':
-            return ADD(num_of_args, value_list, type_list)
-        elif opcode.upper() == 'SUB':
-            return SUB(num_of_args, value_list, type_list)
-        elif opcode.upper() == 'MUL':
-            return MUL(num_of_args, value_list, type_list)
-        elif opcode.upper() == 'IDIV':
-            return IDIV(num_of_args, value_list, type_list)
-        elif opcode.upper() == 'LT':
-            return LT(num_of_args, value_list, type_list)
-        elif opcode.upper() == 'GT':
-            return GT(num_of_args, value_list, type_list)
-        elif opcode.upper() == 'EQ':
-            return EQ(num_of_args, value_list, type_list)
-        elif opcode.upper() == 'AND':
-            return AND(num_of_args, value_list, type_list)
-        elif opcode.upper() == 'OR':
-            return OR(num_of_args, value_list, type_list)
-        elif opcode.upper() == 'NOT':
-            return NOT(num_of_args, value_list, type_list)
-        elif opcode.upper() == 'INT2CHAR':
-            return INT2CHAR(num_of_args, value_list, type_list)
-        elif opcode.upper() == 'STRI2INT':
-            return STRI2INT(num_of_args, value_list, type_list)
+        if self._ArgNum:
+            arg1 = Argument(types[0], arguments[0])
+            if arg1.get_type() != 'label':
+                sys.stderr.write("ERROR: Instruction " + name + ": argument 1 is not of type label")
+                exit(53)
+            super().__init__(name, arg1)
+        else:
+            super().__init__(name)
 
-        elif opcode.upper() == 'READ':
-            return READ(num_of_args, value_list, type_list)
-        elif opcode.upper() == 'WRITE':
-            return WRITE(num_of_args, value_list, type_list)
+    @classmethod
+    def pop_operands(cls, *types: type) -> tuple:
+        """
+        Method pops one value for each type in `types` from the data stack and checks their types. The last value
+        is taken from the top of the stack.
+        :param types: required types of the values
+        :return: values in the order they were pushed
+        """
+        values = d.pop_many(len(types))
+        for value, required in zip(values, types):
+            if DataStack.type_of(value) != required:
+                sys.stderr.write("ERROR: Instruction " + cls.__name__ + ": wrong type of operand on the data stack")
+                exit(53)
+        return values
 
-        elif opcode.upper() == 'CONCAT':
-            return CONCAT(num_of_args, value_list, type_list)
-        elif opcode.upper() == 'STRLEN':
-            return STRLEN(num_of_args, value_list, type_list)
-        elif opcode.upper() == 'GETCHAR':
-            return GETCHAR(num_of_args, value_list, type_list)
-        elif opcode.upper() == 'SETCHAR':
-            return SETCHAR(num_of_args, value_list, type_list)
+    @classmethod
+    def equal(cls, symb1, symb2) -> bool:
+        """
+        Returns True if the values are equal. Values of different types can be compared only if one of them is nil.
+        Shared by EQS, JUMPIFEQS and JUMPIFNEQS.
+        """
+        type1 = DataStack.type_of(symb1)
+        type2 = DataStack.type_of(symb2)
+        if type1 != type2:
+            if type1 != 'nil' and type2 != 'nil':
+                sys.stderr.write("ERROR: Instruction " + cls.__name__ + ": can't compare operands of different types "
+                                 "unless one of them is of type nil")
+                exit(53)
+            return False
+        return symb1 == symb2
 
-        elif opcode.upper() == 'TYPE':
-            return TYPE(num_of_args, value_list, type_list)
-        elif opcode.upper() == 'LABEL':
-            return LABEL(num_of_args, value_list, type_list)
-        elif opcode.upper() == 'JUMP':
-            return JUMP(num_of_args, value_list, type_list)
-        elif opcode.upper() == 'JUMPIFEQ':
-            return JUMPIFEQ(num_of_args, value_list, type_list)
-        elif opcode.upper() == 'JUMPIFNEQ':
-            return JUMPIFNEQ(num_of_args, value_list, type_list)
-        elif opcode.upper() == 'EXIT':
-            return EXIT(num_of_args, value_list, type_list)
 
-        elif opcode.upper() == 'DPRINT':
-            return DPRINT(num_of_args, value_list, type_list)
-        elif opcode.upper() == 'BREAK':
-            return BREAK(num_of_args, value_list, type_list)
-        else:
-            sys.stderr.write('ERROR: unknown instruction\n')
-            exit(32)
+class CLEARS(StackInstruction):
+    """
+    Instruction CLEARS from IPPcode23 requires 0 arguments.
+    """
 
+    @classmethod
+    def execute(cls, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
+        """
+        Removes all values from the data stack.
+        :param arg1: None
+        :param arg2: None
+        :param arg3: None
+        """
+        d.clear()
 
-# ______ERRORS______
-#   XML ERRORs
-#   31 - XML file is not well-formed
-#   32 - unexpected XML structure   (dupes)
 
-#  project ERRORs
-#   10      - missing parameter
-#   11      - error when opening input files    - argparse errno 13
-#   12      - error when opening output files
+class ADDS(StackInstruction):
+    """
+    Instruction ADDS from IPPcode23 requires 0 arguments.
+    """
 
-#  Interpreter ERRORs
-#   52      - semantic ERROR in input   (unknown instruction, undef label or var redef)
-#   53      - wrong operand types
-#   54      - non-existing variable access (within existing frame)
-#   55      - non-existing frame
-#   56      - missing value
-#   57      - wrong operand value (div by 0)
-#   58      - wrong string operation
+    @classmethod
+    def execute(cls, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
+        """
+        Pops two ints from the data stack and pushes their sum.
+        :param arg1: None
+        :param arg2: None
+        :param arg3: None
+        """
+        symb1, symb2 = cls.pop_operands(int, int)
+        d.push(symb1 + symb2)
 
-#  Internal ERROR - 99
 
+class SUBS(StackInstruction):
+    """
+    Instruction SUBS from IPPcode23 requires 0 arguments.
+    """
 
-#   parameters
-#   --help
-#   --source=FILE   - XML code
-#   --input=FILE    - input of instructions
-if __name__ == '__main__':
-    c = Counter()
-    f = Frame()
-    s = Stack()
-    # Argument parse:
-    # Check if there are other arguments alongside HELP
-    if len(sys.argv) != 2:
-        for arg in sys.argv:
-            if arg == '-h' or arg == '--help':
-                sys.stderr.write('ERROR: help has to be the only argument passed')
-                exit(10)
+    @classmethod
+    def execute(cls, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
+        """
+        Pops two ints from the data stack and pushes their difference.
+        :param arg1: None
+        :param arg2: None
+        :param arg3: None
+        """
+        symb1, symb2 = cls.pop_operands(int, int)
+        d.push(symb1 - symb2)
 
-    # create argparse parser
-    parser = argparse.ArgumentParser(
-        exit_on_error=False,
-        description='Python interpreter of IPPcode23',
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog=textwrap.dedent('''\
-        Either '--source' or '--input' argument required
-            - STDIN will then be regarded as the other one
-        '''))
-    parser.add_argument("--source", metavar='file', type=argparse.FileType('r'), help='file containing XML code')
-    parser.add_argument("--input", metavar='file', type=argparse.FileType('r'),
-                        help='input of XML instructions (e.g. READ)')
+
+class MULS(StackInstruction):
+    """
+    Instruction MULS from IPPcode23 requires 0 arguments.
+    """
+
+    @classmethod
+    def execute(cls, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
+        """
+        Pops two ints from the data stack and pushes their product.
+        :param arg1: None
+        :param arg2: None
+        :param arg3: None
+        """
+        symb1, symb2 = cls.pop_operands(int, int)
+        d.push(symb1 * symb2)
+
+
+class IDIVS(StackInstruction):
+    """
+    Instruction IDIVS from IPPcode23 requires 0 arguments.
+    """
+
+    @classmethod
+    def execute(cls, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
+        """
+        Pops two ints from the data stack and pushes their fraction.
+        :param arg1: None
+        :param arg2: None
+        :param arg3: None
+        """
+        symb1, symb2 = cls.pop_operands(int, int)
+        if symb2 == 0:
+            sys.stderr.write("ERROR: Instruction IDIVS: zero division")
+            exit(57)
+        d.push(int(symb1 / symb2))
+
+
+class LTS(StackInstruction):
+    """
+    Instruction LTS from IPPcode23 requires 0 arguments.
+    """
+
+    @classmethod
+    def execute(cls, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
+        """
+        Pops two values of the same type from the data stack and pushes True if the first one is lesser.
+        :param arg1: None
+        :param arg2: None
+        :param arg3: None
+        """
+        symb1, symb2 = d.pop_many(2)
+        if not DataStack.type_of(symb1) == DataStack.type_of(symb2) != 'nil':
+            sys.stderr.write("ERROR: Instruction LTS: can't compare operands of different types or of type nil")
+            exit(53)
+        d.push(symb1 < symb2)
+
+
+class GTS(StackInstruction):
+    """
+    Instruction GTS from IPPcode23 requires 0 arguments.
+    """
+
+    @classmethod
+    def execute(cls, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
+        """
+        Pops two values of the same type from the data stack and pushes True if the first one is greater.
+        :param arg1: None
+        :param arg2: None
+        :param arg3: None
+        """
+        symb1, symb2 = d.pop_many(2)
+        if not DataStack.type_of(symb1) == DataStack.type_of(symb2) != 'nil':
+            sys.stderr.write("ERROR: Instruction GTS: can't compare operands of different types or of type nil")
+            exit(53)
+        d.push(symb1 > symb2)
+
+
+class EQS(StackInstruction):
+    """
+    Instruction EQS from IPPcode23 requires 0 arguments.
+    """
+
+    @classmethod
+    def execute(cls, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
+        """
+        Pops two values from the data stack and pushes True if they are equal. Comparing nil and value other than nil
+        pushes False.
+        :param arg1: None
+        :param arg2: None
+        :param arg3: None
+        """
+        symb1, symb2 = d.pop_many(2)
+        d.push(cls.equal(symb1, symb2))
+
+
+class ANDS(StackInstruction):
+    """
+    Instruction ANDS from IPPcode23 requires 0 arguments.
+    """
+
+    @classmethod
+    def execute(cls, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
+        """
+        Pops two bools from the data stack and pushes the result of logical operation `and` between them.
+        :param arg1: None
+        :param arg2: None
+        :param arg3: None
+        """
+        symb1, symb2 = cls.pop_operands(bool, bool)
+        d.push(symb1 and symb2)
+
+
+class ORS(StackInstruction):
+    """
+    Instruction ORS from IPPcode23 requires 0 arguments.
+    """
+
+    @classmethod
+    def execute(cls, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
+        """
+        Pops two bools from the data stack and pushes the result of logical operation `or` between them.
+        :param arg1: None
+        :param arg2: None
+        :param arg3: None
+        """
+        symb1, symb2 = cls.pop_operands(bool, bool)
+        d.push(symb1 or symb2)
+
+
+class NOTS(StackInstruction):
+    """
+    Instruction NOTS from IPPcode23 requires 0 arguments.
+    """
+
+    @classmethod
+    def execute(cls, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
+        """
+        Pops a bool from the data stack and pushes the result of logical operation `not`.
+        :param arg1: None
+        :param arg2: None
+        :param arg3: None
+        """
+        symb1, = cls.pop_operands(bool)
+        d.push(not symb1)
+
+
+class INT2CHARS(StackInstruction):
+    """
+    Instruction INT2CHARS from IPPcode23 requires 0 arguments.
+    """
+
+    @classmethod
+    def execute(cls, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
+        """
+        Pops an int from the data stack and pushes the character with that Unicode value.
+        :param arg1: None
+        :param arg2: None
+        :param arg3: None
+        """
+        symb1, = cls.pop_operands(int)
+        try:
+            d.push(chr(symb1))
+        except (ValueError, OverflowError):
+            sys.stderr.write("ERROR: Instruction INT2CHARS: invalid value on the data stack")
+            exit(58)
+
+
+class STRI2INTS(StackInstruction):
+    """
+    Instruction STRI2INTS from IPPcode23 requires 0 arguments.
+    """
+
+    @classmethod
+    def execute(cls, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
+        """
+        Pops a string and an index from the data stack and pushes the Unicode value of the character on the index.
+        :param arg1: None
+        :param arg2: None
+        :param arg3: None
+        """
+        symb1, symb2 = cls.pop_operands(str, int)
+        if not 0 <= symb2 < len(symb1):
+            sys.stderr.write("ERROR: Instruction STRI2INTS: index outside of the string")
+            exit(58)
+        d.push(ord(symb1[symb2]))
+
+
+class JUMPIFEQS(StackInstruction):
+    """
+    Instruction JUMPIFEQS from IPPcode23 requires 1 argument of type label.
+    """
+    _ArgNum = 1
+
+    @classmethod
+    def execute(cls, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
+        """
+        Pops two values from the data stack and jumps to the label specified by arg1 if they are equal.
+        :param arg1: label
+        :param arg2: None
+        :param arg3: None
+        """
+        symb1, symb2 = d.pop_many(2)
+        if cls.equal(symb1, symb2):
+            JUMP.execute(arg1, None, None)
+
+
+class JUMPIFNEQS(StackInstruction):
+    """
+    Instruction JUMPIFNEQS from IPPcode23 requires 1 argument of type label.
+    """
+    _ArgNum = 1
+
+    @classmethod
+    def execute(cls, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
+        """
+        Pops two values from the data stack and jumps to the label specified by arg1 if they are not equal.
+        :param arg1: label
+        :param arg2: None
+        :param arg3: None
+        """
+        symb1, symb2 = d.pop_many(2)
+        if not cls.equal(symb1, symb2):
+            JUMP.execute(arg1, None, None)
+
+
+class MOVES(Instruction):
+    """
+    Superinstruction MOVES replaces the pair `PUSHS symb` + `POPS var` produced by the peephole optimizer. The value
+    is moved directly without going through the data stack.
+    """
+
+    def __init__(self, pushs: Instruction, pops: Instruction) -> None:
+        super().__init__("MOVES", pops.get_arg(1), pushs.get_arg(1))
+
+    @classmethod
+    def execute(cls, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
+        """
+        Saves the value of arg2 to a variable specified by arg1. Unlike MOVE, arg2 is resolved first, the same way
+        the original PUSHS would have done it.
+        :param arg1: var
+        :param arg2: symb
+        :param arg3: None
+        """
+        if arg2.is_variable():
+            arg2 = f.get_var(arg2)
+        value = arg2.get_value()
+
+        f.get_var(arg1).set_value(value)
+
+
+class INC(Instruction):
+    """
+    Superinstruction INC replaces `ADD var var int@1`.
+    """
+
+    def __init__(self, add: Instruction) -> None:
+        super().__init__("INC", add.get_arg(1))
+
+    @classmethod
+    def execute(cls, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
+        """
+        Adds 1 to the int variable specified by arg1.
+        :param arg1: var
+        :param arg2: None
+        :param arg3: None
+        """
+        arg1 = f.get_var(arg1)
+        value = arg1.get_int()
+        if value is None:
+            sys.stderr.write("ERROR: Instruction ADD: argument 2 is not an int")
+            exit(53)
+
+        arg1.set_int(value + 1)
+
+
+class INCJUMP(Instruction):
+    """
+    Superinstruction INCJUMP replaces the pair `ADD var var int@1` + `JUMP label`, which closes most counting loops.
+    """
+
+    def __init__(self, add: Instruction, jump: Instruction) -> None:
+        super().__init__("INCJUMP", add.get_arg(1), jump.get_arg(1))
+
+    @classmethod
+    def execute(cls, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
+        """
+        Adds 1 to the int variable specified by arg1 and jumps to the label specified by arg2.
+        :param arg1: var
+        :param arg2: label
+        :param arg3: None
+        """
+        INC.execute(arg1, None, None)
+        JUMP.execute(arg2, None, None)
+
+
+class CMPJUMP(Instruction):
+    """
+    Superinstruction CMPJUMP replaces the pair `LT|GT|EQ var symb symb` + `JUMPIFEQ|JUMPIFNEQ label var bool@...`.
+    The result of the comparison is still saved to the variable, since it may be read later.
+    :var _Compare: class of the fused comparison (LT, GT or EQ)
+    :var _Label: label argument of the fused conditional jump
+    :var _Expected: the comparison result for which the jump is taken
+    """
+    _Stateful = True
+
+    def __init__(self, compare: Instruction, branch: Instruction, expected: bool, opcode: str = "CMPJUMP") -> None:
+        self._Compare = type(compare)
+        self._Label = branch.get_arg(1)
+        self._Expected = expected
+        super().__init__(opcode, compare.get_arg(1), compare.get_arg(2), compare.get_arg(3))
+
+    def execute(self, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
+        """
+        Saves the result of the comparison of arg2 and arg3 to a variable specified by arg1 and jumps if the result
+        is the expected one.
+        :param arg1: var
+        :param arg2: symb
+        :param arg3: symb
+        """
+        arg1 = f.get_var(arg1)
+        result = self._Compare.compare(arg2, arg3)
+        arg1.set_value(result)
+
+        if result is self._Expected:
+            JUMP.execute(self._Label, None, None)
+
+    def get_label(self) -> Argument:
+        """
+        Method returns the label argument of the fused conditional jump.
+        """
+        return self._Label
+
+
+class INCCMPJUMP(CMPJUMP):
+    """
+    Superinstruction INCCMPJUMP replaces the triple `ADD var var int@1` + CMPJUMP, which closes do-while loops.
+    :var _Counter: the incremented variable
+    """
+
+    def __init__(self, add: Instruction, compare: Instruction, branch: Instruction, expected: bool) -> None:
+        self._Counter = add.get_arg(1)
+        super().__init__(compare, branch, expected, "INCCMPJUMP")
+
+    def execute(self, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
+        """
+        Adds 1 to the counter and executes the fused compare-and-branch.
+        :param arg1: var
+        :param arg2: symb
+        :param arg3: symb
+        """
+        INC.execute(self._Counter, None, None)
+        super().execute(arg1, arg2, arg3)
+
+    def get_counter(self) -> Argument:
+        """
+        Method returns the incremented variable.
+        """
+        return self._Counter
+
+
+class IntKernel(Instruction):
+    """
+    Parent class of the integer kernel, which replaces ADD, SUB, MUL and IDIV with variables or int constants as
+    operands. Names and frames of variables and values of constants are bound when the program is loaded, so execution
+    doesn't ask the Arguments for them, and the result is saved by the typed store `Argument.set_int`.
+    Subclasses differ by kinds of operands: INT_VV (var op var), INT_VC (var op const) and INT_CV (const op var).
+    :var _Generic: the replaced class, its name is used in error messages
+    :var _Operation: function computing the result
+    :var _Dst: operand Argument of the result variable
+    :var _Left: operand Argument of a variable or value of a constant operand
+    :var _Right: operand Argument of a variable or value of a constant operand
+    """
+    _Stateful = True
+    _Operations = {
+        'ADD': operator.add,
+        'SUB': operator.sub,
+        'MUL': operator.mul,
+        'IDIV': lambda left, right: int(left / right),
+    }
+
+    def __init__(self, instr: Instruction) -> None:
+        self._Generic = type(instr)
+        self._Operation = self._Operations[self._Generic.__name__]
+        self._Dst = instr.get_arg(1)
+        self._Left = self._bind(instr.get_arg(2))
+        self._Right = self._bind(instr.get_arg(3))
+        super().__init__(self._Generic.__name__ + type(self).__name__[3:], instr.get_arg(1), instr.get_arg(2),
+                         instr.get_arg(3))
+
+    @staticmethod
+    def _bind(arg: Argument) -> Argument | int:
+        return arg if arg.is_variable() else arg.get_value()
+
+    def _operand(self, bound: Argument, num: int) -> int:
+        """
+        Method returns the value of a variable operand and checks that it is an int.
+        :param bound: operand Argument of the variable
+        :param num: number of the argument, used in the error message
+        """
+        value = f.get_var(bound).get_int()
+        if value is None:
+            sys.stderr.write("ERROR: Instruction " + self._Generic.__name__ + ": argument " + str(num) +
+                             " is not an int")
+            exit(53)
+        return value
+
+    def _store(self, dst: Argument, left: int, right: int) -> None:
+        if right == 0 and self._Generic is IDIV:
+            sys.stderr.write("ERROR: Instruction IDIV: zero division")
+            exit(57)
+        dst.set_int(self._Operation(left, right))
+
+
+class INT_VV(IntKernel):
+    """
+    Integer kernel instruction with two variable operands.
+    """
+
+    def execute(self, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
+        dst = f.get_var(self._Dst)
+        left = self._operand(self._Left, 2)
+        self._store(dst, left, self._operand(self._Right, 3))
+
+
+class INT_VC(IntKernel):
+    """
+    Integer kernel instruction with a variable and a constant operand. IDIV by a constant 0 is never specialized,
+    so the zero check is left out.
+    """
+
+    def execute(self, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
+        dst = f.get_var(self._Dst)
+        dst.set_int(self._Operation(self._operand(self._Left, 2), self._Right))
+
+
+class INT_CV(IntKernel):
+    """
+    Integer kernel instruction with a constant and a variable operand.
+    """
+
+    def execute(self, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
+        dst = f.get_var(self._Dst)
+        self._store(dst, self._Left, self._operand(self._Right, 3))
+
+
+class PUSHR(Instruction):
+    """
+    Instruction PUSHR replaces PUSHS lowered by `StackLowering`. The value is saved to a register instead of
+    the data stack.
+    :var _Register: number of the register
+    """
+    _Stateful = True
+
+    def __init__(self, pushs: Instruction, register: int) -> None:
+        self._Register = register
+        super().__init__("PUSHR", pushs.get_arg(1))
+
+    def execute(self, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
+        """
+        Saves the value of arg1 to the register.
+        :param arg1: var
+        :param arg2: None
+        :param arg3: None
+        """
+        d.set_register(self._Register, f.get_var(arg1).get_value())
+
+
+class POPR(Instruction):
+    """
+    Instruction POPR replaces POPS lowered by `StackLowering`. The value is taken from a register instead of
+    the data stack.
+    :var _Register: number of the register
+    """
+    _Stateful = True
+
+    def __init__(self, pops: Instruction, register: int) -> None:
+        self._Register = register
+        super().__init__("POPR", pops.get_arg(1))
+
+    def execute(self, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
+        """
+        Saves the value of the register to a variable specified by arg1.
+        :param arg1: var
+        :param arg2: None
+        :param arg3: None
+        """
+        f.get_var(arg1).set_value(d.get_register(self._Register))
+
+
+class Memo:
+    """
+    Memo is the bounded LRU cache of results of a pure routine (found by the `Memoizer` pass). The inputs of
+    a routine are the values it pops from the data stack of its caller and the results are the values it leaves
+    there, both are observed when the routine runs (by `MemoDataStack`). A routine which ends with the frame it
+    created as TF (or calls such a routine) has the TF saved with the results. Entries are keyed by the number
+    of inputs and their values with types (True == 1 in Python).
+    :var _Label: label of the routine
+    :var _Size: maximal number of entries
+    :var _TouchesTF: True if the routine leaves a new TF
+    :var _Entries: OrderedDict {key: (number of inputs, results, TF)}, the last used entry is the last one
+    :var _InputCounts: all observed numbers of inputs
+    :var _Hits: number of calls answered from the cache
+    :var _Misses: number of calls executed
+    """
+    MAX_INPUTS = 16
+
+    def __init__(self, label: str, size: int, touches_tf: bool) -> None:
+        import collections
+
+        self._Label = label
+        self._Size = size
+        self._TouchesTF = touches_tf
+        self._Entries = collections.OrderedDict()
+        self._InputCounts = []
+        self._Hits = 0
+        self._Misses = 0
+
+    @staticmethod
+    def key(count: int, values) -> tuple:
+        return (count,) + tuple((type(value), value) for value in values)
+
+    def lookup(self) -> tuple | None:
+        """
+        Method returns the entry for the inputs on top of the data stack or None if there isn't one.
+        """
+        for count in self._InputCounts:
+            values = d.top(count)
+            if values is not None:
+                key = self.key(count, values)
+                entry = self._Entries.get(key)
+                if entry is not None:
+                    self._Entries.move_to_end(key)
+                    self._Hits += 1
+                    return entry
+        self._Misses += 1
+        return None
+
+    def touches_tf(self) -> bool:
+        return self._TouchesTF
+
+    def store(self, count: int, inputs: tuple, results: tuple) -> None:
+        """
+        Method saves the results of a call, the oldest entry is removed if the cache is full.
+        :param count: number of values the routine popped from the stack of its caller
+        :param inputs: values on top of the stack before the call (at most MAX_INPUTS)
+        :param results: values the routine left on the stack
+        """
+        if count > len(inputs):
+            return
+        if count not in self._InputCounts:
+            self._InputCounts.append(count)
+        self._Entries[self.key(count, inputs[len(inputs) - count:])] = \
+            (count, results, f.dump_temp() if self._TouchesTF else None)
+        if len(self._Entries) > self._Size:
+            self._Entries.popitem(last=False)
+
+    def report(self) -> str:
+        return ('memo ' + self._Label + ': ' + str(self._Hits) + ' hits, ' + str(self._Misses) + ' misses, ' +
+                str(len(self._Entries)) + ' entries\n')
+
+
+class MemoDataStack(DataStack):
+    """
+    MemoDataStack is the data stack used with `--memoize`. It keeps the lowest depth of the stack since the start
+    of the innermost unfinished memoized call, so the number of values the call popped is known when it returns.
+    :var _Pending: unfinished memoized calls as (memo, depth of the call stack, depth of the data stack, lowest
+    depth of the outer call, values on top of the stack)
+    :var _Low: lowest depth of the stack since the start of the innermost unfinished call
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._Pending = []
+        self._Low = 0
+
+    def pop(self):
+        value = super().pop()
+        if len(self._Values) < self._Low:
+            self._Low = len(self._Values)
+        return value
+
+    def pop_many(self, count: int) -> list:
+        values = super().pop_many(count)
+        if len(self._Values) < self._Low:
+            self._Low = len(self._Values)
+        return values
+
+    def clear(self) -> None:
+        super().clear()
+        self._Low = 0
+
+    def top(self, count: int) -> list | None:
+        """
+        Method returns `count` values from the top of the stack without removing them, or None if there aren't enough.
+        :param count: number of values
+        """
+        if len(self._Values) < count:
+            return None
+        return self._Values[len(self._Values) - count:]
+
+    def begin_call(self, memo: Memo) -> None:
+        """
+        Method starts the observation of a memoized call.
+        :param memo: memo of the called routine
+        """
+        self._Pending.append((memo, s.get_call_depth(), len(self._Values), self._Low,
+                              tuple(self._Values[-Memo.MAX_INPUTS:])))
+        self._Low = len(self._Values)
+
+    def end_call(self) -> None:
+        """
+        Method ends the observation of the innermost memoized call, if the call has just returned, and saves
+        its results to its memo.
+        """
+        if not self._Pending or self._Pending[-1][1] != s.get_call_depth():
+            return
+        memo, _, depth, low, inputs = self._Pending.pop()
+        memo.store(depth - self._Low, inputs, tuple(self._Values[self._Low:]))
+        self._Low = min(low, self._Low)
+
+
+class MEMOCALL(Instruction):
+    """
+    Superinstruction MEMOCALL replaces CALL of a pure routine found by the `Memoizer` pass. If the memo of
+    the routine has the results for the inputs on the data stack, they are pushed without calling the routine.
+    :var _Memo: memo of the called routine
+    """
+    _Stateful = True
+
+    def __init__(self, call: Instruction, memo: Memo) -> None:
+        self._Memo = memo
+        super().__init__("MEMOCALL", call.get_arg(1))
+
+    def execute(self, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
+        """
+        Pushes the memoized results or calls the routine specified by arg1.
+        :param arg1: label
+        :param arg2: None
+        :param arg3: None
+        """
+        entry = self._Memo.lookup()
+        if entry is None:
+            d.begin_call(self._Memo)
+            CALL.execute(arg1, None, None)
+            return
+        count, results, temporary_frame = entry
+        if count:
+            d.pop_many(count)
+        for value in results:
+            d.push(value)
+        if self._Memo.touches_tf():
+            f.restore_temp(temporary_frame)
+
+    def get_memo(self) -> Memo:
+        return self._Memo
+
+
+class MEMORETURN(Instruction):
+    """
+    Superinstruction MEMORETURN replaces RETURN of a pure routine. After returning, it saves the results
+    of the memoized call which has just ended.
+    """
+
+    def __init__(self, ret: Instruction) -> None:
+        super().__init__("MEMORETURN")
+
+    @classmethod
+    def execute(cls, arg1: Argument | None, arg2: Argument | None, arg3: Argument | None) -> None:
+        """
+        Returns from the routine and saves the results of the call.
+        :param arg1: None
+        :param arg2: None
+        :param arg3: None
+        """
+        RETURN.execute(None, None, None)
+        d.end_call()
+
+
+class Factory:
+    @classmethod
+    def resolve(cls, opcode: str, num_of_args: int, value_list: list, type_list: list) -> Instruction:
+        if opcode.upper() == 'MOVE':
+            return MOVE(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'CREATEFRAME':
+            return CREATEFRAME(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'PUSHFRAME':
+            return PUSHFRAME(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'POPFRAME':
+            return POPFRAME(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'DEFVAR':
+            return DEFVAR(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'CALL':
+            return CALL(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'RETURN':
+            return RETURN(num_of_args, value_list, type_list)
+
+        elif opcode.upper() == 'PUSHS':
+            return PUSHS(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'POPS':
+            return POPS(num_of_args, value_list, type_list)
+
+        elif opcode.upper() == 'ADD':
+            return ADD(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'SUB':
+            return SUB(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'MUL':
+            return MUL(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'IDIV':
+            return IDIV(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'LT':
+            return LT(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'GT':
+            return GT(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'EQ':
+            return EQ(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'AND':
+            return AND(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'OR':
+            return OR(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'NOT':
+            return NOT(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'INT2CHAR':
+            return INT2CHAR(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'STRI2INT':
+            return STRI2INT(num_of_args, value_list, type_list)
+
+        elif opcode.upper() == 'READ':
+            return READ(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'WRITE':
+            return WRITE(num_of_args, value_list, type_list)
+
+        elif opcode.upper() == 'CONCAT':
+            return CONCAT(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'STRLEN':
+            return STRLEN(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'GETCHAR':
+            return GETCHAR(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'SETCHAR':
+            return SETCHAR(num_of_args, value_list, type_list)
+
+        elif opcode.upper() == 'TYPE':
+            return TYPE(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'LABEL':
+            return LABEL(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'JUMP':
+            return JUMP(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'JUMPIFEQ':
+            return JUMPIFEQ(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'JUMPIFNEQ':
+            return JUMPIFNEQ(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'EXIT':
+            return EXIT(num_of_args, value_list, type_list)
+
+        elif opcode.upper() == 'DPRINT':
+            return DPRINT(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'BREAK':
+            return BREAK(num_of_args, value_list, type_list)
+
+        elif opcode.upper() == 'CLEARS':
+            return CLEARS(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'ADDS':
+            return ADDS(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'SUBS':
+            return SUBS(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'MULS':
+            return MULS(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'IDIVS':
+            return IDIVS(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'LTS':
+            return LTS(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'GTS':
+            return GTS(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'EQS':
+            return EQS(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'ANDS':
+            return ANDS(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'ORS':
+            return ORS(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'NOTS':
+            return NOTS(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'INT2CHARS':
+            return INT2CHARS(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'STRI2INTS':
+            return STRI2INTS(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'JUMPIFEQS':
+            return JUMPIFEQS(num_of_args, value_list, type_list)
+        elif opcode.upper() == 'JUMPIFNEQS':
+            return JUMPIFNEQS(num_of_args, value_list, type_list)
+        else:
+            sys.stderr.write('ERROR: unknown instruction\n')
+            exit(32)
+
+
+class OptimizerPass:
+    """
+    Base class of load-time optimizer passes. Each pass rewrites the list of instructions in place and counts
+    the rewrites it did, so they can be reported.
+    :var _Fired: number of applications of each rewrite
+    """
+
+    def __init__(self) -> None:
+        self._Fired = {}
+
+    def optimize(self, instructions: list) -> None:
+        """
+        Method rewrites the list of instructions in place, passes override it. The base pass leaves the program
+        unchanged.
+        :param instructions: list of all instructions in the current program
+        """
+
+    def report(self) -> str:
+        """
+        Method returns a description of all rewrites that fired.
+        """
+        name = type(self).__name__
+        if not self._Fired:
+            return name + ': no rewrites\n'
+        ret = ''
+        for rewrite, count in sorted(self._Fired.items()):
+            ret += name + ': ' + rewrite + ' x' + str(count) + '\n'
+        return ret
+
+    def _count(self, rewrite: str) -> None:
+        self._Fired[rewrite] = self._Fired.get(rewrite, 0) + 1
+
+
+class Peephole(OptimizerPass):
+    """
+    Peephole is a load-time pass which rewrites short sequences of adjacent instructions into superinstructions and
+    removes sequences without any effect. Labels are never fused, so no jump can land inside a rewritten sequence.
+    """
+
+    def optimize(self, instructions: list) -> None:
+        source = list(instructions)
+        result = []
+        pos = 0
+        while pos < len(source):
+            fused, length = self._match(source, pos)
+            if fused is not None:
+                result.append(fused)
+            pos += length
+        instructions[:] = result
+
+    def _fire(self, rewrite: str, instruction: Instruction | None, length: int) -> tuple:
+        self._count(rewrite)
+        return instruction, length
+
+    def _match(self, source: list, pos: int) -> tuple:
+        """
+        Method tries all rewrites at position `pos` and returns the replacing instruction (None for a removed sequence)
+        and the number of consumed instructions.
+        """
+        first = source[pos]
+        second = source[pos + 1] if pos + 1 < len(source) else None
+        third = source[pos + 2] if pos + 2 < len(source) else None
+        opcode = first.get_opcode()
+        next_opcode = second.get_opcode() if second is not None else None
+
+        if opcode == 'PUSHS' and next_opcode == 'POPS':
+            return self._fire('PUSHS+POPS -> MOVES', MOVES(first, second), 2)
+
+        if opcode == 'JUMP' and next_opcode == 'LABEL' and \
+                first.get_arg(1).get_value() == second.get_arg(1).get_value():
+            return self._fire('JUMP to next LABEL -> removed', None, 1)
+
+        if opcode == 'CREATEFRAME' and next_opcode == 'CREATEFRAME':
+            return self._fire('CREATEFRAME+CREATEFRAME -> CREATEFRAME', None, 1)
+
+        if self._is_increment(first):
+            if next_opcode == 'JUMP':
+                return self._fire('ADD+JUMP -> INCJUMP', INCJUMP(first, second), 2)
+            if second is not None and third is not None:
+                expected = self._branch_condition(second, third)
+                if expected is not None:
+                    return self._fire('ADD+' + second.get_opcode() + '+' + third.get_opcode() + ' -> INCCMPJUMP',
+                                      INCCMPJUMP(first, second, third, expected), 3)
+            return self._fire('ADD 1 -> INC', INC(first), 1)
+
+        if second is not None:
+            expected = self._branch_condition(first, second)
+            if expected is not None:
+                return self._fire(opcode + '+' + next_opcode + ' -> CMPJUMP', CMPJUMP(first, second, expected), 2)
+
+        return first, 1
+
+    @staticmethod
+    def _same_var(arg1: Argument | None, arg2: Argument | None) -> bool:
+        return arg1 is not None and arg2 is not None and arg1.is_variable() and arg2.is_variable() and \
+            arg1.get_frame() == arg2.get_frame() and arg1.get_name() == arg2.get_name()
+
+    @classmethod
+    def _is_increment(cls, instr: Instruction) -> bool:
+        """
+        Method returns True for `ADD var var int@1`.
+        """
+        return instr.get_opcode() == 'ADD' and cls._same_var(instr.get_arg(1), instr.get_arg(2)) and \
+            instr.get_arg(3).get_type() == int and instr.get_arg(3).get_value() == 1
+
+    @classmethod
+    def _branch_condition(cls, compare: Instruction, branch: Instruction) -> bool | None:
+        """
+        Method checks whether `branch` is a conditional jump testing the result of `compare` against a bool constant.
+        Returns the comparison result for which the jump is taken or None if the pair can't be fused.
+        """
+        if compare.get_opcode() not in ('LT', 'GT', 'EQ') or branch.get_opcode() not in ('JUMPIFEQ', 'JUMPIFNEQ'):
+            return None
+
+        result, constant = branch.get_arg(2), branch.get_arg(3)
+        if not cls._same_var(compare.get_arg(1), result):
+            result, constant = constant, result
+        if not cls._same_var(compare.get_arg(1), result) or constant.get_type() != bool:
+            return None
+
+        if branch.get_opcode() == 'JUMPIFEQ':
+            return constant.get_value()
+        return not constant.get_value()
+
+
+class ConstantFolder(OptimizerPass):
+    """
+    ConstantFolder is a load-time pass which evaluates instructions whose operands are all constant and replaces them
+    by MOVE of the result. Values saved to variables are propagated through straight-line code, so the result of one
+    folded instruction can be used to fold the next one. Instructions which would end with an error are kept, so the
+    error still happens at runtime.
+    :var _Known: values of variables known in the current basic block, keyed by (frame, name)
+    """
+    _BlockEnd = ('LABEL', 'JUMP', 'JUMPIFEQ', 'JUMPIFNEQ', 'JUMPIFEQS', 'JUMPIFNEQS', 'CALL', 'RETURN', 'EXIT')
+    _FrameChange = ('CREATEFRAME', 'PUSHFRAME', 'POPFRAME')
+    _TypeNames = {
+        int: 'int',
+        str: 'string',
+        bool: 'bool',
+        'nil': 'nil',
+    }
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._Known = {}
+
+    def optimize(self, instructions: list) -> None:
+        result = []
+        for instr in list(instructions):
+            opcode = instr.get_opcode()
+            if opcode == 'LABEL':
+                self._Known = {}
+            elif opcode in self._FrameChange:
+                self._Known = {key: value for key, value in self._Known.items() if key[0] == 'GF'}
+
+            instr = self._fold(instr)
+            if instr is None:
+                continue
+            result.append(instr)
+            if instr.get_opcode() in self._BlockEnd:
+                self._Known = {}
+        instructions[:] = result
+
+    def _fold(self, instr: Instruction) -> Instruction | None:
+        """
+        Method returns the instruction which replaces `instr`, `instr` itself if it can't be folded or None if it
+        can be removed.
+        """
+        kind = type(instr)
+        arg1 = instr.get_arg(1)
+
+        if kind in (MOVE, ADD, SUB, MUL, IDIV, LT, GT, EQ, AND, OR, NOT, INT2CHAR, STRI2INT, CONCAT, STRLEN, GETCHAR,
+                    TYPE):
+            operands = [self._lookup(instr.get_arg(num)) for num in (2, 3) if instr.get_arg(num) is not None]
+            result = None if None in operands else self._evaluate(kind, operands)
+            if result is None:
+                self._Known.pop((arg1.get_frame(), arg1.get_name()), None)
+                return instr
+            self._Known[(arg1.get_frame(), arg1.get_name())] = result
+            if kind is MOVE and not instr.get_arg(2).is_variable():
+                return instr
+            self._count(kind.__name__ + ' folded')
+            return MOVE.build(arg1, Argument.constant(result))
+
+        if kind in (JUMPIFEQ, JUMPIFNEQ):
+            operands = [self._lookup(instr.get_arg(2)), self._lookup(instr.get_arg(3))]
+            if None in operands:
+                return instr
+            (value1, type1), (value2, type2) = operands
+            if type1 != type2 and type1 != 'nil' and type2 != 'nil':
+                return instr
+            self._count(kind.__name__ + ' folded')
+            if (type1 == type2 and value1 == value2) == (kind is JUMPIFEQ):
+                return JUMP.build(arg1)
+            return None
+
+        if kind in (WRITE, PUSHS):
+            operand = self._lookup(arg1)
+            if arg1.is_variable() and operand is not None:
+                self._count(kind.__name__ + ' propagated')
+                return kind.build(Argument.constant(operand[0]))
+            return instr
+
+        # any other instruction with a variable as the first argument may change it (DEFVAR, READ, POPS, SETCHAR)
+        if arg1 is not None and arg1.is_variable():
+            self._Known.pop((arg1.get_frame(), arg1.get_name()), None)
+        return instr
+
+    def _lookup(self, arg: Argument) -> tuple | None:
+        """
+        Method returns (value, type) of a constant or of a variable with a known value, None otherwise. The type of
+        a variable is derived from its value the same way `Argument.set_value` does it.
+        """
+        if not arg.is_variable():
+            return arg.get_value(), arg.get_type()
+        try:
+            value = self._Known[(arg.get_frame(), arg.get_name())]
+        except KeyError:
+            return None
+        return value, Argument.constant(value).get_type()
+
+    @classmethod
+    def _evaluate(cls, kind: type, operands: list):
+        """
+        Method returns the result the instruction of class `kind` would save to its variable, or None if it would
+        end with an error.
+        """
+        value1, type1 = operands[0]
+        value2, type2 = operands[1] if len(operands) > 1 else (None, None)
+        try:
+            if kind is MOVE:
+                return value1
+            if kind in (ADD, SUB, MUL, IDIV) and type1 == int and type2 == int:
+                if kind is ADD:
+                    return value1 + value2
+                if kind is SUB:
+                    return value1 - value2
+                if kind is MUL:
+                    return value1 * value2
+                return int(value1 / value2) if value2 != 0 else None
+            if kind in (LT, GT) and type1 == type2 and type1 in (int, str, bool):
+                return value1 < value2 if kind is LT else value1 > value2
+            if kind is EQ and type1 in (int, str, bool, 'nil') and type2 in (int, str, bool, 'nil'):
+                if type1 == type2:
+                    return value1 == value2
+                return False if 'nil' in (type1, type2) else None
+            if kind in (AND, OR) and type1 == bool and type2 == bool:
+                return (value1 and value2) if kind is AND else (value1 or value2)
+            if kind is NOT and type1 == bool:
+                return not value1
+            if kind is INT2CHAR and type1 == int:
+                return chr(value1)
+            if kind is STRI2INT and type1 == str and type2 == int:
+                return ord(value1[value2]) if 0 <= value2 < len(value1) else None
+            if kind is CONCAT and type1 == str and type2 == str:
+                return value1 + value2
+            if kind is STRLEN and type1 == str:
+                return len(value1)
+            if kind is GETCHAR and type1 == str and type2 == int:
+                return value1[value2]
+            if kind is TYPE:
+                return cls._TypeNames.get(type1)
+        except (ValueError, OverflowError, IndexError):
+            return None
+        return None
+
+
+class DeadCode(OptimizerPass):
+    """
+    DeadCode is a load-time pass which removes instructions that can't be reached from the start of the program.
+    Targets of jumps and calls are found in the label table. Labels themselves are kept, so their redefinition
+    is still detected.
+    """
+
+    def optimize(self, instructions: list) -> None:
+        labels = {}
+        for pos, instr in enumerate(instructions):
+            if instr.get_opcode() == 'LABEL':
+                if instr.get_arg(1).get_value() in labels:
+                    return
+                labels[instr.get_arg(1).get_value()] = pos
+
+        reachable = [False] * len(instructions)
+        todo = [0]
+        while todo:
+            pos = todo.pop()
+            if pos >= len(instructions) or reachable[pos]:
+                continue
+            reachable[pos] = True
+            opcode = instructions[pos].get_opcode()
+            if opcode in ('JUMP', 'JUMPIFEQ', 'JUMPIFNEQ', 'JUMPIFEQS', 'JUMPIFNEQS', 'CALL'):
+                target = labels.get(instructions[pos].get_arg(1).get_value())
+                if target is not None:
+                    todo.append(target)
+            # the instruction after CALL is reached by RETURN
+            if opcode not in ('JUMP', 'RETURN', 'EXIT'):
+                todo.append(pos + 1)
+
+        kept = [instr for pos, instr in enumerate(instructions) if reachable[pos] or instr.get_opcode() == 'LABEL']
+        if len(kept) != len(instructions):
+            self._Fired['unreachable instruction removed'] = len(instructions) - len(kept)
+            instructions[:] = kept
+
+
+class StackLowering(OptimizerPass):
+    """
+    StackLowering is a load-time pass which turns PUSHS and POPS pairs inside a basic block into register moves, so
+    the values don't go through the data stack. Since the depth of the stack is known statically inside the block,
+    each POPS is matched with the closest preceding unmatched PUSHS of the same block. Pushes left unmatched at
+    the end of the block and pops of values pushed by another block stay on the real data stack. Other stack
+    instructions (ADDS, CLEARS, ...) work with the real data stack, so they end the matching like the end of a block.
+    """
+    _BlockEnd = ('LABEL', 'JUMP', 'JUMPIFEQ', 'JUMPIFNEQ', 'CALL', 'RETURN', 'EXIT', 'BREAK')
+
+    def optimize(self, instructions: list) -> None:
+        result = list(instructions)
+        pending = []  # positions of unmatched PUSHS of the current block
+        for pos, instr in enumerate(instructions):
+            opcode = instr.get_opcode()
+            if opcode == 'PUSHS':
+                pending.append(pos)
+            elif opcode == 'POPS' and pending:
+                push_pos = pending.pop()
+                value = instructions[push_pos].get_arg(1)
+                if value.is_variable():
+                    # the register number is the depth of the value, so no two live values share a register
+                    result[push_pos] = PUSHR(instructions[push_pos], len(pending))
+                    result[pos] = POPR(instr, len(pending))
+                    self._count('PUSHS+POPS -> PUSHR+POPR')
+                else:
+                    # a constant can't change, so it's moved by the POPS directly
+                    result[push_pos] = None
+                    result[pos] = MOVE.build(instr.get_arg(1), value)
+                    self._count('PUSHS const+POPS -> MOVE')
+            elif opcode in self._BlockEnd or isinstance(instr, StackInstruction):
+                pending = []
+        instructions[:] = [instr for instr in result if instr is not None]
+
+
+class IntSpecializer(OptimizerPass):
+    """
+    IntSpecializer is a load-time pass which replaces ADD, SUB, MUL and IDIV by instructions of the integer kernel
+    (`IntKernel`) chosen by the kinds of their operands. Instructions with two constant operands are left to
+    `ConstantFolder`.
+    """
+
+    def optimize(self, instructions: list) -> None:
+        result = list(instructions)
+        for pos, instr in enumerate(result):
+            if type(instr) not in (ADD, SUB, MUL, IDIV):
+                continue
+            left, right = instr.get_arg(2).is_variable(), instr.get_arg(3).is_variable()
+            if left and right:
+                kernel = INT_VV
+            elif left and (type(instr) is not IDIV or instr.get_arg(3).get_value() != 0):
+                kernel = INT_VC
+            elif right:
+                kernel = INT_CV
+            else:
+                continue
+            result[pos] = kernel(instr)
+            self._count(instr.get_opcode() + ' -> ' + result[pos].get_opcode())
+        instructions[:] = result
+
+
+class Memoizer(OptimizerPass):
+    """
+    Memoizer is an optional load-time pass (`--memoize`), which replaces calls of pure routines by MEMOCALL and
+    their returns by MEMORETURN. The body of a routine is the code reachable from its label until RETURN, calls
+    are followed by the next instruction. A routine is pure if its body
+    - has no I/O (READ, WRITE, DPRINT, BREAK), EXIT or CLEARS and doesn't run off the end of the program,
+    - calls only pure routines,
+    - either uses no variables and no frame instructions, or creates its own frame: it starts by CREATEFRAME,
+      DEFVARs of TF and PUSHFRAME, ends every RETURN by POPFRAME, uses only LF variables otherwise and doesn't
+      jump back to its label.
+    Such a routine reads only the values it pops from the data stack and its own frame, so its results can be
+    memoized (see `Memo`).
+    :var _Size: maximal number of entries of each memo
+    """
+    _Jumps = ('JUMP', 'JUMPIFEQ', 'JUMPIFNEQ', 'JUMPIFEQS', 'JUMPIFNEQS')
+    _Impure = ('READ', 'WRITE', 'DPRINT', 'BREAK', 'EXIT', 'CLEARS')
+    _FrameOps = ('CREATEFRAME', 'PUSHFRAME', 'POPFRAME')
+
+    def __init__(self, size: int) -> None:
+        super().__init__()
+        self._Size = size
+
+    def optimize(self, instructions: list) -> None:
+        labels = {}
+        for pos, instr in enumerate(instructions):
+            if instr.get_opcode() == 'LABEL':
+                if instr.get_arg(1).get_value() in labels:
+                    return
+                labels[instr.get_arg(1).get_value()] = pos
+
+        routines = {}  # label: (body, callees, framed) of routines passing the local checks
+        for instr in instructions:
+            if instr.get_opcode() == 'CALL' and instr.get_arg(1).get_value() in labels:
+                label = instr.get_arg(1).get_value()
+                if label not in routines:
+                    routines[label] = self._routine(instructions, labels, label)
+        routines = {label: routine for label, routine in routines.items() if routine is not None}
+
+        # a routine calling an impure routine is impure, and it leaves a new TF if a routine it calls does
+        changed = True
+        while changed:
+            changed = False
+            for label, (_, callees, _) in list(routines.items()):
+                if any(callee not in routines for callee in callees):
+                    del routines[label]
+                    changed = True
+        touches_tf = {label: framed for label, (_, _, framed) in routines.items()}
+        changed = True
+        while changed:
+            changed = False
+            for label, (_, callees, _) in routines.items():
+                if not touches_tf[label] and any(touches_tf[callee] for callee in callees):
+                    touches_tf[label] = changed = True
+
+        memos = {label: Memo(label, self._Size, touches_tf[label]) for label in routines}
+        returns = set()
+        for body, _, _ in routines.values():
+            returns.update(pos for pos in body if instructions[pos].get_opcode() == 'RETURN')
+        result = list(instructions)
+        for pos, instr in enumerate(instructions):
+            if instr.get_opcode() == 'CALL' and instr.get_arg(1).get_value() in memos:
+                result[pos] = MEMOCALL(instr, memos[instr.get_arg(1).get_value()])
+                self._count('CALL ' + instr.get_arg(1).get_value() + ' -> MEMOCALL')
+            elif pos in returns:
+                result[pos] = MEMORETURN(instr)
+                self._count('RETURN -> MEMORETURN')
+        instructions[:] = result
+
+    @classmethod
+    def _successors(cls, instructions: list, labels: dict, pos: int) -> list | None:
+        """
+        Method returns the positions of instructions which can follow the instruction at `pos` inside a routine,
+        or None if the target of a jump doesn't exist.
+        """
+        instr = instructions[pos]
+        opcode = instr.get_opcode()
+        target = None
+        if opcode in cls._Jumps:
+            target = instr.get_arg(1)
+        elif opcode == 'INCJUMP':
+            target = instr.get_arg(2)
+        elif isinstance(instr, CMPJUMP):
+            target = instr.get_label()
+
+        ret = []
+        if target is not None:
+            if target.get_value() not in labels:
+                return None
+            ret.append(labels[target.get_value()])
+        if opcode not in ('JUMP', 'INCJUMP', 'RETURN'):
+            ret.append(pos + 1)
+        return ret
+
+    @staticmethod
+    def _variables(instr: Instruction) -> list:
+        """
+        Method returns all variable operands of an instruction, including those kept by superinstructions.
+        """
+        ret = [instr.get_arg(num) for num in (1, 2, 3)]
+        if isinstance(instr, INCCMPJUMP):
+            ret.append(instr.get_counter())
+        return [arg for arg in ret if arg is not None and arg.is_variable()]
+
+    def _routine(self, instructions: list, labels: dict, label: str) -> tuple | None:
+        """
+        Method finds the body of a routine and checks everything except its calls.
+        :return: (positions of the body, labels of called routines, True if it creates its own frame) or None
+        if the routine isn't pure
+        """
+        entry = labels[label]
+        body = set()
+        callees = set()
+        todo = [entry]
+        while todo:
+            pos = todo.pop()
+            if pos in body:
+                continue
+            if pos >= len(instructions):
+                return None
+            body.add(pos)
+            instr = instructions[pos]
+            if instr.get_opcode() in self._Impure:
+                return None
+            if instr.get_opcode() == 'CALL':
+                callees.add(instr.get_arg(1).get_value())
+            successors = self._successors(instructions, labels, pos)
+            if successors is None:
+                return None
+            todo.extend(successors)
+
+        ops = [pos for pos in body if instructions[pos].get_opcode() in self._FrameOps]
+        variables = [arg for pos in body for arg in self._variables(instructions[pos])]
+        if not ops and not variables:
+            return body, callees, False
+
+        # prologue: CREATEFRAME, DEFVAR TF@... , PUSHFRAME
+        pos = entry + 1
+        if pos >= len(instructions) or instructions[pos].get_opcode() != 'CREATEFRAME':
+            return None
+        prologue = {pos}
+        pos += 1
+        while pos < len(instructions) and instructions[pos].get_opcode() == 'DEFVAR' and \
+                instructions[pos].get_arg(1).get_frame() == 'TF':
+            prologue.add(pos)
+            pos += 1
+        if pos >= len(instructions) or instructions[pos].get_opcode() != 'PUSHFRAME':
+            return None
+        prologue.add(pos)
+
+        for pos in body:
+            instr = instructions[pos]
+            opcode = instr.get_opcode()
+            if pos in prologue or pos == entry:
+                continue
+            if opcode == 'POPFRAME':
+                if pos + 1 not in body or instructions[pos + 1].get_opcode() != 'RETURN':
+                    return None
+            elif opcode == 'RETURN':
+                if pos - 1 not in body or instructions[pos - 1].get_opcode() != 'POPFRAME':
+                    return None
+            elif opcode in self._FrameOps:
+                return None
+            if any(arg.get_frame() != 'LF' for arg in self._variables(instr)):
+                return None
+            if entry in (self._successors(instructions, labels, pos) or ()):
+                return None
+        return body, callees, True
+
+
+class Optimizer:
+    """
+    Optimizer runs the load-time passes selected by the optimization level (-O0, -O1, -O2). Programs containing BREAK
+    are not optimized, since BREAK prints the positions of labels, which would change.
+    :var _Passes: passes used on the selected level
+    """
+    _Levels = {
+        0: (),
+        1: (Peephole, StackLowering, IntSpecializer),
+        2: (ConstantFolder, DeadCode, Peephole, StackLowering, IntSpecializer),
+    }
+
+    def __init__(self, level: int, memoize: int | None = None) -> None:
+        self._Passes = [optimizer_pass() for optimizer_pass in self._Levels[level]]
+        if memoize is not None:
+            self._Passes.append(Memoizer(memoize))
+
+    def optimize(self, instructions: list) -> None:
+        """
+        Method runs all passes of the selected level on the list of instructions.
+        :param instructions: list of all instructions in the current program
+        """
+        if any(instr.get_opcode() == 'BREAK' for instr in instructions):
+            return
+        for optimizer_pass in self._Passes:
+            optimizer_pass.optimize(instructions)
+
+    def report(self) -> str:
+        """
+        Method returns the reports of all passes.
+        """
+        return ''.join(optimizer_pass.report() for optimizer_pass in self._Passes)
+
+
+class CompactProgram:
+    """
+    CompactProgram is the representation of a program the interpreter executes. Instead of an Instruction object
+    with its own Arguments for every instruction, it keeps arrays of small ints: an opcode column with indexes to
+    the table of executors (instruction classes, or instances of stateful superinstructions) and columns with kinds
+    and indexes of the three operands. Operands are in side tables of constants and names of variables shared by all
+    instructions, DEFVAR creates new variables (see `Argument.new_cell`), so its operands are shared as well. Variables
+    in LF and TF are kept one per instruction, every one is the inline cache of its instruction (see `Shape`).
+    :var _Executors: instruction classes and instances of stateful instructions
+    :var _Opcodes: index to _Executors for every instruction
+    :var _Kinds: kind of every operand (3 per instruction), index to _Tables
+    :var _Operands: index of every operand to the table given by its kind
+    :var _Tables: operand tables: [None], constants, names of variables
+    :var _Symbols: table of names of the program (see `Symbols`)
+    :var _Steps: number of instructions executed by the last monitored run, also if it ended by an error
+    """
+    NONE = 0
+    CONSTANT = 1
+    NAME = 2
+
+    def __init__(self, instructions: list, table: Symbols) -> None:
+        self._Symbols = table
+        self._Executors = []
+        self._Opcodes = array.array('I')
+        self._Kinds = array.array('B')
+        self._Operands = array.array('I')
+        self._Tables = ([None], [], [])
+        self._Steps = 0
+
+        executors = {}
+        keys = ({}, {}, {})
+        for instr in instructions:
+            executor = instr if instr._Stateful else type(instr)
+            if executor not in executors:
+                executors[executor] = len(self._Executors)
+                self._Executors.append(executor)
+            self._Opcodes.append(executors[executor])
+
+            for num in (1, 2, 3):
+                arg = instr.get_arg(num)
+                kind, key = self._key(instr, arg)
+                index = keys[kind].get(key)
+                if index is None:
+                    index = len(self._Tables[kind])
+                    self._Tables[kind].append(arg)
+                    if key is not None:
+                        keys[kind][key] = index
+                self._Kinds.append(kind)
+                self._Operands.append(index)
+
+    @classmethod
+    def _key(cls, instr: Instruction, arg: Argument | None) -> tuple:
+        """
+        Method returns the kind of an operand and the key under which equal operands are shared.
+        :param instr: instruction of the operand
+        :param arg: the operand
+        """
+        if arg is None:
+            return cls.NONE, None
+        if arg.is_variable():
+            return cls.NAME, (arg.get_frame(), arg.get_name()) if arg.get_frame() == 'GF' else None
+        # type of the value is a part of the key, since True == 1
+        return cls.CONSTANT, (arg.get_type(), type(arg.get_value()), arg.get_value())
+
+    def __len__(self) -> int:
+        return len(self._Opcodes)
+
+    def get_symbols(self) -> Symbols:
+        return self._Symbols
+
+    def get_steps(self) -> int:
+        return self._Steps
+
+    def get_executor(self, num: int):
+        """
+        Method returns the class, or the instance of a stateful instruction, that executes the instruction.
+        :param num: position of the instruction
+        """
+        return self._Executors[self._Opcodes[num]]
+
+    def get_args(self, num: int) -> tuple:
+        """
+        Method returns the three operands of the instruction.
+        :param num: position of the instruction
+        """
+        tables, kinds, operands = self._Tables, self._Kinds, self._Operands
+        num *= 3
+        return (tables[kinds[num]][operands[num]], tables[kinds[num + 1]][operands[num + 1]],
+                tables[kinds[num + 2]][operands[num + 2]])
+
+    def get_opcode(self, num: int) -> str:
+        """
+        Method returns the opcode of the instruction.
+        :param num: position of the instruction
+        """
+        executor = self.get_executor(num)
+        return executor.get_opcode() if isinstance(executor, Instruction) else executor.__name__
+
+    def get_opcode_table(self) -> list:
+        """
+        Method returns the opcodes of all executors, in the order of the indexes in the opcode column.
+        """
+        return [executor.get_opcode() if isinstance(executor, Instruction) else executor.__name__
+                for executor in self._Executors]
+
+    def get_executors(self) -> list:
+        """
+        Method returns the table of executors (instruction classes and instances of stateful instructions).
+        """
+        return self._Executors
+
+    def define_labels(self) -> None:
+        """
+        Method executes all LABEL instructions to define labels for forward jumps.
+        """
+        for num in range(len(self)):
+            if self.get_executor(num) is LABEL:
+                c.set_count(num)
+                LABEL.execute(*self.get_args(num))
+        c.reset_count()
+
+    def _run_chunk(self, steps: int, end: int, before=None, after=None) -> int:
+        """
+        Method is the loop executing the program, shared by all ways of running it. Label instructions are skipped,
+        since the labels were already defined. It executes instructions until `end` steps were done or the program
+        ended, the callbacks are called around every instruction and end the chunk early by returning True.
+        The number of executed instructions is saved also when the program ends by an error.
+        :param steps: number of instructions executed before
+        :param end: number of executed instructions at which the chunk ends
+        :param before: None or callback(num, index, arg1, arg2, arg3) called before an instruction, index is
+            the index of its executor; True ends the chunk without executing the instruction, unless it is the first
+            one of the chunk
+        :param after: None or callback(num, executor, arg1) called after an instruction; True ends the chunk
+        :return: number of executed instructions
+        """
+        executors, opcodes, tables, kinds, operands = (self._Executors, self._Opcodes, self._Tables, self._Kinds,
+                                                       self._Operands)
+        count = len(opcodes)
+        start = steps
+        try:
+            while steps < end and c.get_count() < count:
+                num = c.get_count()
+                index = opcodes[num]
+                executor = executors[index]
+                pos = num * 3
+                arg1, arg2, arg3 = (tables[kinds[pos]][operands[pos]], tables[kinds[pos + 1]][operands[pos + 1]],
+                                    tables[kinds[pos + 2]][operands[pos + 2]])
+                if before is not None and before(num, index, arg1, arg2, arg3) and steps != start:
+                    break
+                if executor is not LABEL:
+                    executor.execute(arg1, arg2, arg3)
+                c.increment_count()
+                steps += 1
+                if after is not None and after(num, executor, arg1):
+                    break
+        finally:
+            self._Steps = steps
+        return steps
+
+    def _chunk_end(self, monitors: list, steps: int) -> int:
+        """
+        Method returns the number of executed instructions at which the monitors check the run next.
+        :param monitors: objects with the methods `steps_to_check` and `check`
+        :param steps: number of instructions executed so far
+        """
+        return steps + min((monitor.steps_to_check(steps) for monitor in monitors), default=Limits.INTERVAL)
+
+    def run(self) -> None:
+        """
+        Method executes the program without monitors, trace and hooks.
+        """
+        self._run_chunk(0, sys.maxsize)
+
+    def run_monitored(self, monitors: list, trace: 'Trace | None' = None, steps: int = 0, before=None,
+                      after=None) -> int:
+        """
+        Method executes the program, lets the monitors (`Limits`, `Metrics`, `Checkpoint`) check the run every few
+        instructions and records every instruction to the trace, if there is one. The instruction is recorded before
+        it is executed, so an instruction ending the program with an error is the last record.
+        :param monitors: objects with the methods `steps_to_check` and `check`
+        :param trace: trace of the run or None
+        :param steps: number of instructions executed before, by a run resumed from a checkpoint
+        :param before: callback called before every instruction instead of the trace, see `_run_chunk`
+        :param after: callback called after every instruction, see `_run_chunk`
+        :return: number of executed instructions
+        """
+        if before is None and trace is not None:
+            before = trace.record
+        while c.get_count() < len(self):
+            steps = self._run_chunk(steps, self._chunk_end(monitors, steps), before, after)
+            for monitor in monitors:
+                monitor.check(self, steps)
+        return steps
+
+    def run_hooked(self, hooks: 'Hooks', monitors: list, trace: 'Trace | None' = None, steps: int = 0) -> int:
+        """
+        Method executes the program the same way as `run_monitored`, but calls the callbacks registered in `hooks`
+        (see `Hooks` for the events) around every instruction, so programs without hooks don't pay anything for them.
+        Calls, returns and frames are found by the depths of the call stack and of the frame stack, so they are
+        reported also for MEMOCALL and MEMORETURN (a memoized call, which didn't run the routine, isn't a call).
+        :param hooks: the registered callbacks
+        :param monitors: objects with the methods `steps_to_check` and `check`
+        :param trace: trace of the run or None
+        :param steps: number of instructions executed before, by a run resumed from a checkpoint
+        :return: number of executed instructions
+        """
+        names = self.get_opcode_table()
+        executors = self._Executors
+        on_instruction, on_call, on_return, on_frame_push, on_frame_pop, on_read, on_write, on_error = (
+            hooks.get(event) for event in Hooks.EVENTS)
+        # the instruction being executed and the depths of the stacks before it
+        num, executor, calls, frames = c.get_count(), None, 0, 0
+
+        def before(number: int, index: int, arg1: Argument | None, arg2: Argument | None,
+                   arg3: Argument | None) -> None:
+            nonlocal num, executor, calls, frames
+            num, executor = number, executors[index]
+            if trace is not None:
+                trace.record(number, index, arg1, arg2, arg3)
+            for callback in on_instruction:
+                callback(number, names[index], arg1, arg2, arg3)
+            calls, frames = s.get_call_depth(), f.get_depth()
+
+        def after(number: int, executed, arg1: Argument | None) -> None:
+            if s.get_call_depth() != calls:
+                for callback in on_call if s.get_call_depth() > calls else on_return:
+                    callback(number, c.get_count())
+            if f.get_depth() != frames:
+                for callback in on_frame_push if f.get_depth() > frames else on_frame_pop:
+                    callback(number, f.get_depth())
+            if executed is READ:
+                for callback in on_read:
+                    callback(number, f.get_var(arg1).get_value())
+            elif executed is WRITE:
+                for callback in on_write:
+                    callback(number, (f.get_var(arg1) if arg1.is_variable() else arg1).get_value())
+
+        try:
+            return self.run_monitored(monitors, trace, steps, before, after)
+        except SystemExit as error:
+            # EXIT with a valid code ends the program, it isn't an error, but an invalid code or operand is
+            if error.code not in (None, 0) and not (executor is EXIT and 0 <= error.code <= 49):
+                for callback in on_error:
+                    callback(num, error.code)
+            raise
+
+    async def run_async(self, job: 'AsyncJob', monitors: list) -> int:
+        """
+        Method executes the program of a job of the async server the same way as `run_monitored` (without trace).
+        A chunk of instructions ends before every READ, which waits for a line of input first, and after every
+        instruction writing output, which is sent then, and the other jobs run after every chunk checked by
+        the monitors. The state of the job is swapped in again after every wait by the job, so the globals used
+        by instructions belong to this program.
+        :param job: the job running the program
+        :param monitors: objects with the methods `steps_to_check` and `check`
+        :return: number of executed instructions
+        """
+        executors = self._Executors
+
+        def before(num: int, index: int, arg1: Argument | None, arg2: Argument | None,
+                   arg3: Argument | None) -> bool:
+            return executors[index] is READ
+
+        def after(num: int, executor, arg1: Argument | None) -> bool:
+            return executor is WRITE or executor is DPRINT or executor is BREAK
+
+        steps = 0
+        while c.get_count() < len(self):
+            end = self._chunk_end(monitors, steps)
+            while steps < end and c.get_count() < len(self):
+                if self.get_executor(c.get_count()) is READ:
+                    await job.read_line()
+                steps = self._run_chunk(steps, end, before, after)
+                await job.flush()
+            for monitor in monitors:
+                monitor.check(self, steps)
+            await job.pause()
+        return steps
+
+
+class Limits:
+    """
+    Limits of a run of an untrusted program, set by `--max-steps`, `--timeout`, `--max-memory`, `--max-stack` and
+    `--max-live`. They are checked every INTERVAL instructions by `CompactProgram.run_monitored` (the step limit
+    exactly). A program exceeding a limit is stopped with the exit code 60 and a report of where it was stopped.
+    Steps are instructions of the executed program, i.e. after the load-time optimizer, which fuses several
+    instructions of the source into one superinstruction and removes others, so the same budget goes further
+    with a higher -O; with -O0 the steps are the instructions of the source.
+    :var _MaxSteps: maximal number of executed instructions or None
+    :var _Deadline: time.monotonic() at which the run is stopped or None
+    :var _MaxMemory: maximal RSS in bytes or None
+    :var _MaxStack: maximal number of items on the data stack, call stack and frame stack or None
+    :var _MaxLive: maximal number of live bytes by `MemoryAccount` or None
+    """
+    INTERVAL = 4096
+
+    def __init__(self, max_steps: int | None, timeout: float | None, max_memory: int | None,
+                 max_stack: int | None = None, max_live: int | None = None) -> None:
+        self._MaxSteps = max_steps
+        self._Deadline = None
+        self._MaxMemory = None if max_memory is None else max_memory << 20
+        self._MaxStack = max_stack
+        self._MaxLive = None if max_live is None else max_live << 20
+        if timeout is not None:
+            import time
+            self._Deadline = time.monotonic() + timeout
+
+    def is_set(self) -> bool:
+        return any(limit is not None for limit in (self._MaxSteps, self._Deadline, self._MaxMemory, self._MaxStack,
+                                                   self._MaxLive))
+
+    def steps_to_check(self, steps: int) -> int:
+        """
+        Method returns the number of instructions to execute before the next check.
+        :param steps: number of instructions executed so far
+        """
+        if self._MaxSteps is None:
+            return self.INTERVAL
+        return min(self.INTERVAL, self._MaxSteps - steps)
+
+    def check(self, program: CompactProgram, steps: int) -> None:
+        """
+        Method stops the program if it exceeded a limit.
+        :param program: the executed program
+        :param steps: number of instructions executed so far
+        """
+        num = c.get_count()
+        opcode = program.get_opcode(num) if num < len(program) else 'END'
+        if self._MaxSteps is not None and steps >= self._MaxSteps and num < len(program):
+            self.stop('--max-steps', opcode, steps)
+        if self._Deadline is not None:
+            import time
+            if time.monotonic() >= self._Deadline:
+                self.stop('--timeout', opcode, steps)
+        if self._MaxMemory is not None and memory_usage() > self._MaxMemory:
+            self.stop('--max-memory', opcode, steps)
+        if self._MaxStack is not None:
+            for name, depth in (('data stack', len(d)), ('call stack', s.get_call_depth()),
+                                ('frame stack', f.get_depth())):
+                if depth > self._MaxStack:
+                    self.stop('--max-stack (' + name + ')', opcode, steps)
+        if self._MaxLive is not None and MemoryAccount(True).get_total() > self._MaxLive:
+            self.stop('--max-live', opcode, steps)
+
+    @staticmethod
+    def stop(limit: str, opcode: str, steps: int | None = None) -> None:
+        """
+        Method writes the report of the exceeded limit and exits with the code 60.
+        :param limit: the option of the exceeded limit
+        :param opcode: opcode of the current instruction
+        :param steps: number of instructions executed so far, if it is known
+        """
+        num = c.get_count()
+        report = ('ERROR: limit ' + limit + ' exceeded: pc ' + str(num) + ', label ' +
+                  (s.label_before(num) or '-') + ', instruction ' + opcode)
+        if steps is not None:
+            report += ', ' + str(steps) + ' instructions executed'
+        sys.stderr.write(report + '\n')
+        exit(60)
+
+
+class Metrics:
+    """
+    Metrics writes a sample of the run to the file given by `--metrics` every `--metrics-interval` instructions
+    (rounded up to a multiple of `Limits.INTERVAL`) and at the end of the run. A sample is a line of JSON with
+    the number of executed instructions, the pc, RSS and the `MemoryAccount` of the program.
+    :var _File: the file with the samples
+    :var _Interval: number of instructions between samples
+    :var _Next: number of executed instructions at which the next sample is written
+    """
+
+    def __init__(self, name: str, interval: int) -> None:
+        self._File = open_file(name, 'w')
+        self._Interval = -(-interval // Limits.INTERVAL) * Limits.INTERVAL
+        self._Next = self._Interval
+
+    def steps_to_check(self, steps: int) -> int:
+        """
+        Method returns the number of instructions to execute before the next sample.
+        :param steps: number of instructions executed so far
+        """
+        return self._Next - steps
+
+    def check(self, program: CompactProgram, steps: int) -> None:
+        """
+        Method writes a sample if it is time for it.
+        :param program: the executed program
+        :param steps: number of instructions executed so far
+        """
+        if steps >= self._Next:
+            self.sample(steps)
+            self._Next = (steps // self._Interval + 1) * self._Interval
+
+    def sample(self, steps: int) -> None:
+        """
+        Method writes a sample of the current state.
+        :param steps: number of instructions executed so far
+        """
+        import json
+
+        account = MemoryAccount(True)
+        sample = {'steps': steps, 'pc': c.get_count(), 'rss': memory_usage(), 'live': account.get_total()}
+        sample.update(account.as_dict())
+        self._File.write(json.dumps(sample) + '\n')
+        self._File.flush()
+
+    def close(self) -> None:
+        self._File.close()
+
+
+class Checkpoint:
+    """
+    Checkpoint saves the state of the interpreter to a JSON file: the pc, the number of executed instructions,
+    frames, the data stack with registers, the call stack, the number of lines read from the input and the offset
+    of stdout. The program isn't saved, it is referenced by its hash (sha256 of the source and the optimization
+    level), so the checkpoint can only be resumed (`--resume`) with the same program.
+    A checkpoint is taken every `--checkpoint-every` instructions, on SIGUSR1, and on SIGTERM, after which
+    the program is stopped with the exit code 143. Signals are handled between the checks, every `Limits.INTERVAL`
+    instructions. The file is replaced atomically, so a crash while saving leaves the previous checkpoint.
+    :var _Name: path to the checkpoint file
+    :var _Hash: hash of the program
+    :var _Interval: number of instructions between checkpoints or None
+    :var _Next: number of executed instructions at which the next checkpoint is taken
+    :var _Signal: number of a received signal or None
+    """
+    VERSION = 1
+
+    def __init__(self, name: str, program_hash: str, interval: int | None, steps: int = 0) -> None:
+        import signal
+
+        self._Name = name
+        self._Hash = program_hash
+        self._Interval = interval
+        self._Next = None if interval is None else (steps // interval + 1) * interval
+        self._Signal = None
+        for signum in (getattr(signal, 'SIGUSR1', None), signal.SIGTERM):
+            if signum is not None:
+                signal.signal(signum, self._request)
+
+    def _request(self, signum: int, frame) -> None:
+        self._Signal = signum
+
+    def steps_to_check(self, steps: int) -> int:
+        """
+        Method returns the number of instructions to execute before the next checkpoint or check of signals.
+        :param steps: number of instructions executed so far
+        """
+        if self._Next is None:
+            return Limits.INTERVAL
+        return min(Limits.INTERVAL, self._Next - steps)
+
+    def check(self, program: CompactProgram, steps: int) -> None:
+        """
+        Method takes a checkpoint if it is time for it or if a signal was received.
+        :param program: the executed program
+        :param steps: number of instructions executed so far
+        """
+        import signal
+
+        if self._Next is not None and steps >= self._Next:
+            self.save(steps)
+            self._Next = (steps // self._Interval + 1) * self._Interval
+        if self._Signal is not None:
+            signum, self._Signal = self._Signal, None
+            self.save(steps)
+            if signum == signal.SIGTERM:
+                sys.stderr.write('Checkpoint ' + self._Name + ' saved, stopped at pc ' + str(c.get_count()) + '\n')
+                exit(128 + signum)
+
+    def save(self, steps: int) -> None:
+        """
+        Method writes the checkpoint of the current state.
+        :param steps: number of instructions executed so far
+        """
+        import json
+        import os
+
+        sys.stdout.flush()
+        try:
+            output = os.lseek(sys.stdout.fileno(), 0, os.SEEK_CUR)
+        except (OSError, ValueError):
+            output = None
+
+        state = {
+            'version': self.VERSION,
+            'program': self._Hash,
+            'pc': c.get_count(),
+            'steps': steps,
+            'input': LinesRead,
+            'output': output,
+            'frames': f.dump(),
+            'data': d.dump(),
+            'calls': s.dump(),
+        }
+        try:
+            with open(self._Name + '.tmp', 'w') as file:
+                json.dump(state, file)
+            os.replace(self._Name + '.tmp', self._Name)
+        except OSError:
+            sys.stderr.write('ERROR: can\'t write checkpoint ' + self._Name)
+            exit(12)
+
+    @staticmethod
+    def restore(name: str, program_hash: str) -> int:
+        """
+        Method restores the state from a checkpoint. If stdout is a file at least as long as the saved offset,
+        it is truncated to the offset, so the output written after the checkpoint isn't repeated.
+        :param name: path to the checkpoint file
+        :param program_hash: hash of the loaded program
+        :return: number of instructions executed before the checkpoint
+        """
+        import json
+        import os
+
+        with open_file(name) as file:
+            try:
+                state = json.load(file)
+            except ValueError:
+                state = None
+        if not isinstance(state, dict) or state.get('version') != Checkpoint.VERSION:
+            sys.stderr.write('ERROR: invalid checkpoint ' + name)
+            exit(61)
+        if state['program'] != program_hash:
+            sys.stderr.write('ERROR: checkpoint ' + name + ' was taken with another program or optimization level')
+            exit(61)
+
+        f.restore(state['frames'])
+        d.restore(state['data'])
+        s.restore(state['calls'])
+        READ.skip_lines(state['input'])
+        c.set_count(state['pc'])
+
+        if state['output'] is not None:
+            try:
+                fd = sys.stdout.fileno()
+                if os.fstat(fd).st_size >= state['output']:
+                    os.ftruncate(fd, state['output'])
+                    os.lseek(fd, state['output'], os.SEEK_SET)
+            except (OSError, ValueError):
+                pass
+        return state['steps']
+
+
+class Trace:
+    """
+    Trace records every executed instruction in a binary format, which is printed by `tools/decode_trace.py`.
+    The file starts with a header: magic `IPPT`, version (u16), number of instructions (u32), the table of opcodes
+    (u16 count, then u8 length + name for each), the table of labels (u32 count, then u32 position + u16 length +
+    name for each) and the table of names of variables (u32 count, then u16 length + name for each, indexed by
+    the ids of `Symbols`). Every record is pc (u32), opcode id (u16), number of values (u8) and the values, if the
+    trace records them. A value is a tag (u8) and its data: 0 - undefined, 1 - int (i64), 2 - bool (u8), 3 - nil,
+    4 - string, 5 - type, 6 - label, 7 - int out of the i64 range (the last four as u32 length + UTF-8),
+    8 - variable (u8 frame: 0 - GF, 1 - LF, 2 - TF, u32 id of its name) followed by its value.
+    `--trace` implies -O0, so pcs are positions of the instructions in the source and opcodes are those
+    of the source instructions, not of superinstructions (except MEMOCALL and MEMORETURN with `--memoize`).
+    Records are either written to the file as the program runs, or kept in a ring buffer of the last N records,
+    which is written when the run ends (also by an error).
+    All integers are little-endian.
+    :var _File: the file of the trace
+    :var _Values: True if the values of operands are recorded
+    :var _Ring: deque of the last records or None
+    :var _OpcodeIds: opcode id of every executor of the program
+    """
+    MAGIC = b'IPPT'
+    VERSION = 2
+    TAGS = {'undefined': 0, int: 1, bool: 2, 'nil': 3, str: 4, type: 5, 'label': 6, 'bigint': 7, 'var': 8}
+    FRAMES = {'GF': 0, 'LF': 1, 'TF': 2}
+    TYPE_NAMES = {int: 'int', str: 'string', bool: 'bool', 'nil': 'nil'}
+
+    def __init__(self, name: str, program: CompactProgram, values: bool = False, ring: int | None = None) -> None:
+        import struct
+
+        self._File = open_file(name, 'wb')
+        self._Values = values
+        self._Ring = None
+        self._Record = struct.Struct('<IHB')
+        self._Int = struct.Struct('<Bq')
+        self._Text = struct.Struct('<BI')
+        self._Var = struct.Struct('<BBI')
+
+        table = program.get_opcode_table()
+        names = sorted(set(table))
+        self._OpcodeIds = [names.index(opcode) for opcode in table]
+
+        header = self.MAGIC + struct.pack('<HIH', self.VERSION, len(program), len(names))
+        for opcode in names:
+            header += struct.pack('<B', len(opcode)) + opcode.encode()
+        labels = s.get_labels()
+        header += struct.pack('<I', len(labels))
+        for label, position in labels:
+            label = label.encode()
+            header += struct.pack('<IH', position, len(label)) + label
+        names = program.get_symbols().names()
+        header += struct.pack('<I', len(names))
+        for name in names:
+            name = name.encode('utf-8', 'surrogatepass')
+            header += struct.pack('<H', len(name)) + name
+        self._File.write(header)
+
+        if ring is None:
+            self._Emit = self._File.write
+        else:
+            import collections
+            self._Ring = collections.deque(maxlen=ring)
+            self._Emit = self._Ring.append
+
+    def record(self, num: int, index: int, arg1: Argument | None, arg2: Argument | None,
+               arg3: Argument | None) -> None:
+        """
+        Method records an instruction.
+        :param num: position of the instruction
+        :param index: index of the executor of the instruction
+        :param arg1: argument 1 of the instruction
+        :param arg2: argument 2 of the instruction
+        :param arg3: argument 3 of the instruction
+        """
+        if not self._Values:
+            self._Emit(self._Record.pack(num, self._OpcodeIds[index], 0))
+            return
+        values = [self._encode(arg) for arg in (arg1, arg2, arg3) if arg is not None]
+        self._Emit(self._Record.pack(num, self._OpcodeIds[index], len(values)) + b''.join(values))
+
+    def _encode(self, arg: Argument) -> bytes:
+        """
+        Method returns the encoded value of an argument, a variable is encoded by its frame and name followed by
+        its current value.
+        :param arg: the argument
+        """
+        prefix = b''
+        arg_type = arg.get_type()
+        if arg_type == 'var':
+            prefix = self._Var.pack(self.TAGS['var'], self.FRAMES[arg.get_frame()], arg.get_id())
+            arg = f.find_var(arg)
+            if arg is None or arg.get_var_type() is None:
+                return prefix + bytes((self.TAGS['undefined'],))
+            arg_type = arg.get_var_type()
+        value = arg.get_value()
+
+        if arg_type is int:
+            if -(1 << 63) <= value < 1 << 63:
+                return prefix + self._Int.pack(self.TAGS[int], value)
+            arg_type, value = 'bigint', str(value)
+        elif arg_type is bool:
+            return prefix + bytes((self.TAGS[bool], value))
+        elif arg_type == 'nil':
+            return prefix + bytes((self.TAGS['nil'],))
+        elif arg_type is type:
+            value = self.TYPE_NAMES[value]
+        text = value.encode('utf-8', 'surrogatepass')
+        return prefix + self._Text.pack(self.TAGS[arg_type], len(text)) + text
+
+    def close(self) -> None:
+        """
+        Method writes the ring buffer, if it is used, and closes the file.
+        """
+        if self._Ring is not None:
+            self._File.write(b''.join(self._Ring))
+        self._File.close()
+
+
+class GcProfile:
+    """
+    GcProfile counts the collections of the cyclic garbage collector of every generation and measures their pauses
+    while the program runs (`--profile`).
+    :var _Collections: number of collections of every generation
+    :var _Pause: total time of the collections in seconds
+    :var _Start: start of the running collection
+    """
+
+    def __init__(self) -> None:
+        self._Collections = [0, 0, 0]
+        self._Pause = 0.0
+        self._Start = 0.0
+
+    def _callback(self, phase: str, info: dict) -> None:
+        import time
+
+        if phase == 'start':
+            self._Start = time.perf_counter()
+        else:
+            self._Collections[info['generation']] += 1
+            self._Pause += time.perf_counter() - self._Start
+
+    def start(self) -> None:
+        import gc
+
+        gc.callbacks.append(self._callback)
+
+    def stop(self) -> None:
+        import gc
+
+        gc.callbacks.remove(self._callback)
+
+    def report(self) -> str:
+        import gc
+
+        return ('profile gc: ' + str(sum(self._Collections)) + ' collections (' +
+                ', '.join(str(count) for count in self._Collections) + '), ' +
+                '%.1f' % (self._Pause * 1000) + ' ms of pauses, ' + str(gc.get_freeze_count()) + ' frozen objects, ' +
+                ('enabled' if gc.isenabled() else 'disabled') + '\n')
+
+
+class Hooks:
+    """
+    Hooks is the API for observing the execution from Python, e.g. by exporters of metrics or debuggers. Callbacks are
+    registered by `register` on the global `hooks` before `main` runs the program. Once a callback is registered,
+    the program is run by `CompactProgram.run_hooked`, otherwise by the usual loops, so runs without hooks don't pay
+    anything. Hooks aren't called in jobs of the async server.
+    Callbacks see the program as it is executed, i.e. after the load-time optimizer: pc is the position
+    in the optimized program and opcodes include superinstructions, which stand for several instructions
+    of the source (e.g. INCCMPJUMP for ADD, LT and JUMPIFEQ). With -O0 they are the instructions of the source
+    in their order.
+    Events and arguments of their callbacks (pc is the position of the instruction):
+      on_instruction(pc, opcode, arg1, arg2, arg3) - before every instruction, operands are Arguments or None
+      on_call(pc, target) - after an instruction called a routine, target is the pc of the next instruction
+      on_return(pc, target) - after an instruction returned from a routine, target is the pc of the next instruction
+      on_frame_push(pc, depth) - after PUSHFRAME, depth is the new number of frames on the frame stack
+      on_frame_pop(pc, depth) - after POPFRAME, depth is the new number of frames on the frame stack
+      on_read(pc, value) - after READ, value is the value saved to the variable
+      on_write(pc, value) - after WRITE, value is the written value
+      on_error(pc, code) - when an instruction or a limit ends the program with an error, before the interpreter exits
+    :var _Callbacks: {event: callbacks}
+    """
+    EVENTS = ('on_instruction', 'on_call', 'on_return', 'on_frame_push', 'on_frame_pop', 'on_read', 'on_write',
+              'on_error')
+
+    def __init__(self) -> None:
+        self._Callbacks = {event: [] for event in self.EVENTS}
+
+    def register(self, event: str, callback) -> None:
+        """
+        Method registers a callback of an event, callbacks of the same event are called in the order of registration.
+        :param event: one of `EVENTS`
+        :param callback: function taking the arguments of the event
+        """
+        if event not in self._Callbacks:
+            raise ValueError('unknown event ' + event)
+        self._Callbacks[event].append(callback)
+
+    def unregister(self, event: str, callback) -> None:
+        """
+        Method removes a callback registered by `register`.
+        :param event: one of `EVENTS`
+        :param callback: the registered function
+        """
+        if event not in self._Callbacks:
+            raise ValueError('unknown event ' + event)
+        self._Callbacks[event].remove(callback)
+
+    def get(self, event: str) -> list:
+        return self._Callbacks[event]
+
+    def is_set(self) -> bool:
+        """
+        Method returns True if any callback is registered.
+        """
+        return any(self._Callbacks.values())
+
+
+def tune_gc(mode: str | None) -> None:
+    """
+    Function prepares the cyclic garbage collector for the run of a loaded program (`--gc`). The interpreter state
+    has no reference cycles, so collections during the run only scan the program and the frames again and again.
+    :param mode: None - leave the collector as it is, freeze - move all objects created so far (the loaded program)
+    to the permanent generation, which collections don't scan, and collect the youngest generation less often
+    (`GC_THRESHOLD`), off - freeze and disable the collector
+    """
+    if mode is None:
+        return
+    import gc
+
+    gc.collect()
+    gc.freeze()
+    if mode == 'off':
+        gc.disable()
+    else:
+        gc.set_threshold(GC_THRESHOLD, *gc.get_threshold()[1:])
+
+
+def peak_memory_usage() -> int:
+    """
+    Function returns the peak RSS of the process in bytes.
+    """
+    import resource
+
+    # ru_maxrss is in kilobytes on Linux, but in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak << 10
+
+
+def memory_usage() -> int:
+    """
+    Function returns the current RSS of the process in bytes. Where /proc isn't available, the peak RSS is used.
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            import os
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return peak_memory_usage()
+
+
+# ______ERRORS______
+#   XML ERRORs
+#   31 - XML file is not well-formed
+#   32 - unexpected XML structure   (dupes)
+
+#   Text source ERRORs (.IPPcode23)
+#   21 - missing or wrong header
+#   22 - unknown opcode
+#   23 - other lexical or syntax error
+
+#  project ERRORs
+#   10      - missing parameter
+#   11      - error when opening input files    - argparse errno 13
+#   12      - error when opening output files
+
+#  Interpreter ERRORs
+#   52      - semantic ERROR in input   (unknown instruction, undef label or var redef)
+#   53      - wrong operand types
+#   54      - non-existing variable access (within existing frame)
+#   55      - non-existing frame
+#   56      - missing value
+#   57      - wrong operand value (div by 0)
+#   58      - wrong string operation
+#   60      - limit exceeded (--max-steps, --timeout, --max-memory, --max-stack, --max-live, --max-string)
+#   61      - invalid checkpoint or checkpoint of another program (--resume)
+#   143     - stopped by SIGTERM after saving a checkpoint (--checkpoint)
+
+#  Internal ERROR - 99
+
+
+#   parameters
+#   --help
+#   --source=FILE   - XML code
+#   --input=FILE    - input of instructions
+#   -O0 | -O1 | -O2 - optimization level
+#   --reference     - run the program by the original loop over instructions (reference of tools/difftest.py)
+#   --opt-report    - write the rewrites done by the optimizer to stderr
+#   --load-report   - write the load time and peak RSS to stderr
+#   --max-steps=N   - stop the program after N instructions
+#   --timeout=SEC   - stop the program after SEC seconds
+#   --max-memory=MB - stop the program once its RSS exceeds MB MiB
+#   --max-stack=N   - stop the program once the data, call or frame stack has more than N items
+#   --max-live=MB   - stop the program once its frames, stacks and strings take more than MB MiB
+#   --max-string=N  - stop the program once CONCAT creates a string longer than N characters
+#   --metrics=FILE  - write samples of the memory account to FILE
+#   --metrics-interval=N - number of instructions between the samples
+#   --trace=FILE    - record executed instructions to FILE (implies -O0, read by tools/decode_trace.py)
+#   --trace-values  - record also values of operands
+#   --trace-ring=N  - record only the last N instructions
+#   --checkpoint=FILE - save checkpoints of the interpreter state to FILE
+#   --checkpoint-every=N - number of instructions between checkpoints
+#   --resume=FILE   - resume the program from a checkpoint
+#   --server=SOCKET - run the fork server on the Unix socket SOCKET (--source is preloaded)
+#   --max-children=N - maximal number of jobs run by the fork server at once
+#   --profile       - write the profile of the run (inline caches of variables, frame pool, gc) to stderr
+#   --frame-pool=N  - maximal number of unused frames of every size class kept for reuse
+#   --gc=MODE       - freeze the loaded program for the garbage collector (freeze) or also disable it (off)
+#   Every option is described by (name, destination, type, default, help); type None is a flag without a value.
+OPTIONS = (
+    ('--source', 'source', str, None, 'file containing XML code or IPPcode23 text'),
+    ('--input', 'input', str, None, 'input of XML instructions (e.g. READ)'),
+    ('--jobs', 'jobs', int, 1, 'number of processes loading a large XML program'),
+    ('-O', 'opt_level', int, 1,
+     'optimization level: 0 - none, 1 - peephole (default), 2 - also constant folding and dead code elimination'),
+    ('--reference', 'reference', None, False,
+     'run the program by the original loop over instructions, without -O and the compact program (see '
+     'tools/difftest.py)'),
+    ('--opt-report', 'opt_report', None, False, 'write the rewrites done by the load-time optimizer to stderr'),
+    ('--load-report', 'load_report', None, False, 'write the load time and peak RSS during the load to stderr'),
+    ('--max-steps', 'max_steps', int, None,
+     'stop the program with exit code 60 after this many instructions (of the optimized program, see -O)'),
+    ('--timeout', 'timeout', float, None, 'stop the program with exit code 60 after this many seconds'),
+    ('--max-memory', 'max_memory', int, None, 'stop the program with exit code 60 once its RSS exceeds this many MiB'),
+    ('--max-stack', 'max_stack', int, None,
+     'stop the program with exit code 60 once the data, call or frame stack has more items than this'),
+    ('--max-live', 'max_live', int, None,
+     'stop the program with exit code 60 once its frames, stacks and strings take more MiB than this'),
+    ('--max-string', 'max_string', int, None,
+     'stop the program with exit code 60 once CONCAT creates a string longer than this'),
+    ('--metrics', 'metrics', str, None, 'write samples of the memory account of the program to this file'),
+    ('--metrics-interval', 'metrics_interval', int, 100000, 'number of instructions between the samples'),
+    ('--trace', 'trace', str, None,
+     'record executed instructions to this file (implies -O0), see tools/decode_trace.py'),
+    ('--trace-values', 'trace_values', None, False, 'record also values of operands to the trace'),
+    ('--trace-ring', 'trace_ring', int, None, 'record only this many last instructions to the trace'),
+    ('--checkpoint', 'checkpoint', str, None,
+     'save checkpoints of the interpreter state to this file (every --checkpoint-every instructions, on SIGUSR1 '
+     'and on SIGTERM)'),
+    ('--checkpoint-every', 'checkpoint_every', int, None, 'number of instructions between checkpoints'),
+    ('--resume', 'resume', str, None, 'resume the program from this checkpoint'),
+    ('--memoize', 'memoize', None, False, 'cache results of calls of pure subroutines, statistics go to stderr'),
+    ('--memo-size', 'memo_size', int, 4096, 'maximal number of cached results of each subroutine'),
+    ('--profile', 'profile', None, False,
+     'write the profile of the run (inline caches of variables, frame pool, gc) to stderr'),
+    ('--frame-pool', 'frame_pool', int, 64, 'maximal number of unused frames of every size class kept for reuse'),
+    ('--gc', 'gc', str, None,
+     'freeze: the garbage collector skips the loaded program and collects less often, off: also disable it'),
+    ('--server', 'server', str, None,
+     'run the fork server on this Unix socket, see tools/fork_client.py (--source is preloaded)'),
+    ('--max-children', 'max_children', int, 4, 'maximal number of jobs run by the fork server at once'),
+    ('--async-server', 'async_server', str, None,
+     'run jobs of tools/async_client.py concurrently in one process on this Unix socket'),
+)
+LIMITS = ('max_steps', 'timeout', 'max_memory', 'max_stack', 'max_live', 'max_string', 'metrics_interval',
+          'trace_ring', 'checkpoint_every', 'max_children', 'memo_size', 'jobs', 'frame_pool')
+# smallest number of instructions loaded in parallel by --jobs
+PARALLEL_LOAD_MIN = 10000
+# number of operands with the most misses of their inline caches listed by --profile
+PROFILE_TOP = 10
+# frames with more variables aren't kept in the frame pool
+FRAME_POOL_MAX_VARS = 64
+# size of the pieces of the source handed to the XML parser
+CHUNK_SIZE = 1 << 20
+# byte order mark of UTF-8, allowed before the source
+BOM = b'\xef\xbb\xbf'
+OPT_LEVELS = (0, 1, 2)
+GC_MODES = ('freeze', 'off')
+# threshold of the youngest generation of the garbage collector with --gc freeze
+GC_THRESHOLD = 100000
+
+
+class Arguments:
+    """
+    Parsed command line arguments. It has the same attributes as the namespace created by argparse.
+    """
+
+    def __init__(self) -> None:
+        for _, dest, _, default, _ in OPTIONS:
+            setattr(self, dest, default)
+
+
+def parse_arguments(argv: list) -> Arguments:
+    """
+    Function parses the command line arguments. Usual arguments are parsed by hand, so argparse has to be imported
+    only to print the help or to report an error, which keeps it off the startup path.
+    :param argv: arguments without the name of the script
+    """
+    # Check if there are other arguments alongside HELP
+    if len(argv) != 1:
+        for arg in argv:
+            if arg == '-h' or arg == '--help':
+                sys.stderr.write('ERROR: help has to be the only argument passed')
+                exit(10)
+
+    args = Arguments()
+    options = {name: (dest, kind) for name, dest, kind, _, _ in OPTIONS}
+    pos = 0
+    while pos < len(argv):
+        name, equals, value = argv[pos].partition('=')
+        if name not in options and name[:2] in options and not name.startswith('--'):
+            name, equals, value = name[:2], '=', argv[pos][2:]
+        if name not in options:
+            return parse_arguments_argparse(argv)
+
+        dest, kind = options[name]
+        if kind is None:
+            if equals:
+                return parse_arguments_argparse(argv)
+            setattr(args, dest, True)
+        else:
+            if not equals:
+                pos += 1
+                if pos == len(argv) or argv[pos].startswith('-'):
+                    return parse_arguments_argparse(argv)
+                value = argv[pos]
+            try:
+                setattr(args, dest, kind(value))
+            except ValueError:
+                return parse_arguments_argparse(argv)
+        pos += 1
+
+    if args.opt_level not in OPT_LEVELS or args.gc not in (None,) + GC_MODES:
+        return parse_arguments_argparse(argv)
+    check_arguments(args)
+    return args
+
+
+def check_arguments(args) -> None:
+    """
+    Function checks that the limits of the run are positive finite numbers (float('nan') isn't <= 0) and sets
+    the options implied by other options: `--trace` records the instructions of the source, so it turns the load-time
+    optimizer off (-O0).
+    :param args: parsed command line arguments
+    """
+    import math
+
+    for dest in LIMITS:
+        value = getattr(args, dest)
+        if value is not None and (value <= 0 or not math.isfinite(value)):
+            sys.stderr.write('ERROR: --' + dest.replace('_', '-') + ' has to be a positive finite number')
+            exit(10)
+    if args.trace is not None:
+        args.opt_level = 0
+
+
+def parse_arguments_argparse(argv: list):
+    """
+    Function parses the command line arguments by argparse. It is used for the help and for arguments the hand-written
+    parser doesn't accept, so argparse prints the usual messages.
+    :param argv: arguments without the name of the script
+    """
+    import argparse
+    import textwrap
+
+    # create argparse parser
+    parser = argparse.ArgumentParser(
+        exit_on_error=False,
+        description='Python interpreter of IPPcode23',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=textwrap.dedent('''\
+        Either '--source' or '--input' argument required
+            - STDIN will then be regarded as the other one
+        '''))
+    for name, dest, kind, default, description in OPTIONS:
+        if kind is None:
+            parser.add_argument(name, dest=dest, action='store_true', help=description)
+        elif dest == 'opt_level':
+            parser.add_argument(name, dest=dest, metavar='level', type=kind, choices=OPT_LEVELS, default=default,
+                                help=description)
+        elif dest == 'gc':
+            parser.add_argument(name, dest=dest, metavar='mode', type=kind, choices=GC_MODES, default=default,
+                                help=description)
+        else:
+            parser.add_argument(name, dest=dest, metavar='file' if kind is str else dest.split('_')[-1], type=kind,
+                                default=default, help=description)
     # try to parse arguments with custom exit code in case of an error
     try:
-        args = parser.parse_args()
+        args = parser.parse_args(argv)
     except argparse.ArgumentError or argparse.ArgumentTypeError:
         sys.stderr.write('ERROR: argparse')
         exit(11)
+    check_arguments(args)
+    return args
 
-    # Check the availability of source and input files and try to parse the source XML:
-    root: Tree.Element
-    InputFile: str
-    # No file - ERROR
-    if args.source is None and args.input is None:
-        sys.stderr.write('ERROR: at least one of --source and --input required')
-        exit(10)
 
-    # Only input file - OK
-    elif args.source is None:
-        SourceString = ""
-        with fileinput.input('-') as fil:
-            for line in fil:
-                SourceString += line
-        try:
-            root = Tree.fromstring(SourceString)
-        except Tree.ParseError:
-            sys.stderr.write('ERROR: XML parse')
-            exit(31)
+def open_file(name: str, mode: str = 'r'):
+    """
+    Function opens a file given by an argument.
+    :param name: path to the file
+    :param mode: mode of the file
+    """
+    try:
+        return open(name, mode)
+    except OSError:
+        sys.stderr.write('ERROR: can\'t open file ' + name)
+        exit(11)
 
-        with open(args.input.name, encoding=args.input.encoding) as In:
-            InputFile = In.read()
 
-    # Only source file - OK
-    elif args.input is None:
-        try:
-            # noinspection PyUnresolvedReferences
-            with open(args.source.name, encoding=args.source.encoding) as SourceFile:
-                tree = Tree.parse(SourceFile)
-                root = tree.getroot()
-        except Tree.ParseError:
-            sys.stderr.write('ERROR: XML parse')
-            exit(31)
-
-    # Both files - OK
-    else:
+def feed_source(parser, arguments, digest=None) -> None:
+    """
+    Function feeds the source XML to the parser in pieces of CHUNK_SIZE bytes, so no full-size copy of the source
+    is created. The file given by `--source` is read through a read-only memory map, stdin is read piece by piece.
+    :param parser: XMLParser of the source
+    :param arguments: parsed command line arguments
+    :param digest: hashlib object updated by the source, or None
+    """
+    global SourceHead
+    if arguments.source is None:
+        if SourceHead:
+            parser.feed(SourceHead)
+            if digest is not None:
+                digest.update(SourceHead)
+            SourceHead = b''
+        while chunk := sys.stdin.buffer.read(CHUNK_SIZE):
+            parser.feed(chunk)
+            if digest is not None:
+                digest.update(chunk)
+        return
+
+    import mmap
+
+    with open_file(arguments.source, 'rb') as file:
         try:
-            with open(args.source.name, encoding=args.source.encoding) as SourceFile:
-                tree = Tree.parse(SourceFile)
-                root = tree.getroot()
-        except Tree.ParseError:
-            sys.stderr.write('ERROR: XML parse')
-            exit(31)
+            source = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file can't be mapped
+            return
+        # pages of the map count to RSS, so pages already parsed are dropped (the source is read only once)
+        release = hasattr(mmap, 'MADV_DONTNEED')
+        if hasattr(mmap, 'MADV_SEQUENTIAL'):
+            source.madvise(mmap.MADV_SEQUENTIAL)
+        with source, memoryview(source) as view:
+            for start in range(0, len(view), CHUNK_SIZE):
+                with view[start:start + CHUNK_SIZE] as chunk:
+                    parser.feed(chunk)
+                    if digest is not None:
+                        digest.update(chunk)
+                if release:
+                    source.madvise(mmap.MADV_DONTNEED, start, min(CHUNK_SIZE, len(view) - start))
+
+
+def read_source(arguments, digest=None):
+    """
+    Function reads and parses the source XML, either from the file given by `--source` or from stdin.
+    :param arguments: parsed command line arguments
+    :param digest: hashlib object updated by the source, or None
+    :return: root element of the XML
+    """
+    import xml.etree.ElementTree as Tree
+
+    # Check the availability of source and input files and try to parse the source XML:
+    # No file - ERROR
+    if arguments.source is None and arguments.input is None:
+        sys.stderr.write('ERROR: at least one of --source and --input required')
+        exit(10)
 
-        with open(args.input.name, encoding=args.input.encoding) as In:
-            InputFile = In.read()
+    parser = Tree.XMLParser()
+    try:
+        feed_source(parser, arguments, digest)
+        root = parser.close()
+    except Tree.ParseError:
+        sys.stderr.write('ERROR: XML parse')
+        exit(31)
 
     # check if root tag is `program` and if it has the `language="IPPcode23"` attribute
-    # noinspection PyUnboundLocalVariable
     if root.tag != 'program':
         sys.stderr.write('ERROR: No "program" root of XML')
         exit(32)
@@ -2188,19 +5484,58 @@ if __name__ == '__main__':
     except KeyError:
         sys.stderr.write('ERROR: Missing language tag in XML')
         exit(32)
+    return root
+
+
+def read_input(arguments) -> list | None:
+    """
+    Function reads the file given by `--input`, splits its content by lines and reverses their order so that
+    Input.pop() returns correct input. Returns None if READ should read from stdin.
+    :param arguments: parsed command line arguments
+    """
+    if arguments.input is None:
+        return None
+    with open_file(arguments.input) as file:
+        lines = file.read().splitlines()
+    lines.reverse()
+    return lines
 
-    # if input is file, split content by lines and reverse their order so that Input.pop() returns correct input
-    if args.input:
-        # noinspection PyUnboundLocalVariable
-        Input = list(InputFile.splitlines())
-        Input.reverse()
 
+def load_program(root, jobs: int = 1) -> list:
+    """
+    Function checks the instructions of the source XML and creates them by `Factory.resolve`.
+    :param root: root element of the XML
+    :param jobs: number of processes, large programs are loaded by `load_parallel` if it's more than 1
+    :return: list of all instructions in the current program
+    """
     try:
         # Sort instructions, non-author code from:
         #    https://devdreamz.com/question/931441-python-sort-xml-elements-by-and-tag-and-attributes-recursively
         root[:] = sorted(root, key=lambda child: (child.tag, int(child.get('order'))))
+    except (ValueError, TypeError):
+        sys.stderr.write('ERROR: Unexpected or missing value of the `order` attribute')
+        exit(32)
+    if jobs > 1 and len(root) >= PARALLEL_LOAD_MIN:
+        return load_parallel(root, jobs)
+    sort_arguments(root)
+
+    orderStack = set()
+    for instr in root:
+        order = instr.attrib['order']
+        load_instruction(instr, order in orderStack)
+        orderStack.add(order)
+
+    return Instruction.get_list()
+
+
+def sort_arguments(instructions) -> None:
+    """
+    Function sorts the arguments of the instruction elements by their tags.
+    :param instructions: instruction elements
+    """
+    try:
         # slightly altered continuation of code from the same site
-        for instr in root:
+        for instr in instructions:
             attrib = instr.attrib
             if len(attrib) > 1:
                 instr[:] = sorted(instr, key=lambda child: (child.tag, child.get('desc')))
@@ -2212,65 +5547,1075 @@ if __name__ == '__main__':
         sys.stderr.write('ERROR: Unexpected or missing value of the `order` attribute')
         exit(32)
 
-    orderStack = []
 
+def load_instruction(instr, duplicate: bool) -> Instruction:
+    """
+    Function checks an instruction element with sorted arguments and creates the instruction by `Factory.resolve`.
+    :param instr: the instruction element
+    :param duplicate: True if an instruction before it has the same order
+    """
     arg_tag = {
         0: 'arg1',
         1: 'arg2',
         2: 'arg3'
     }
-    i: Instruction
-    instrCount = 0
 
-    # check children of a root element (instructions) and their children (arguments)
-    for instr in root:
-        numOfArgs = len(instr)
-        typeList = []
-        valueList = []
-        # root child element must have tag `instruction`, it must have `order` attribute with unique,
-        # greater than zero value
-        if instr.tag != 'instruction':
-            sys.stderr.write('ERROR: Child element of program XML is not named "instruction"')
-            exit(32)
-        order = instr.attrib['order']
-        if int(order) < 1:
-            sys.stderr.write('ERROR: Unexpected order value')
-            exit(32)
-        if order in orderStack:
-            sys.stderr.write('ERROR: Duplicate instruction order')
+    numOfArgs = len(instr)
+    typeList = []
+    valueList = []
+    # root child element must have tag `instruction`, it must have `order` attribute with unique,
+    # greater than zero value
+    if instr.tag != 'instruction':
+        sys.stderr.write('ERROR: Child element of program XML is not named "instruction"')
+        exit(32)
+    order = instr.attrib['order']
+    if int(order) < 1:
+        sys.stderr.write('ERROR: Unexpected order value')
+        exit(32)
+    if duplicate:
+        sys.stderr.write('ERROR: Duplicate instruction order')
+        exit(32)
+    # instruction child element must have tag 'argX', where X is 1/2/3 depending on the position of that argument
+    # in the IPPcode23 instruction, and it must have `type` attribute
+    for x in range(numOfArgs):
+        if instr[x].tag != arg_tag[x]:
+            sys.stderr.write('ERROR: XML: bad argX tag')
             exit(32)
-        orderStack.append(instr.attrib['order'])
-        # instruction child element must have tag 'argX', where X is 1/2/3 depending on the position of that argument
-        # in the IPPcode23 instruction, and it must have `type` attribute
-        for x in range(numOfArgs):
-            if instr[x].tag != arg_tag[x]:
-                sys.stderr.write('ERROR: XML: bad argX tag')
-                exit(32)
-            typeList.append(instr[x].attrib['type'])
-            valueList.append(instr[x].text)
+        typeList.append(instr[x].attrib['type'])
+        valueList.append(instr[x].text)
+
+    try:
+        opcode = instr.attrib['opcode']
+    except KeyError:
+        sys.stderr.write('ERROR: Missing value of the `opcode` attribute')
+        exit(32)
+
+    return Factory.resolve(opcode, numOfArgs, valueList, typeList)
+
+
+def load_parallel(root, jobs: int) -> list:
+    """
+    Function loads the sorted instruction elements in `jobs` forked processes. The processes share the parsed XML
+    (global `LoadElements`) with the main process copy-on-write, each of them checks and creates the instructions
+    of its chunks by `load_chunk` and returns them as tuples of plain values (`Instruction.get_state`), from which
+    they are created again without the checks. Duplicate orders are found in the main process over the whole program,
+    duplicate labels are found when the labels are defined. If there are errors, the error of the first instruction
+    is reported, the same way as by the sequential load. Without the `fork` start method the load is sequential.
+    :param root: root element of the XML with sorted instructions
+    :param jobs: number of processes
+    """
+    import concurrent.futures
+    import multiprocessing
+
+    global LoadElements
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return load_program(root)
+
+    duplicates = set()
+    orders = set()
+    for pos, instr in enumerate(root):
+        order = instr.get('order')
+        if order in orders:
+            duplicates.add(pos)
+        orders.add(order)
+    del orders
+
+    LoadElements = list(root)
+    size = -(-len(LoadElements) // (jobs * 4))
+    chunks = [(start, min(start + size, len(LoadElements))) for start in range(0, len(LoadElements), size)]
+    try:
+        with concurrent.futures.ProcessPoolExecutor(jobs, mp_context=multiprocessing.get_context('fork')) as pool:
+            results = list(pool.map(load_chunk, chunks,
+                                    [{pos for pos in duplicates if start <= pos < end} for start, end in chunks]))
+    finally:
+        LoadElements = None
+
+    # errors of the sort of arguments come before errors of the instructions, like in the sequential load
+    for phase in ('sort', 'load'):
+        for result_phase, code, message in results:
+            if result_phase == phase:
+                sys.stderr.write(message)
+                exit(code)
+
+    for _, states, _ in results:
+        for state in states:
+            Instruction.from_state(state)
+    return Instruction.get_list()
+
+
+def load_chunk(chunk: tuple, duplicates: set) -> tuple:
+    """
+    Function loads a chunk of the instruction elements in a process of `load_parallel`.
+    :param chunk: (start, end) positions of the elements in `LoadElements`
+    :param duplicates: positions of the elements in the chunk with a duplicate order
+    :return: ('ok', states of the instructions, None) or (phase of the error, exit code, error message)
+    """
+    import io
+
+    Instruction.get_list().clear()
+    sys.stderr = io.StringIO()
+    start, end = chunk
+    elements = LoadElements[start:end]
+    phase = 'sort'
+    try:
+        sort_arguments(elements)
+        phase = 'load'
+        for pos, instr in enumerate(elements, start):
+            load_instruction(instr, pos in duplicates)
+    except SystemExit as error:
+        return phase, error.code, sys.stderr.getvalue()
+    finally:
+        sys.stderr = sys.__stderr__
+    states = [instr.get_state() for instr in Instruction.get_list()]
+    Instruction.get_list().clear()
+    return 'ok', states, None
+
+
+# operands of instructions in the text format: v - variable, s - symbol, l - label, t - type
+TEXT_OPERANDS = {
+    'MOVE': 'vs', 'CREATEFRAME': '', 'PUSHFRAME': '', 'POPFRAME': '', 'DEFVAR': 'v', 'CALL': 'l', 'RETURN': '',
+    'PUSHS': 's', 'POPS': 'v',
+    'ADD': 'vss', 'SUB': 'vss', 'MUL': 'vss', 'IDIV': 'vss', 'LT': 'vss', 'GT': 'vss', 'EQ': 'vss',
+    'AND': 'vss', 'OR': 'vss', 'NOT': 'vs', 'INT2CHAR': 'vs', 'STRI2INT': 'vss',
+    'READ': 'vt', 'WRITE': 's',
+    'CONCAT': 'vss', 'STRLEN': 'vs', 'GETCHAR': 'vss', 'SETCHAR': 'vss', 'TYPE': 'vs',
+    'LABEL': 'l', 'JUMP': 'l', 'JUMPIFEQ': 'lss', 'JUMPIFNEQ': 'lss', 'EXIT': 's', 'DPRINT': 's', 'BREAK': '',
+    'CLEARS': '', 'ADDS': '', 'SUBS': '', 'MULS': '', 'IDIVS': '', 'LTS': '', 'GTS': '', 'EQS': '',
+    'ANDS': '', 'ORS': '', 'NOTS': '', 'INT2CHARS': '', 'STRI2INTS': '', 'JUMPIFEQS': 'l', 'JUMPIFNEQS': 'l',
+}
+
+
+def is_text_source(arguments) -> bool:
+    """
+    Function returns True if the source is in the text format (.IPPcode23), i.e. it doesn't start with `<`
+    after leading whitespace. An empty source is left to the XML parser. The source is read up to its first byte
+    which isn't whitespace, since a pipe may return any part of it; what was read from stdin is kept in the global
+    `SourceHead`.
+    :param arguments: parsed command line arguments
+    """
+    global SourceHead
+    stream = sys.stdin.buffer if arguments.source is None else open_file(arguments.source, 'rb')
+    head = b''
+    while not head.removeprefix(BOM).lstrip() or BOM.startswith(head):
+        chunk = stream.read1(4096)
+        if not chunk:
+            break
+        head += chunk
+    if arguments.source is None:
+        SourceHead = head
+    else:
+        stream.close()
+    head = head.removeprefix(BOM).lstrip()
+    return head != b'' and not head.startswith(b'<')
 
+
+def text_operand(kind: str, token: str) -> tuple | None:
+    """
+    Function returns the type and the value of an operand of the text format the same way as they are written
+    in XML (`type` attribute and text of the argX element), or None if the token isn't a valid operand.
+    :param kind: v - variable, s - symbol, l - label, t - type
+    :param token: the operand
+    """
+    import re
+
+    ident = r'[A-Za-z_\-$&%*!?][A-Za-z0-9_\-$&%*!?]*'
+    if kind == 'l':
+        return ('label', token) if re.fullmatch(ident, token) else None
+    if kind == 't':
+        return ('type', token) if token in ('int', 'string', 'bool') else None
+    if re.fullmatch('(GF|LF|TF)@' + ident, token):
+        return 'var', token
+    if kind == 'v':
+        return None
+    prefix, _, value = token.partition('@')
+    if prefix == 'int' and re.fullmatch(r'[+-]?[0-9]+', value) or \
+            prefix == 'bool' and value in ('true', 'false') or prefix == 'nil' and value == 'nil':
+        return prefix, value
+    if prefix == 'string' and re.fullmatch(r'([^\s#\\]|\\[0-9]{3})*', value):
+        # empty string is an element without text in XML
+        return prefix, value or None
+    return None
+
+
+def load_text_program(arguments, digest=None) -> list:
+    """
+    Function reads the source in the text format (.IPPcode23), checks it and creates the instructions
+    by `Factory.resolve`, the same way `load_program` does for XML. Comments start by `#`, the first line
+    (except empty lines and comments) must be the header `.IPPcode23`.
+    :param arguments: parsed command line arguments
+    :param digest: hashlib object updated by the source, or None
+    :return: list of all instructions in the current program
+    """
+    global SourceHead
+    if arguments.source is None:
+        source = SourceHead + sys.stdin.buffer.read()
+        SourceHead = b''
+    else:
+        with open_file(arguments.source, 'rb') as file:
+            source = file.read()
+    if digest is not None:
+        digest.update(source)
+    try:
+        lines = source.decode('utf-8-sig').splitlines()
+    except UnicodeDecodeError:
+        sys.stderr.write('ERROR: source is not valid UTF-8')
+        exit(23)
+    del source
+
+    header = False
+    for number, line in enumerate(lines, 1):
+        tokens = line.split('#', 1)[0].split()
+        if not tokens:
+            continue
+        if not header:
+            if len(tokens) != 1 or tokens[0].upper() != '.IPPCODE23':
+                sys.stderr.write('ERROR: missing header .IPPcode23')
+                exit(21)
+            header = True
+            continue
+
+        opcode = tokens[0].upper()
         try:
-            opcode = instr.attrib['opcode']
+            kinds = TEXT_OPERANDS[opcode]
         except KeyError:
-            sys.stderr.write('ERROR: Missing value of the `opcode` attribute')
-            exit(32)
+            sys.stderr.write('ERROR: line ' + str(number) + ': unknown instruction ' + tokens[0])
+            exit(22)
+        if len(tokens) - 1 != len(kinds):
+            sys.stderr.write('ERROR: line ' + str(number) + ': instruction ' + opcode + ' expects ' +
+                             str(len(kinds)) + ' operands')
+            exit(23)
+        typeList = []
+        valueList = []
+        for kind, token in zip(kinds, tokens[1:]):
+            operand = text_operand(kind, token)
+            if operand is None:
+                sys.stderr.write('ERROR: line ' + str(number) + ': invalid operand ' + token)
+                exit(23)
+            typeList.append(operand[0])
+            valueList.append(operand[1])
 
-        i = Factory.resolve(opcode, numOfArgs, valueList, typeList)
-        instrCount += 1
+        Factory.resolve(opcode, len(kinds), valueList, typeList)
+
+    if not header:
+        sys.stderr.write('ERROR: missing header .IPPcode23')
+        exit(21)
+    return Instruction.get_list()
+
+
+def load_report(start: float) -> str:
+    """
+    Function returns the report of the load, i.e. time since `start` and peak RSS of the process.
+    :param start: time of the start of the load from time.perf_counter()
+    """
+    import time
+
+    return 'load: %.3f s, peak RSS %.1f MiB\n' % (time.perf_counter() - start, peak_memory_usage() / (1 << 20))
+
+
+def prepare_program(instructions: list, arguments) -> CompactProgram:
+    """
+    Function optimizes the program and converts it to the compact representation. The list of instructions
+    is cleared, so the instructions can be freed. Labels are defined by `execute`, so a compiled program can be
+    cached and run again.
+    :param instructions: list of all instructions in the current program
+    :param arguments: parsed command line arguments
+    """
+    # optimize the program before the labels are defined, since the optimizer moves instructions
+    optimizer = Optimizer(arguments.opt_level, arguments.memo_size if arguments.memoize else None)
+    optimizer.optimize(instructions)
+    if arguments.opt_report:
+        sys.stderr.write(optimizer.report())
+
+    program = CompactProgram(instructions, symbols)
+    instructions.clear()
+    return program
+
+
+def load_instructions(arguments, digest=None) -> list:
+    """
+    Function reads the source (XML or the text format) and returns the list of its instructions, the symbols of the
+    program are interned to a new table in the global `symbols`.
+    :param arguments: parsed command line arguments
+    :param digest: hashlib object updated by the source, or None
+    """
+    global symbols
+    # instructions left by a failed compilation in the fork server
+    Instruction.get_list().clear()
+    symbols = Symbols()
+    if arguments.source is None and arguments.input is None:
+        sys.stderr.write('ERROR: at least one of --source and --input required')
+        exit(10)
+    if is_text_source(arguments):
+        return load_text_program(arguments, digest)
+    root = read_source(arguments, digest)
+    InstrList = load_program(root, arguments.jobs)
+    del root
+    return InstrList
 
-    if instrCount:
-        # noinspection PyUnboundLocalVariable
-        for instr in i.get_list():  # loop through program to define labels for forward jumps
-            if instr.get_opcode() == "LABEL":
-                instr.execute(instr.get_arg(1), instr.get_arg(2), instr.get_arg(3))
-            c.increment_count()
-        c.reset_count()
 
-        InstrList = i.get_list()
-        while c.get_count() < instrCount:
-            instr = InstrList[c.get_count()]
-            # loop through program while skipping execution of label instructions to prevent
-            # creation of labels with the same name
-            if instr.get_opcode() != 'LABEL':
-                instr.execute(instr.get_arg(1), instr.get_arg(2), instr.get_arg(3))
-            c.increment_count()
+def compile_program(arguments, digest=None) -> CompactProgram:
+    """
+    Function reads the source (XML or the text format) and creates the compact program from it.
+    :param arguments: parsed command line arguments
+    :param digest: hashlib object updated by the source, or None
+    """
+    return prepare_program(load_instructions(arguments, digest), arguments)
+
+
+def run_reference(arguments) -> None:
+    """
+    Function runs the program without the optimizer and the compact representation, by the original loop executing
+    one Instruction object after another. It is the reference engine of tools/difftest.py. Frames, symbols and the
+    instructions themselves are shared with the other engines, see --baseline of tools/difftest.py for them.
+    :param arguments: parsed command line arguments
+    """
+    global Input
+    for name in ('trace', 'checkpoint', 'resume', 'metrics', 'memoize', 'profile', 'max_steps', 'timeout',
+                 'max_memory', 'max_stack', 'max_live'):
+        if getattr(arguments, name):
+            sys.stderr.write('ERROR: --reference does not support --' + name.replace('_', '-'))
+            exit(10)
+    Input = read_input(arguments)
+    InstrList = load_instructions(arguments)
+    f.set_symbols(symbols)
+    f.get_pool().set_limit(arguments.frame_pool)
+    instrCount = len(InstrList)
+    for instr in InstrList:  # define labels
+        if instr.get_opcode() == "LABEL":
+            instr.execute(instr.get_arg(1), instr.get_arg(2), instr.get_arg(3))
+        c.increment_count()
+    c.reset_count()
+    while c.get_count() < instrCount:
+        instr = InstrList[c.get_count()]
+        if instr.get_opcode() != 'LABEL':
+            instr.execute(instr.get_arg(1), instr.get_arg(2), instr.get_arg(3))
+        c.increment_count()
+
+
+def program_hash(digest, arguments) -> str | None:
+    """
+    Function returns the hash of the program used by checkpoints, i.e. the hash of the source and the optimization
+    level, or None if the source wasn't hashed.
+    :param digest: hashlib object updated by the source, or None
+    :param arguments: parsed command line arguments
+    """
+    if digest is None:
+        return None
+    digest.update(b'-O' + str(arguments.opt_level).encode())
+    return digest.hexdigest()
+
+
+def execute(program: CompactProgram, program_hash: str | None) -> None:
+    """
+    Function defines the labels of the program and executes it with the limits, metrics, trace and checkpoints
+    given by the arguments in the global `args` and with the callbacks registered in the global `hooks`.
+    :param program: the compiled program
+    :param program_hash: hash of the program for checkpoints
+    """
+    global Input, d
+    Input = read_input(args)
+    program.define_labels()
+    f.set_symbols(program.get_symbols())
+    if args.memoize:
+        d = MemoDataStack()
+    steps = 0
+    if args.resume is not None:
+        steps = Checkpoint.restore(args.resume, program_hash)
+    f.get_pool().set_limit(args.frame_pool)
+    monitors = []
+    limits = Limits(args.max_steps, args.timeout, args.max_memory, args.max_stack, args.max_live)
+    if limits.is_set():
+        monitors.append(limits)
+    metrics = None if args.metrics is None else Metrics(args.metrics, args.metrics_interval)
+    if metrics is not None:
+        monitors.append(metrics)
+    if args.checkpoint is not None:
+        monitors.append(Checkpoint(args.checkpoint, program_hash, args.checkpoint_every, steps))
+    trace = None if args.trace is None else Trace(args.trace, program, args.trace_values, args.trace_ring)
+    tune_gc(args.gc)
+    gc_profile = GcProfile() if args.profile else None
+    if gc_profile is not None:
+        gc_profile.start()
+    try:
+        if monitors or trace is not None or hooks.is_set():
+            try:
+                if hooks.is_set():
+                    program.run_hooked(hooks, monitors, trace, steps)
+                else:
+                    program.run_monitored(monitors, trace, steps)
+            finally:
+                if trace is not None:
+                    trace.close()
+        else:
+            program.run()
+    finally:
+        # the last sample is written also when EXIT, an error or a limit ended the program
+        if metrics is not None:
+            metrics.sample(program.get_steps())
+            metrics.close()
+        if args.memoize:
+            sys.stderr.write(memo_report(program))
+        if gc_profile is not None:
+            gc_profile.stop()
+            sys.stderr.write(profile_report(program) + gc_profile.report())
+
+
+def memo_report(program: CompactProgram) -> str:
+    """
+    Function returns the statistics of all memos of the program (`--memoize`).
+    :param program: the compiled program
+    """
+    memos = {}
+    for executor in program.get_executors():
+        if isinstance(executor, MEMOCALL):
+            memos[id(executor.get_memo())] = executor.get_memo()
+    return ''.join(memo.report() for memo in memos.values())
+
+
+def profile_report(program: CompactProgram) -> str:
+    """
+    Function returns the profile of the run (`--profile`): hits and misses of the inline caches of variables in LF
+    and TF, in total and for the operands with the most misses, and the use of the frame pool.
+    :param program: the compiled program
+    """
+    operands = []
+    for num in range(len(program)):
+        for arg in program.get_args(num):
+            if arg is not None and arg.is_variable() and arg.get_frame() != 'GF':
+                hits, misses = arg.get_cache_stats()
+                if hits or misses:
+                    operands.append((misses, hits, arg.get_frame() + '@' + arg.get_name() + ' in ' +
+                                     program.get_opcode(num) + ' at ' + str(num)))
+    hits = sum(hits for _, hits, _ in operands)
+    misses = sum(misses for misses, _, _ in operands)
+    ret = ('profile inline caches: ' + str(hits) + ' hits, ' + str(misses) + ' misses, ' +
+           str(program.get_symbols().empty_shape().count()) + ' frame shapes\n')
+    for misses, hits, name in sorted(operands, reverse=True)[:PROFILE_TOP]:
+        ret += 'profile ' + name + ': ' + str(hits) + ' hits, ' + str(misses) + ' misses\n'
+    return ret + f.get_pool().report()
+
+
+class ForkServer:
+    """
+    ForkServer is a warm-start server of the interpreter (`--server SOCKET`). The server process has everything
+    imported and keeps compiled programs in a cache, so a job doesn't pay for the startup of Python, imports and
+    loading of the program. For every job a child is forked (the program is shared copy-on-write), which runs with
+    stdin, stdout and stderr of the client. The exit code of the child is sent back to the client.
+    A client (see `tools/fork_client.py`) connects to the Unix socket and sends a request: length (u32, big-endian)
+    and JSON `{"argv": [...], "cwd": "..."}` with the arguments of interpret.py and its working directory, together
+    with its file descriptors 0, 1 and 2 (SCM_RIGHTS). The server replies with the exit code as a line of text.
+    The number of running children is limited by `--max-children`, further requests wait in the backlog of
+    the socket. Children are reaped on SIGCHLD, SIGTERM and SIGINT stop the server after the running jobs end.
+    :var _Path: path to the socket
+    :var _MaxChildren: maximal number of running children
+    :var _Children: {pid: connection of the client}
+    :var _Cache: {(source, mtime, size, optimization level, memoization): (program, hash)}
+    :var _Stopping: True once the server was asked to stop
+    """
+    CACHE_SIZE = 64
+    MAX_REQUEST = 1 << 20
+
+    def __init__(self, arguments) -> None:
+        self._Path = arguments.server
+        self._MaxChildren = arguments.max_children
+        self._Children = {}
+        self._Cache = {}
+        self._Stopping = False
+        if arguments.source is not None:
+            try:
+                self._program(arguments)
+            except SystemExit as error:
+                sys.stderr.write('\nERROR: preloading of ' + arguments.source + ' failed')
+                exit(error.code)
+
+    def _program(self, arguments) -> tuple:
+        """
+        Method returns the compiled program given by `--source` and its hash from the cache, or compiles it.
+        :param arguments: parsed arguments of the job
+        :return: (program, hash)
+        """
+        import hashlib
+        import os
+
+        if arguments.source is None:
+            sys.stderr.write('ERROR: jobs of the fork server need --source')
+            exit(10)
+        try:
+            stat = os.stat(arguments.source)
+            key = (os.path.realpath(arguments.source), stat.st_mtime_ns, stat.st_size, arguments.opt_level,
+                   arguments.memoize, arguments.memo_size)
+        except OSError:
+            key = None
+        if key in self._Cache:
+            return self._Cache[key]
+
+        digest = hashlib.sha256()
+        compiled = compile_program(arguments, digest)
+        compiled = (compiled, program_hash(digest, arguments))
+        if key is not None:
+            if len(self._Cache) >= self.CACHE_SIZE:
+                del self._Cache[next(iter(self._Cache))]
+            self._Cache[key] = compiled
+        return compiled
+
+    def serve(self) -> None:
+        """
+        Method accepts and runs jobs until the server is stopped.
+        """
+        import os
+        import select
+        import signal
+        import socket
+
+        if os.path.exists(self._Path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self._Path)
+                sys.stderr.write('ERROR: fork server is already running on ' + self._Path)
+                exit(11)
+            except OSError:
+                os.unlink(self._Path)
+            finally:
+                probe.close()
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            listener.bind(self._Path)
+        except OSError:
+            sys.stderr.write('ERROR: can\'t create socket ' + self._Path)
+            exit(11)
+        listener.listen(64)
+
+        # signals only wake up select, they are handled in the loop
+        wakeup, wakeup_write = socket.socketpair()
+        wakeup_write.setblocking(False)
+        signal.set_wakeup_fd(wakeup_write.fileno())
+        signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self._stop)
+
+        try:
+            while not self._Stopping or self._Children:
+                readers = [wakeup]
+                if not self._Stopping and len(self._Children) < self._MaxChildren:
+                    readers.append(listener)
+                for ready in select.select(readers, [], [])[0]:
+                    if ready is wakeup:
+                        wakeup.recv(4096)
+                    else:
+                        self._accept(listener, (listener, wakeup, wakeup_write))
+                self._reap()
+        finally:
+            listener.close()
+            os.unlink(self._Path)
+
+    def _stop(self, signum: int, frame) -> None:
+        self._Stopping = True
+
+    def _accept(self, listener, server_sockets: tuple) -> None:
+        """
+        Method receives a request and forks a child for it.
+        :param listener: the listening socket
+        :param server_sockets: sockets of the server, which are closed in the child
+        """
+        import json
+        import os
+        import socket
+
+        conn, _ = listener.accept()
+        fds = []
+        try:
+            conn.settimeout(5)
+            data, fds, _, _ = socket.recv_fds(conn, 65536, 3)
+            while len(data) >= 4 and len(data) < 4 + int.from_bytes(data[:4], 'big') <= self.MAX_REQUEST:
+                chunk = conn.recv(65536)
+                if not chunk:
+                    break
+                data += chunk
+            request = json.loads(data[4:])
+            argv, cwd = request['argv'], request['cwd']
+            if len(fds) != 3 or not isinstance(argv, list) or not all(isinstance(arg, str) for arg in argv):
+                raise ValueError('bad request')
+        except (OSError, ValueError, KeyError, TypeError):
+            for fd in fds:
+                os.close(fd)
+            conn.close()
+            return
+
+        # the arguments are parsed and the program is compiled by the server with the output and the working
+        # directory of the client, so the errors go to the client and the cache is shared by all jobs
+        code = None
+        saved = (os.dup(1), os.dup(2), os.getcwd())
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(fds[1], 1)
+            os.dup2(fds[2], 2)
+            os.chdir(cwd)
+            arguments = parse_arguments(argv)
+            if arguments.server is not None:
+                sys.stderr.write('ERROR: --server can\'t be used by a job')
+                exit(10)
+            compiled = self._program(arguments)
+        except SystemExit as error:
+            code = self.exit_code(error.code)
+        except OSError:
+            code = 11
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved[0], 1)
+            os.dup2(saved[1], 2)
+            os.close(saved[0])
+            os.close(saved[1])
+            os.chdir(saved[2])
+        if code is not None:
+            self._reply(conn, code)
+            for fd in fds:
+                os.close(fd)
+            return
+
+        pid = os.fork()
+        if pid == 0:
+            for server_socket in server_sockets:
+                server_socket.close()
+            conn.close()
+            self.child(arguments, compiled, fds, cwd)
+        for fd in fds:
+            os.close(fd)
+        self._Children[pid] = conn
+
+    @staticmethod
+    def child(arguments, compiled: tuple, fds: list, cwd: str) -> None:
+        """
+        Method runs a job in the forked child and exits the child with its exit code.
+        :param arguments: parsed arguments of the job
+        :param compiled: (program, hash)
+        :param fds: stdin, stdout and stderr of the client
+        :param cwd: working directory of the client
+        """
+        import os
+        import signal
+
+        global args
+        code = 0
+        try:
+            signal.set_wakeup_fd(-1)
+            for signum in (signal.SIGCHLD, signal.SIGTERM, signal.SIGINT):
+                signal.signal(signum, signal.SIG_DFL)
+            for num, fd in enumerate(fds):
+                os.dup2(fd, num)
+                os.close(fd)
+            os.chdir(cwd)
+            args = arguments
+            execute(*compiled)
+        except SystemExit as error:
+            code = ForkServer.exit_code(error.code)
+        except BaseException:
+            import traceback
+            traceback.print_exc()
+            code = 1
+        finally:
+            try:
+                sys.stdout.flush()
+                sys.stderr.flush()
+            finally:
+                os._exit(code)
+
+    @staticmethod
+    def exit_code(code) -> int:
+        """
+        Method returns the exit code of SystemExit the way Python does.
+        """
+        if code is None:
+            return 0
+        return code if isinstance(code, int) else 1
+
+    def _reap(self) -> None:
+        """
+        Method reaps all finished children and sends their exit codes to the clients. A child killed by a signal
+        is reported as 128 + the signal number.
+        """
+        import os
+
+        while self._Children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            code = os.waitstatus_to_exitcode(status)
+            conn = self._Children.pop(pid, None)
+            if conn is not None:
+                self._reply(conn, 128 - code if code < 0 else code)
+
+    @staticmethod
+    def _reply(conn, code: int) -> None:
+        try:
+            conn.sendall(str(code).encode() + b'\n')
+        except OSError:
+            pass
+        conn.close()
+
+
+class JobStream:
+    """
+    JobStream is stdout or stderr of the async server. Output of a job goes to the buffer of the job set for
+    the thread which runs it, since jobs run in the event loop, but compile their programs in another thread
+    (see `AsyncJob`). Output of a thread without a job goes to the stream of the server.
+    :var _Stream: stream of the server
+    :var _Jobs: thread-local data, `buffer` is the buffer of the job of the thread
+    """
+
+    def __init__(self, stream) -> None:
+        import threading
+
+        self._Stream = stream
+        self._Jobs = threading.local()
+
+    def set(self, buffer) -> None:
+        """
+        Method sends the output of the current thread to the buffer of a job.
+        :param buffer: the buffer or None for the stream of the server
+        """
+        self._Jobs.buffer = buffer
+
+    def get(self):
+        """
+        Method returns the stream the current thread writes to.
+        """
+        buffer = getattr(self._Jobs, 'buffer', None)
+        return self._Stream if buffer is None else buffer
+
+    def write(self, data: str) -> int:
+        return self.get().write(data)
+
+    def flush(self) -> None:
+        self.get().flush()
+
+    def __getattr__(self, name: str):
+        return getattr(self.get(), name)
+
+
+class AsyncJob:
+    """
+    AsyncJob is a job of the async server (`--async-server SOCKET`). Jobs run concurrently in one event loop, every
+    job has its own interpreter state (the globals `c`, `f`, `s`, `d`, `args`, `Input` and `LinesRead`, stdout
+    and stderr), which is swapped in while the job runs and saved when it waits. A job waits only for a line of its
+    input before READ, for the client to take its output after WRITE, DPRINT and BREAK, and between chunks of
+    instructions, so the order of the reads and the writes of a program is the same as in a normal run.
+    The program is compiled in the compiler thread of the server, so a large program doesn't stop the other jobs.
+    The thread compiles one program at a time, since the load uses the globals `symbols` and the list of instructions.
+    The output is sent to the client in frames: channel (u8, 1 = stdout, 2 = stderr, 0 = exit code), length (u32,
+    big-endian) and data.
+    :var _Reader: stream of the client, the request was already read, the rest is the input of the program
+    :var _Writer: stream to the client
+    :var _Compiler: executor with the compiler thread
+    :var _State: {name of a global: its value in this job}
+    :var _Stdout: buffer of stdout of the job
+    :var _Stderr: buffer of stderr of the job
+    """
+    _Globals = ('c', 'f', 's', 'd', 'args', 'Input', 'LinesRead')
+    _Unsupported = (('server', '--server'), ('async_server', '--async-server'), ('trace', '--trace'),
+                    ('checkpoint', '--checkpoint'), ('resume', '--resume'), ('metrics', '--metrics'), ('gc', '--gc'))
+
+    def __init__(self, reader, writer, compiler) -> None:
+        import io
+
+        self._Reader = reader
+        self._Writer = writer
+        self._Compiler = compiler
+        self._State = {'c': Counter(), 'f': Frame(), 's': Stack(), 'd': DataStack(), 'args': None, 'Input': None,
+                       'LinesRead': 0}
+        self._Stdout = io.StringIO()
+        self._Stderr = io.StringIO()
+
+    def _activate(self) -> None:
+        globals().update(self._State)
+        sys.stdout.set(self._Stdout)
+        sys.stderr.set(self._Stderr)
+
+    def _deactivate(self) -> None:
+        module = globals()
+        for name in self._Globals:
+            self._State[name] = module[name]
+        sys.stdout.set(None)
+        sys.stderr.set(None)
+
+    async def run(self, argv: list, cwd: str) -> int:
+        """
+        Method parses the arguments, compiles and runs the program of the job.
+        :param argv: arguments of interpret.py
+        :param cwd: working directory of the client, relative paths in the arguments are relative to it
+        :return: exit code of the job
+        """
+        import os
+
+        global args, Input, d
+        self._activate()
+        program = None
+        try:
+            try:
+                args = parse_arguments(argv)
+                for dest, option in self._Unsupported:
+                    if getattr(args, dest) not in (None, False):
+                        sys.stderr.write('ERROR: ' + option + ' can\'t be used by an async job')
+                        exit(10)
+                # without --source the program would be read from stdin of the server
+                if args.source is None:
+                    sys.stderr.write('ERROR: jobs of the async server need --source')
+                    exit(10)
+                if args.jobs > 1:
+                    sys.stderr.write('ERROR: --jobs can\'t be used by an async job')
+                    exit(10)
+                # the server can't change its working directory for every job
+                for dest in ('source', 'input'):
+                    if getattr(args, dest) is not None:
+                        setattr(args, dest, os.path.join(cwd, getattr(args, dest)))
+                if args.memoize:
+                    d = MemoDataStack()
+                program = await self.compile()
+                # READ of a job without --input reads the lines sent by the client (see `read_line`)
+                Input = [] if args.input is None else read_input(args)
+                program.define_labels()
+                f.set_symbols(program.get_symbols())
+                f.get_pool().set_limit(args.frame_pool)
+                limits = Limits(args.max_steps, args.timeout, args.max_memory, args.max_stack, args.max_live)
+                await program.run_async(self, [limits] if limits.is_set() else [])
+                code = 0
+            except SystemExit as error:
+                code = ForkServer.exit_code(error.code)
+            except Exception:
+                import traceback
+                traceback.print_exc()
+                code = 1
+            finally:
+                if program is not None and args.memoize:
+                    sys.stderr.write(memo_report(program))
+                if program is not None and args.profile:
+                    sys.stderr.write(profile_report(program))
+        finally:
+            self._deactivate()
+        await self._send()
+        self._Writer.write(self.frame(0, str(code)))
+        await self._Writer.drain()
+        return code
+
+    async def compile(self) -> CompactProgram:
+        """
+        Method compiles the program of the job in the compiler thread, the other jobs run meanwhile.
+        """
+        import asyncio
+
+        arguments = args
+        self._deactivate()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._Compiler, self._compile, arguments)
+        finally:
+            self._activate()
+
+    def _compile(self, arguments) -> CompactProgram:
+        """
+        Method compiles the program in the compiler thread with the output going to the job.
+        :param arguments: parsed arguments of the job
+        """
+        sys.stdout.set(self._Stdout)
+        sys.stderr.set(self._Stderr)
+        try:
+            return compile_program(arguments)
+        finally:
+            sys.stdout.set(None)
+            sys.stderr.set(None)
+
+    @staticmethod
+    def frame(channel: int, data: str) -> bytes:
+        data = data.encode('utf-8', 'surrogateescape')
+        return channel.to_bytes(1, 'big') + len(data).to_bytes(4, 'big') + data
+
+    async def _send(self) -> None:
+        """
+        Method sends the buffered output of the job to the client and waits until it was taken.
+        """
+        for channel, buffer in ((1, self._Stdout), (2, self._Stderr)):
+            if buffer.tell():
+                self._Writer.write(self.frame(channel, buffer.getvalue()))
+                buffer.seek(0)
+                buffer.truncate()
+        await self._Writer.drain()
+
+    async def flush(self) -> None:
+        """
+        Method sends the output written by the last instruction.
+        """
+        self._deactivate()
+        try:
+            await self._send()
+        finally:
+            self._activate()
+
+    async def read_line(self) -> None:
+        """
+        Method waits for the next line of the input of a job without --input and saves it for READ. At the end
+        of the input nothing is saved, so READ gets nil.
+        """
+        if Input or args.input is not None:
+            return
+        self._deactivate()
+        try:
+            line = await self._Reader.readline()
+        finally:
+            self._activate()
+        if line:
+            Input.append(line.decode('utf-8', 'surrogateescape').removesuffix('\n'))
+
+    async def pause(self) -> None:
+        """
+        Method lets the other jobs run.
+        """
+        import asyncio
+
+        self._deactivate()
+        try:
+            await asyncio.sleep(0)
+        finally:
+            self._activate()
+
+
+class AsyncServer:
+    """
+    AsyncServer runs jobs of many clients concurrently in one process and one asyncio event loop
+    (`--async-server SOCKET`), see `AsyncJob`. A client (see `tools/async_client.py`) connects to the Unix socket
+    and sends a request: length (u32, big-endian) and JSON `{"argv": [...], "cwd": "..."}`, followed by the input
+    of the program. Unlike the fork server, every job compiles its program, since the variables of a compiled
+    program can't be shared by programs running at once. SIGTERM and SIGINT stop the server after the running jobs end.
+    :var _Path: path to the socket
+    :var _Jobs: running jobs (asyncio tasks)
+    :var _Compiler: executor with the thread compiling programs of the jobs
+    """
+    MAX_REQUEST = 1 << 20
+
+    def __init__(self, arguments) -> None:
+        import concurrent.futures
+
+        self._Path = arguments.async_server
+        self._Jobs = set()
+        self._Compiler = concurrent.futures.ThreadPoolExecutor(1)
+
+    def serve(self) -> None:
+        import asyncio
+
+        saved = (sys.stdout, sys.stderr)
+        sys.stdout, sys.stderr = JobStream(sys.stdout), JobStream(sys.stderr)
+        try:
+            asyncio.run(self._serve())
+        finally:
+            sys.stdout, sys.stderr = saved
+            self._Compiler.shutdown()
+
+    async def _serve(self) -> None:
+        import asyncio
+        import os
+        import signal
+
+        if os.path.exists(self._Path):
+            try:
+                _, writer = await asyncio.open_unix_connection(self._Path)
+                writer.close()
+                sys.stderr.write('ERROR: async server is already running on ' + self._Path)
+                exit(11)
+            except OSError:
+                os.unlink(self._Path)
+        try:
+            server = await asyncio.start_unix_server(self._accept, self._Path)
+        except OSError:
+            sys.stderr.write('ERROR: can\'t create socket ' + self._Path)
+            exit(11)
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, stop.set)
+        try:
+            await stop.wait()
+            server.close()
+            if self._Jobs:
+                await asyncio.wait(self._Jobs)
+        finally:
+            os.unlink(self._Path)
+
+    async def _accept(self, reader, writer) -> None:
+        """
+        Method reads the request of a client and runs its job.
+        """
+        import asyncio
+        import json
+
+        task = asyncio.current_task()
+        self._Jobs.add(task)
+        try:
+            size = int.from_bytes(await reader.readexactly(4), 'big')
+            if size > self.MAX_REQUEST:
+                raise ValueError('request too long')
+            request = json.loads(await reader.readexactly(size))
+            argv, cwd = request['argv'], request['cwd']
+            if not isinstance(argv, list) or not all(isinstance(arg, str) for arg in argv) or \
+                    not isinstance(cwd, str):
+                raise ValueError('bad request')
+            await AsyncJob(reader, writer, self._Compiler).run(argv, cwd)
+        except (OSError, ValueError, KeyError, TypeError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._Jobs.discard(task)
+            writer.close()
+
+
+c = Counter()
+f = Frame()
+s = Stack()
+d = DataStack()
+args: Arguments
+Input: list | None
+# number of lines read by READ, see `Checkpoint`
+LinesRead = 0
+# table of names of the program being loaded, see `Symbols`
+symbols = Symbols()
+# beginning of the source read from stdin by `is_text_source`, the readers of the source start with it
+SourceHead = b''
+# instruction elements shared with the processes of `load_parallel`
+LoadElements: list | None = None
+# callbacks observing the execution, see `Hooks`
+hooks = Hooks()
+
+
+def main(argv: list | None = None) -> None:
+    """
+    Function runs the interpreter.
+    :param argv: arguments without the name of the script, `sys.argv` by default
+    """
+    global args
+    args = parse_arguments(sys.argv[1:] if argv is None else argv)
+    if args.server is not None:
+        ForkServer(args).serve()
+        return
+    if args.async_server is not None:
+        AsyncServer(args).serve()
+        return
+    if args.reference:
+        run_reference(args)
+        return
+    if args.load_report:
+        import time
+        start = time.perf_counter()
+    # checkpoints reference the program by the hash of the source and the optimization level
+    digest = None
+    if args.checkpoint is not None or args.resume is not None:
+        import hashlib
+        digest = hashlib.sha256()
+    program = compile_program(args, digest)
+    if args.load_report:
+        sys.stderr.write(load_report(start))
+    execute(program, program_hash(digest, args))
+
+
+if __name__ == '__main__':
+    main()
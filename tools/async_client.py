@@ -0,0 +1,59 @@
+# Client of the async server of the IPPcode23 interpreter (`interpret.py --async-server SOCKET`)
+# Sends the arguments of interpret.py and the working directory to the server, streams stdin of this process to
+# the job as its input, writes the output of the job to stdout and stderr and exits with its exit code.
+#   usage: python tools/async_client.py SOCKET [interpret.py arguments]
+
+import json
+import os
+import socket
+import sys
+import threading
+
+
+def send_input(server) -> None:
+    """
+    Copies stdin to the server until its end, then shuts the sending side down, so READ of the job gets nil.
+    """
+    try:
+        while chunk := os.read(0, 65536):
+            server.sendall(chunk)
+        server.shutdown(socket.SHUT_WR)
+    except OSError:
+        pass
+
+
+def receive(server, size: int) -> bytes:
+    data = b''
+    while len(data) < size:
+        chunk = server.recv(size - len(data))
+        if not chunk:
+            raise EOFError
+        data += chunk
+    return data
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.stderr.write('usage: python tools/async_client.py SOCKET [interpret.py arguments]\n')
+        sys.exit(2)
+
+    request = json.dumps({'argv': sys.argv[2:], 'cwd': os.getcwd()}).encode()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        try:
+            server.connect(sys.argv[1])
+            server.sendall(len(request).to_bytes(4, 'big') + request)
+            threading.Thread(target=send_input, args=(server,), daemon=True).start()
+            while True:
+                header = receive(server, 5)
+                data = receive(server, int.from_bytes(header[1:], 'big'))
+                if header[0] == 0:
+                    sys.exit(int(data))
+                stream = sys.stdout if header[0] == 1 else sys.stderr
+                stream.buffer.write(data)
+                stream.flush()
+        except OSError as error:
+            sys.stderr.write('ERROR: async server: ' + str(error) + '\n')
+            sys.exit(99)
+        except (EOFError, ValueError):
+            sys.stderr.write('ERROR: async server closed the connection\n')
+            sys.exit(99)
@@ -0,0 +1,167 @@
+# Decoder of traces recorded by `interpret.py --trace FILE`
+# Prints every record as a line of text or JSON. Records can be filtered by the label they belong to (the nearest
+# label at or before their pc) and by a range of pcs. Variables are printed by their names followed by their values
+# (GF@x=int@1), strings in the text output are escaped like in IPPcode23 (\010 for a newline), so every record
+# stays on one line.
+#   usage: python tools/decode_trace.py [--json] [--label NAME ...] [--range START:END] trace
+
+import argparse
+import bisect
+import json
+import os
+import struct
+import sys
+
+MAGIC = b'IPPT'
+# version 1 has no names of variables
+VERSIONS = (1, 2)
+FRAMES = ('GF', 'LF', 'TF')
+
+
+class TraceReader:
+    """
+    TraceReader reads the header and the records of a trace. The format is described in the class `Trace`
+    of interpret.py.
+    :var _Data: content of the trace file
+    :var _Pos: position of the next unread byte
+    :var opcodes: opcode names by their id
+    :var labels: [(position, name)] sorted by position
+    :var _Positions: positions of the labels, sorted
+    :var names: names of variables by their ids
+    :var length: number of instructions of the traced program
+    """
+
+    def __init__(self, data: bytes) -> None:
+        self._Data = data
+        self._Pos = 0
+        if self._read(4) != MAGIC:
+            raise ValueError('not a trace file')
+        version, self.length, count = self._unpack('<HIH')
+        if version not in VERSIONS:
+            raise ValueError('unsupported trace version ' + str(version))
+        self.opcodes = [self._read(self._unpack('<B')[0]).decode() for _ in range(count)]
+        self.labels = []
+        for _ in range(self._unpack('<I')[0]):
+            position, size = self._unpack('<IH')
+            self.labels.append((position, self._read(size).decode()))
+        self.labels.sort()
+        self._Positions = [position for position, _ in self.labels]
+        self.names = []
+        if version >= 2:
+            for _ in range(self._unpack('<I')[0]):
+                self.names.append(self._read(self._unpack('<H')[0]).decode('utf-8', 'surrogatepass'))
+
+    def _read(self, size: int) -> bytes:
+        if self._Pos + size > len(self._Data):
+            raise ValueError('truncated trace file')
+        chunk = self._Data[self._Pos:self._Pos + size]
+        self._Pos += size
+        return chunk
+
+    def _unpack(self, fmt: str) -> tuple:
+        return struct.unpack(fmt, self._read(struct.calcsize(fmt)))
+
+    def _value(self):
+        """
+        Reads a value and returns it as (type, value, variable), variable is e.g. GF@x, or None for a constant.
+        """
+        tag = self._unpack('<B')[0]
+        if tag == 8:
+            frame, var_id = self._unpack('<BI')
+            if frame >= len(FRAMES) or var_id >= len(self.names):
+                raise ValueError('unknown variable ' + str(var_id))
+            kind, data, _ = self._value()
+            return kind, data, FRAMES[frame] + '@' + self.names[var_id]
+        if tag == 0:
+            return 'undefined', None, None
+        if tag == 1:
+            return 'int', self._unpack('<q')[0], None
+        if tag == 2:
+            return 'bool', bool(self._unpack('<B')[0]), None
+        if tag == 3:
+            return 'nil', 'nil', None
+        if tag in (4, 5, 6, 7):
+            text = self._read(self._unpack('<I')[0]).decode('utf-8', 'surrogatepass')
+            if tag == 7:
+                return 'int', int(text), None
+            return {4: 'string', 5: 'type', 6: 'label'}[tag], text, None
+        raise ValueError('unknown value tag ' + str(tag))
+
+    def label_of(self, pc: int) -> str | None:
+        """
+        Returns the nearest label at or before pc.
+        """
+        index = bisect.bisect_right(self._Positions, pc)
+        return self.labels[index - 1][1] if index else None
+
+    def records(self):
+        """
+        Generates records as (pc, opcode, [(type, value, variable)]).
+        """
+        while self._Pos < len(self._Data):
+            pc, opcode, count = self._unpack('<IHB')
+            yield pc, self.opcodes[opcode], [self._value() for _ in range(count)]
+
+
+def escape(text: str) -> str:
+    """
+    Returns the string escaped like in IPPcode23: whitespace, control characters, # and backslash as \\ddd.
+    """
+    return ''.join('\\%03d' % ord(ch) if ord(ch) <= 32 or ch in '#\\' or (ord(ch) < 1000 and not ch.isprintable())
+                   else ch for ch in text)
+
+
+def format_value(value: tuple) -> str:
+    kind, data, variable = value
+    if kind == 'bool':
+        data = 'true' if data else 'false'
+    elif kind == 'string':
+        data = escape(data)
+    text = kind + '@' + ('' if data is None else str(data))
+    return text if variable is None else variable + '=' + text
+
+
+def parse_range(text: str) -> tuple:
+    start, _, end = text.partition(':')
+    return int(start) if start else 0, int(end) if end else None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Decoder of IPPcode23 interpreter traces')
+    parser.add_argument('trace', help='trace file recorded by interpret.py --trace')
+    parser.add_argument('--json', action='store_true', help='print records as lines of JSON')
+    parser.add_argument('--label', action='append', metavar='NAME',
+                        help='print only records of instructions after this label, can be repeated')
+    parser.add_argument('--range', type=parse_range, metavar='START:END',
+                        help='print only records with pc in this range (END excluded, both may be left out)')
+    args = parser.parse_args()
+
+    with open(args.trace, 'rb') as file:
+        try:
+            reader = TraceReader(file.read())
+        except ValueError as error:
+            sys.stderr.write('ERROR: ' + str(error) + '\n')
+            sys.exit(1)
+
+    try:
+        for pc, opcode, values in reader.records():
+            if args.range is not None:
+                start, end = args.range
+                if pc < start or (end is not None and pc >= end):
+                    continue
+            label = reader.label_of(pc)
+            if args.label is not None and label not in args.label:
+                continue
+            if args.json:
+                print(json.dumps({'pc': pc, 'label': label, 'opcode': opcode,
+                                  'values': [{'type': kind, 'value': data, 'var': variable}
+                                             for kind, data, variable in values]}))
+            else:
+                print('%6d  %-12s %-10s %s' % (pc, label or '', opcode, ', '.join(map(format_value, values))))
+    except ValueError as error:
+        sys.stderr.write('ERROR: ' + str(error) + '\n')
+        sys.exit(1)
+    except BrokenPipeError:
+        # the reader (e.g. head) ended, the rest of the output is thrown away, so the flush at exit doesn't fail
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
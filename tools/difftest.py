@@ -0,0 +1,183 @@
+# Differential test of the execution engines of the IPPcode23 interpreter
+# Every XML program is run by interpret.py on the reference engine (--reference, the original loop over Instruction
+# objects without the optimizer and the compact program) and on the other engines (optimization levels, the monitored
+# and the traced loop, memoization). Their stdout, the class of their stderr and their exit codes are compared.
+# Programs run in a pool of processes, a program which behaves differently is shrunk to a minimal reproducer by
+# removing instructions while the difference stays.
+# The input of a program is the file with the same name and the extension .in, if there is one. Without programs,
+# the corpus in tools/difftest_corpus is checked. Runs which don't end in time are reported as timeouts, not as
+# differences, the exit code is 1 for differences, 2 for timeouts only.
+# --reference runs the same Frame, Symbols and instruction code as the other engines, so it finds bugs of the
+# optimizer and the execution loops only. --baseline compares the engines with another interpret.py instead, e.g.
+# `git show <commit>:interpret.py > old.py` (programs using instructions the old version doesn't know will differ).
+#   usage: python tools/difftest.py [--engine NAME ...] [--jobs N] [--timeout SEC] [--baseline FILE] [--out DIR]
+#                                   [program.xml|dir ...]
+
+import argparse
+import concurrent.futures
+import glob
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+INTERPRET = os.path.join(TOOLS_DIR, os.pardir, 'interpret.py')
+CORPUS = os.path.join(TOOLS_DIR, 'difftest_corpus')
+
+REFERENCE = [INTERPRET, '--reference']
+# an engine may be this many times slower than the reference before its run times out
+SLOWDOWN = 10
+ENGINES = {
+    'O0': ['-O0'],
+    'O1': ['-O1'],
+    'O2': ['-O2'],
+    'monitored': ['-O2', '--max-steps', str(1 << 62)],
+    'traced': ['--trace', os.devnull, '--trace-values'],
+    'memoize': ['-O2', '--memoize'],
+}
+
+
+def stderr_class(stderr: str) -> str:
+    """
+    Returns the class of stderr: empty, error (a message of the interpreter) or crash (a Python traceback).
+    The statistics written by --memoize are left out, error messages themselves may differ between engines.
+    """
+    lines = [line for line in stderr.splitlines() if line and not line.startswith('memo ')]
+    if not lines:
+        return 'empty'
+    return 'crash' if any(line.startswith('Traceback') for line in lines) else 'error'
+
+
+def run(program: str, command: list, timeout: float) -> tuple:
+    """
+    Runs the program by the interpreter and options in command and returns ((exit code, stdout, class of stderr),
+    seconds), the result is None if the program didn't end in time.
+    """
+    name = os.path.splitext(program)[0] + '.in'
+    command = [sys.executable, command[0], '--source', program, '--input',
+               name if os.path.exists(name) else os.devnull] + command[1:]
+    start = time.perf_counter()
+    try:
+        result = subprocess.run(command, capture_output=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return None, timeout
+    return ((result.returncode, result.stdout, stderr_class(result.stderr.decode(errors='replace'))),
+            time.perf_counter() - start)
+
+
+def differences(program: str, engines: list, reference: list, timeout: float) -> tuple:
+    """
+    Returns the names of the engines which behave differently from the reference on the program and the names of
+    the engines which didn't end in time. An engine gets SLOWDOWN times the time of the reference, at least timeout
+    seconds, so a loaded machine slows down both. If the reference doesn't end in time, no engine is compared.
+    """
+    expected, seconds = run(program, reference, timeout)
+    if expected is None:
+        return [], list(engines)
+    timeout = max(timeout, SLOWDOWN * seconds)
+    differing, timed_out = [], []
+    for engine in engines:
+        result = run(program, [INTERPRET] + ENGINES[engine], timeout)[0]
+        if result is None:
+            timed_out.append(engine)
+        elif result != expected:
+            differing.append(engine)
+    return differing, timed_out
+
+
+def shrink(program: str, engine: str, reference: list, timeout: float) -> ET.ElementTree:
+    """
+    Removes instructions of the program while the engine still behaves differently from the reference engine.
+    Chunks of instructions are removed first, then smaller ones down to single instructions.
+    :return: the shrunk program
+    """
+    tree = ET.parse(program)
+    root = tree.getroot()
+    instructions = list(root)
+    with tempfile.TemporaryDirectory() as directory:
+        candidate = os.path.join(directory, os.path.basename(program))
+        name = os.path.splitext(program)[0] + '.in'
+        if os.path.exists(name):
+            os.symlink(os.path.abspath(name), os.path.splitext(candidate)[0] + '.in')
+
+        def fails(kept: list) -> bool:
+            root[:] = kept
+            tree.write(candidate, encoding='UTF-8', xml_declaration=True)
+            return engine in differences(candidate, [engine], reference, timeout)[0]
+
+        size = len(instructions) // 2
+        while size >= 1:
+            start = 0
+            while start < len(instructions):
+                kept = instructions[:start] + instructions[start + size:]
+                if kept and fails(kept):
+                    instructions = kept
+                else:
+                    start += size
+            size //= 2
+    root[:] = instructions
+    return tree
+
+
+def check(program: str, engines: list, reference: list, timeout: float, out: str | None) -> tuple:
+    """
+    Compares the engines on the program and shrinks it for every engine which behaves differently.
+    Engines which didn't end in time aren't shrunk.
+    :return: (program, [(engine, path to the reproducer or None)], [engine which didn't end in time])
+    """
+    found = []
+    differing, timed_out = differences(program, engines, reference, timeout)
+    for engine in differing:
+        path = None
+        if out is not None:
+            path = os.path.join(out, os.path.splitext(os.path.basename(program))[0] + '.' + engine + '.xml')
+            shrink(program, engine, reference, timeout).write(path, encoding='UTF-8', xml_declaration=True)
+        found.append((engine, path))
+    return program, found, timed_out
+
+
+def programs(paths: list) -> list:
+    ret = []
+    for path in paths:
+        if os.path.isdir(path):
+            ret.extend(sorted(glob.glob(os.path.join(path, '*.xml'))))
+        else:
+            ret.append(path)
+    return ret
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Differential test of the IPPcode23 interpreter engines')
+    parser.add_argument('programs', nargs='*', default=[CORPUS],
+                        help='XML programs or directories with them (tools/difftest_corpus by default)')
+    parser.add_argument('--engine', action='append', choices=sorted(ENGINES),
+                        help='engine compared to the reference engine, can be repeated (all by default)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='number of processes')
+    parser.add_argument('--timeout', type=float, default=10,
+                        help='time limit of the reference in seconds, engines get %d times its time if more' % SLOWDOWN)
+    parser.add_argument('--baseline', help='interpret.py used as the reference instead of --reference, e.g. an '
+                                           'older version of the interpreter')
+    parser.add_argument('--out', help='directory for shrunk reproducers (programs aren\'t shrunk without it)')
+    args = parser.parse_args()
+
+    if args.out is not None:
+        os.makedirs(args.out, exist_ok=True)
+    engines = args.engine or sorted(ENGINES)
+    reference = REFERENCE if args.baseline is None else [os.path.abspath(args.baseline)]
+    failed = slow = 0
+    checked = programs(args.programs)
+    with concurrent.futures.ProcessPoolExecutor(args.jobs) as pool:
+        futures = [pool.submit(check, program, engines, reference, args.timeout, args.out) for program in checked]
+        for future in concurrent.futures.as_completed(futures):
+            program, found, timed_out = future.result()
+            for engine, path in found:
+                failed += 1
+                print('DIFF %s on %s' % (program, engine) + ('' if path is None else ', reproducer ' + path))
+            for engine in timed_out:
+                slow += 1
+                print('TIMEOUT %s on %s' % (program, engine))
+    print('%d programs, %d engines, %d differences, %d timeouts' % (len(checked), len(engines), failed, slow))
+    sys.exit(1 if failed else 2 if slow else 0)
@@ -0,0 +1,32 @@
+# Client of the fork server of the IPPcode23 interpreter (`interpret.py --server SOCKET`)
+# Sends the arguments of interpret.py, the working directory and stdin, stdout and stderr of this process to the
+# server, waits for the job to end and exits with its exit code. It imports only what it needs, so it starts fast.
+#   usage: python tools/fork_client.py SOCKET [interpret.py arguments]
+
+import json
+import os
+import socket
+import sys
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.stderr.write('usage: python tools/fork_client.py SOCKET [interpret.py arguments]\n')
+        sys.exit(2)
+
+    request = json.dumps({'argv': sys.argv[2:], 'cwd': os.getcwd()}).encode()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        try:
+            server.connect(sys.argv[1])
+            socket.send_fds(server, [len(request).to_bytes(4, 'big') + request], [0, 1, 2])
+            reply = b''
+            while chunk := server.recv(64):
+                reply += chunk
+        except OSError as error:
+            sys.stderr.write('ERROR: fork server: ' + str(error) + '\n')
+            sys.exit(99)
+
+    try:
+        sys.exit(int(reply))
+    except ValueError:
+        sys.stderr.write('ERROR: fork server closed the connection\n')
+        sys.exit(99)
@@ -0,0 +1,70 @@
+# Statistics of a run of the IPPcode23 interpreter collected by the hook API (see `Hooks` in interpret.py)
+# Runs interpret.py with the given arguments and writes the number of executed instructions of every opcode, calls,
+# the deepest call and frame stacks, reads, writes and the error which ended the program to stderr.
+# Opcodes are those of the optimized program (superinstructions), pass -O0 to count the instructions of the source.
+#   usage: python tools/hook_stats.py [interpret.py arguments]
+
+import collections
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import interpret  # noqa: E402
+
+
+class Stats:
+    def __init__(self) -> None:
+        self.opcodes = collections.Counter()
+        self.calls = 0
+        self.call_depth = 0
+        self.max_call_depth = 0
+        self.max_frame_depth = 0
+        self.reads = 0
+        self.writes = 0
+        self.error = None
+
+    def on_instruction(self, pc: int, opcode: str, arg1, arg2, arg3) -> None:
+        self.opcodes[opcode] += 1
+
+    def on_call(self, pc: int, target: int) -> None:
+        self.calls += 1
+        self.call_depth += 1
+        self.max_call_depth = max(self.max_call_depth, self.call_depth)
+
+    def on_return(self, pc: int, target: int) -> None:
+        self.call_depth -= 1
+
+    def on_frame_push(self, pc: int, depth: int) -> None:
+        self.max_frame_depth = max(self.max_frame_depth, depth)
+
+    def on_read(self, pc: int, value) -> None:
+        self.reads += 1
+
+    def on_write(self, pc: int, value) -> None:
+        self.writes += 1
+
+    def on_error(self, pc: int, code: int) -> None:
+        self.error = (pc, code)
+
+    def report(self) -> str:
+        ret = 'instructions: %d\n' % sum(self.opcodes.values())
+        for opcode, count in self.opcodes.most_common():
+            ret += '  %-12s%d\n' % (opcode, count)
+        ret += 'calls: %d, deepest call stack: %d, deepest frame stack: %d\n' % (self.calls, self.max_call_depth,
+                                                                              self.max_frame_depth)
+        ret += 'reads: %d, writes: %d\n' % (self.reads, self.writes)
+        if self.error is not None:
+            ret += 'error %d at pc %d\n' % (self.error[1], self.error[0])
+        return ret
+
+
+if __name__ == '__main__':
+    stats = Stats()
+    for event in interpret.Hooks.EVENTS:
+        if hasattr(stats, event):
+            interpret.hooks.register(event, getattr(stats, event))
+    try:
+        interpret.main(sys.argv[1:])
+    finally:
+        sys.stdout.flush()
+        sys.stderr.write('\n' + stats.report())